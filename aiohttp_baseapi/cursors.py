@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import binascii
+import json
+
+from aiohttp_baseapi.response import json_dumps
+
+__all__ = (
+    'InvalidCursorError',
+    'encode_cursor',
+    'decode_cursor',
+)
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(sort, values):
+    """
+    Builds an opaque pagination cursor from the requested sort and the sort key values of an item.
+    """
+    payload = json_dumps(dict(sort=list(sort), values=list(values)))
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns the sort and the sort key values encoded in the cursor.
+    """
+    if not isinstance(cursor, str):
+        raise InvalidCursorError(cursor)
+
+    padding = '=' * (-len(cursor) % 4)
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode((cursor + padding).encode()).decode())
+    except (ValueError, binascii.Error):
+        raise InvalidCursorError(cursor)
+
+    if not isinstance(payload, dict) or \
+            not isinstance(payload.get('sort'), list) or not isinstance(payload.get('values'), list):
+        raise InvalidCursorError(cursor)
+
+    return payload['sort'], payload['values']
@@ -1,8 +1,16 @@
 # -*- coding: utf-8 -*-
 
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from copy import copy
+from functools import partial
 import asyncio
 
+from aiohttp_baseapi.cursors import encode_cursor
+from aiohttp_baseapi.data_providers.cache import make_cache_key, query_cache
+from aiohttp_baseapi.data_providers.exceptions import DataProviderTimeoutError
+from aiohttp_baseapi.data_providers.loader import single_flight, worker_limiter
+
 __all__ = (
     'BaseDataProvider',
 )
@@ -16,15 +24,126 @@ class BaseDataProvider(ABC):
      - get_data
      - get_total_count
 
+    Includes are loaded with one of the strategies (can be set per include with the "strategy" key):
+     - per_item - one data provider (and one get_many call) per every parent item
+     - batch - one data provider for the whole list of parents. Relation keys of all parents are passed as a single
+       list filter and the loaded items are distributed between parents afterwards.
+
+    Data and meta of get_many are retrieved with one of the query modes:
+     - sequential - get_data, then get_meta
+     - concurrent - get_data and get_meta at the same time
+
+    Total count is calculated with one of the modes (page "total_count" parameter):
+     - exact - get_total_count
+     - estimated - get_estimated_total_count, falls back to the exact count if not implemented
+     - capped - get_capped_total_count, counts not more than total_count_cap + 1 items
+     - none - total count is not calculated
+    In all the modes except "none" total count is inferred from the data without any query if the page is not full.
+
+    Besides limit/offset pagination there is the cursor one: page "after" or "before" parameter contains sort key
+    values of the item to start from (an empty list means the first or the last page). In this mode meta contains
+    the next_cursor and prev_cursor tokens built from the sort key values of the last and the first items.
+    Total count of the cursor pagination (cursor_total_count_mode, "none" by default) is the count of all
+    the filtered items, not only of the ones after (before) the cursor.
+
+    Results of get_many and get_one are cached in the query_cache if cache_ttl is set. Cache entries are tagged with
+    cache tags of the data provider and all the included data providers and are invalidated by invalidate_cache.
+
+    stream_many is an alternative to get_many for big lists: data is read by batches (iter_data) and every batch
+    is passed to the writer as soon as it is ready, meta is returned at the end.
+
+    A request-scoped loader (DataLoader) can be passed to the data provider and to its included data providers:
+    results of get_many, get_one and of the batch include queries with the same parameters are loaded only once
+    per request. Queries (see run_query) are limited by the concurrency of the loader and by the worker limiter.
+
+    With coalesce_queries identical queries (see coalesce) running concurrently in different requests are made once,
+    every request waits for the shared query until its own deadline.
+
+    The deadline (event loop time) bounds the queries of the data provider and of its included data providers:
+    queries still running at the deadline are cancelled and DataProviderTimeoutError is raised.
+
+    read_replica allows the data provider and its included data providers to read from replicas (if the data
+    provider supports them).
+
+    Fields which aren't requested but are needed by the data provider (relation keys of the requested includes,
+    sort fields of the cursor, required_fields passed by the parent data provider) are retrieved too
+    (see get_required_fields) and removed from the result afterwards (see remove_extra_fields).
+
+    deferred_fields (e.g. large text, JSON or binary columns) are retrieved only if they are requested with fields,
+    data providers which know all their fields leave them out when no fields are requested.
+
+    With group_by (list of fields) and aggregate (aggregate function -> list of fields) the data provider returns
+    the groups with the aggregated values (named by AGGREGATE_LABEL_TEMPLATE, e.g. "price__sum") instead of
+    the items, pagination and total count are applied to the groups. It's supported by ModelDataProvider.
+
     """
 
-    def __init__(self, fields=None, filters=None, page=None, sort=None, include=None, available_includes=None):
+    INCLUDE_STRATEGY_PER_ITEM = 'per_item'
+    INCLUDE_STRATEGY_BATCH = 'batch'
+
+    QUERY_MODE_SEQUENTIAL = 'sequential'
+    QUERY_MODE_CONCURRENT = 'concurrent'
+
+    TOTAL_COUNT_EXACT = 'exact'
+    TOTAL_COUNT_ESTIMATED = 'estimated'
+    TOTAL_COUNT_CAPPED = 'capped'
+    TOTAL_COUNT_NONE = 'none'
+
+    TOTAL_COUNT_MODES = (TOTAL_COUNT_EXACT, TOTAL_COUNT_ESTIMATED, TOTAL_COUNT_CAPPED, TOTAL_COUNT_NONE)
+
+    CURSOR_AFTER = 'after'
+    CURSOR_BEFORE = 'before'
+
+    AGGREGATE_LABEL_TEMPLATE = '{}__{}'
+
+    # include params which change the included data (not the loader, the deadline, etc.)
+    INCLUDE_CACHE_KEY_PARAMS = (
+        'fields', 'filters', 'page', 'sort', 'include', 'group_by', 'aggregate', 'deferred_fields', 'query_mode',
+        'total_count_cap', 'read_replica',
+    )
+
+    include_strategy = INCLUDE_STRATEGY_PER_ITEM
+    # the per item limit of the batch includes without page limit (None - all the included entities)
+    include_limit = 100
+    query_mode = QUERY_MODE_SEQUENTIAL
+    total_count_mode = TOTAL_COUNT_EXACT
+    cursor_total_count_mode = TOTAL_COUNT_NONE
+    total_count_cap = 10000
+
+    query_cache = query_cache
+    cache_ttl = None
+    cache_stale_ttl = 0
+
+    stream_batch_size = 500
+
+    single_flight = single_flight
+    limiter = worker_limiter
+    coalesce_queries = False
+
+    deferred_fields = ()
+
+    def __init__(self, fields=None, filters=None, page=None, sort=None, include=None, available_includes=None,
+                 query_mode=None, total_count_cap=None, cache_ttl=None, cache_stale_ttl=None, loader=None,
+                 coalesce_queries=None, deadline=None, read_replica=False, group_by=None, aggregate=None,
+                 required_fields=None, deferred_fields=None):
         self._fields = fields or []
         self._filters = filters or {}
         self._page = page or {}
         self._sort = sort or {}
         self._include = include or {}
         self._available_includes = available_includes or {}
+        self._query_mode = query_mode or self.query_mode
+        self._total_count_cap = total_count_cap or self.total_count_cap
+        self._cache_ttl = cache_ttl or self.cache_ttl
+        self._cache_stale_ttl = cache_stale_ttl or self.cache_stale_ttl
+        self._loader = loader
+        self._coalesce_queries = coalesce_queries if coalesce_queries is not None else self.coalesce_queries
+        self._deadline = deadline
+        self._read_replica = read_replica
+        self._group_by = group_by or []
+        self._aggregate = aggregate or {}
+        self._required_fields = required_fields or []
+        self._deferred_fields = deferred_fields if deferred_fields is not None else self.deferred_fields
 
     async def get_filters(self):
         return dict(self._filters)
@@ -41,6 +160,56 @@ class BaseDataProvider(ABC):
     async def get_sort(self):
         return self._sort
 
+    def get_total_count_mode(self):
+        if self._page.get('total_count'):
+            return self._page['total_count']
+
+        # cursors are used to avoid the work per page, so the items are not counted unless it's requested
+        return self.cursor_total_count_mode if self.get_cursor() is not None else self.total_count_mode
+
+    def get_cursor(self):
+        for direction in (self.CURSOR_AFTER, self.CURSOR_BEFORE):
+            if direction in self._page:
+                return direction, self._page[direction] or []
+
+        return None
+
+    def get_cursor_fields(self):
+        """
+        Sort fields (with the "-" prefix for descending order) which values identify the position of an item.
+        """
+        return list(self._sort)
+
+    def is_aggregated(self):
+        return bool(self._group_by or self._aggregate)
+
+    def get_required_fields(self):
+        """
+        Fields which should be retrieved even if they are not requested: the required fields, the relation keys
+        of the requested includes and the sort fields of the cursor.
+        """
+        fields = list(self._required_fields)
+
+        for include_name in self._include:
+            for relation in self._available_includes[include_name].get('relations', []):
+                fields.append(relation['root_entity_field_name'])
+
+        if self.get_cursor() is not None:
+            fields += [field.lstrip('-') for field in self.get_cursor_fields()]
+
+        return list(OrderedDict.fromkeys(fields))
+
+    def remove_extra_fields(self, data):
+        fields = self.get_fields()
+
+        if not fields:
+            return
+
+        extra_fields = set(self.get_required_fields()) - set(fields)
+        for item in data:
+            for field in extra_fields:
+                item.pop(field, None)
+
     @abstractmethod
     async def get_data(self) -> list:
         pass
@@ -49,13 +218,243 @@ class BaseDataProvider(ABC):
     async def get_total_count(self):
         pass
 
-    async def get_meta(self):
+    async def get_estimated_total_count(self):
+        return await self.get_total_count()
+
+    async def get_capped_total_count(self):
+        return await self.get_total_count()
+
+    async def infer_total_count(self, count):
+        if self.get_cursor() is not None:
+            return None
+
+        limit = await self.get_limit()
+        offset = await self.get_offset() or 0
+
+        if count and (limit is None or count < limit):
+            return offset + count
+
+        if not count and not offset:
+            return 0
+
+        return None
+
+    def build_total_count_meta(self, total_count):
+        mode = self.get_total_count_mode()
+
+        if mode == self.TOTAL_COUNT_NONE:
+            return dict(total_count=None)
+
+        if mode == self.TOTAL_COUNT_CAPPED:
+            return dict(
+                total_count=min(total_count, self._total_count_cap),
+                total_count_capped=total_count > self._total_count_cap
+            )
+
+        return dict(total_count=total_count)
+
+    async def get_total_count_meta(self, count=None):
+        """
+        count - number of the retrieved items if they are retrieved already
+        """
+        mode = self.get_total_count_mode()
+
+        if mode == self.TOTAL_COUNT_NONE:
+            return self.build_total_count_meta(None)
+
+        total_count = await self.infer_total_count(count) if count is not None else None
+
+        if total_count is None:
+            if mode == self.TOTAL_COUNT_ESTIMATED:
+                total_count = await self.get_estimated_total_count()
+            elif mode == self.TOTAL_COUNT_CAPPED:
+                total_count = await self.get_capped_total_count()
+            else:
+                total_count = await self.get_total_count()
+
+        return self.build_total_count_meta(total_count)
+
+    async def get_meta(self, data=None):
+        return await self.get_meta_by_count(len(data) if data is not None else None)
+
+    async def get_meta_by_count(self, count=None):
+        meta = await self.get_total_count_meta(count)
+        meta['offset'] = await self.get_offset()
+
+        return meta
+
+    def _encode_item_cursor(self, item):
+        return encode_cursor(self._sort, [item.get(field.lstrip('-')) for field in self.get_cursor_fields()])
+
+    def get_cursor_meta(self, data, count=None):
+        """
+        data - the retrieved items, only the first and the last ones are used
+        count - number of the retrieved items if data contains only some of them
+        """
+        cursor = self.get_cursor()
+
+        if cursor is None:
+            return {}
+
+        direction, values = cursor
+        limit = self._page.get('limit')
+        count = len(data) if count is None else count
+        has_more = limit is not None and count >= limit
+        is_after = direction == self.CURSOR_AFTER
+
+        has_next = has_more if is_after else bool(values)
+        has_prev = bool(values) if is_after else has_more
+
+        return dict(
+            next_cursor=self._encode_item_cursor(data[-1]) if data and has_next else None,
+            prev_cursor=self._encode_item_cursor(data[0]) if data and has_prev else None,
+        )
+
+    @classmethod
+    def get_cache_tag(cls):
+        return '{}.{}'.format(cls.__module__, cls.__qualname__)
+
+    def get_cache_tags(self):
+        tags = {self.get_cache_tag()}
+
+        includes = [(self._include, self._available_includes)]
+        while includes:
+            include, available_includes = includes.pop()
+            for include_name, include_params in include.items():
+                tags.add(available_includes[include_name]['data_provider_class'].get_cache_tag())
+                includes.append((include_params.get('include') or {}, include_params.get('available_includes') or {}))
+
+        return tags
+
+    @classmethod
+    def get_include_cache_key(cls, include):
         return {
-            'total_count': await self.get_total_count(),
-            'offset': await self.get_offset()
+            include_name: {
+                name: cls.get_include_cache_key(value) if name == 'include' else value
+                for name, value in include_params.items() if name in cls.INCLUDE_CACHE_KEY_PARAMS
+            }
+            for include_name, include_params in (include or {}).items()
         }
 
+    def get_cache_key(self, kind):
+        """
+        The key of the results: all the parameters which change them.
+        """
+        return make_cache_key(
+            type(self), kind, self._fields, self._filters, self._page, self._sort,
+            self.get_include_cache_key(self._include), self._group_by, self._aggregate, self._required_fields,
+            self._deferred_fields, self._query_mode, self._total_count_cap, self._read_replica
+        )
+
+    def invalidate_cache(self):
+        self.query_cache.invalidate(self.get_cache_tag())
+
+        if self._loader is not None:
+            self._loader.clear()
+
+    async def get_cached(self, kind, fetch):
+        if not self._cache_ttl:
+            return await fetch()
+
+        return await self.query_cache.get_or_fetch(
+            self.get_cache_key(kind),
+            fetch,
+            ttl=self._cache_ttl,
+            stale_ttl=self._cache_stale_ttl,
+            tags=self.get_cache_tags()
+        )
+
+    async def load(self, data_provider, kind, fetch):
+        """
+        Calls fetch of the data provider (self or an included one) once per request if there is the loader.
+        """
+        if self._loader is None:
+            return await fetch()
+
+        return await self._loader.load(data_provider.get_cache_key(kind), fetch)
+
+    def get_timeout(self):
+        """
+        Seconds left before the deadline, None if there is no deadline.
+        """
+        if self._deadline is None:
+            return None
+
+        timeout = self._deadline - asyncio.get_event_loop().time()
+        if timeout <= 0:
+            raise DataProviderTimeoutError()
+
+        return timeout
+
+    def acquire_query_slot(self):
+        """
+        Async context manager holding the concurrency slot of a query (see run_query) for the queries which can't
+        be run by run_query, e.g. the cursors read by iter_data.
+        """
+        if self._loader is None:
+            return self.limiter.acquire()
+
+        return self._loader.acquire()
+
+    async def run_query(self, fetch):
+        """
+        Runs a single query in the limits of the request and the worker concurrency and before the deadline.
+        Only the queries are limited, not the coroutines gathering them, which would deadlock on nested includes.
+        """
+        if self._loader is None:
+            limited_fetch = partial(self.limiter.run, fetch)
+        else:
+            limited_fetch = partial(self._loader.run, fetch)
+
+        timeout = self.get_timeout()
+        if timeout is None:
+            return await limited_fetch()
+
+        try:
+            return await asyncio.wait_for(limited_fetch(), timeout)
+        except asyncio.TimeoutError:
+            raise DataProviderTimeoutError()
+        except asyncio.CancelledError:
+            # a query cancelled by the database statement timeout is reported as cancelled too
+            if self._deadline <= asyncio.get_event_loop().time():
+                raise DataProviderTimeoutError()
+            raise
+
+    def detach(self):
+        """
+        Copy of the data provider for the queries shared with other requests (see coalesce): without the deadline
+        and the request concurrency limit (the loader) of this one, the queries are still limited by the worker.
+        """
+        data_provider = copy(self)
+        data_provider._deadline = None
+        data_provider._loader = None
+        return data_provider
+
+    async def coalesce(self, kind, fetch):
+        """
+        Returns fetch(data_provider) sharing it with concurrent calls of data providers of the same class with
+        the same params. The shared call is made with a detached data provider (see detach) and every caller waits
+        for it until its own deadline. The result is shared, so it should be copied before any changes.
+        """
+        if not self._coalesce_queries:
+            return await fetch(self)
+
+        timeout = self.get_timeout()
+        # reads of the primary don't wait for the ones of the replicas, which can lag behind
+        key = (self.get_cache_key(kind), self._read_replica)
+        shared_call = self.single_flight.do(key, partial(fetch, self.detach()))
+        if timeout is None:
+            return await shared_call
+
+        try:
+            return await asyncio.wait_for(shared_call, timeout)
+        except asyncio.TimeoutError:
+            raise DataProviderTimeoutError()
+
     async def get_many(self) -> dict:
+        return await self.load(self, 'many', partial(self.get_cached, 'many', self.fetch_many))
+
+    async def fetch_many(self) -> dict:
         """
         Returns structure:
         {
@@ -67,27 +466,79 @@ class BaseDataProvider(ABC):
             }
         }
         """
+        data, meta = await self.get_data_and_meta()
+        meta.update(self.get_cursor_meta(data))
+
+        await self.extend_data_with_all_includes(data)
+        self.remove_extra_fields(data)
+
+        return self.build_many(data, meta)
+
+    async def get_data_and_meta(self):
+        if self._query_mode == self.QUERY_MODE_CONCURRENT:
+            data, meta = await asyncio.gather(self.get_data(), self.get_meta())
+            return data, meta
+
+        data = await self.get_data()
+        meta = await self.get_meta(data)
+
+        return data, meta
+
+    async def iter_data(self, batch_size=None):
+        """
+        Yields data by batches. By default the whole data is retrieved with get_data as a single batch.
+        """
         data = await self.get_data()
-        meta = await self.get_meta()
 
-        await asyncio.gather(*[
-            self.extend_data_with_includes(data, name, params) for name, params in self._include.items()
-        ])
+        if data:
+            yield data
 
-        result = dict(data=data, meta=dict(count=len(data)))
-        result['meta'].update(meta)
+    async def stream_many(self, write, batch_size=None):
+        """
+        Passes every batch of data (with includes) to the write coroutine and returns meta (as get_many does).
+        """
+        count = 0
+        edge_items = []
 
-        return result
+        async for data in self.iter_data(batch_size or self.stream_batch_size):
+            await self.extend_data_with_all_includes(data)
+
+            # the first and the last items are kept with all the fields to build cursors
+            edge_items = [edge_items[0] if edge_items else dict(data[0]), dict(data[-1])]
+            count += len(data)
+
+            self.remove_extra_fields(data)
+            await write(data)
+
+        meta = dict(count=count)
+        meta.update(await self.get_meta_by_count(count))
+        meta.update(self.get_cursor_meta(edge_items, count))
+
+        return meta
 
     async def get_one(self):
+        return await self.load(self, 'one', partial(self.get_cached, 'one', self.fetch_one))
+
+    async def fetch_one(self):
         data = await self.get_data()
 
+        await self.extend_data_with_all_includes(data)
+        self.remove_extra_fields(data or [])
+
+        return data[0] if data else None
+
+    @staticmethod
+    def build_many(data, meta):
+        result = dict(data=data, meta=dict(count=len(data)))
+        result['meta'].update(meta)
+
+        return result
+
+    async def extend_data_with_all_includes(self, data):
         await asyncio.gather(*[
             self.extend_data_with_includes(data, name, params) for name, params in self._include.items()
         ])
 
-        return data[0] if data else None
-
     async def extend_data_with_includes(self, data, include_name, include_params):
         include_data = await self.get_list_include_data(data, self._available_includes[include_name], include_params)
         self.update_with_include_data(data, include_name, include_data)
@@ -98,6 +549,12 @@ class BaseDataProvider(ABC):
             item.update({include_name: include_data[i]})
 
     async def get_list_include_data(self, data, include_settings, include_params):
+        if include_settings.get('strategy', self.include_strategy) == self.INCLUDE_STRATEGY_BATCH:
+            return await self.get_batch_include_data(data, include_settings, include_params)
+
+        return await self.get_each_item_include_data(data, include_settings, include_params)
+
+    async def get_each_item_include_data(self, data, include_settings, include_params):
         result = []
 
         for item in data:
@@ -107,19 +564,95 @@ class BaseDataProvider(ABC):
         return result
 
     async def get_item_include_data(self, item, include_settings, include_params):
-        filters = include_params.get('filters', {})
+        # include params are shared between the items loaded concurrently
+        filters = dict(include_params.get('filters', {}))
 
-        assert 'relations' in include_settings, \
-            'Improperly configured include: missing relations settings for %s' % \
-            include_settings['data_provider_class'].__name__
-        for relation in include_settings['relations']:
-            root_field_name = relation['root_entity_field_name']
-            root_field = item.get(root_field_name)
-            if root_field is not None:
-                filters[relation['included_entity_field_name']] = root_field
-            else:
-                filters[relation['included_entity_field_name']] = root_field_name
+        self._check_include_relations(include_settings)
+        relations = include_settings['relations']
+        key = self._get_relation_key(item, relations, 'root_entity_field_name')
+        if key is not None:
+            for relation, value in zip(relations, key):
+                filters[relation['included_entity_field_name']] = value
 
+        data_provider = self.get_include_data_provider(include_settings, include_params, filters)
+
+        if key is None:
+            # the item has no relation key, so there are no included entities
+            meta = data_provider.build_total_count_meta(0)
+            meta['offset'] = (include_params.get('page') or {}).get('offset')
+            return self.build_many([], meta)
+
+        return await data_provider.get_many()
+
+    async def get_batch_include_data(self, data, include_settings, include_params):
+        """
+        Loads included entities for all the items with a single get_data call of the included data provider.
+
+        Pagination of included entities is applied per item (see get_paginated_include_data), so the result is
+        the same as the per_item strategy gives. Included entities of every item are limited by include_limit
+        if there is no page limit.
+        """
+        self._check_include_relations(include_settings)
+        relations = include_settings['relations']
+
+        item_keys = [self._get_relation_key(item, relations, 'root_entity_field_name') for item in data]
+        filters = dict(include_params.get('filters', {}))
+        for i, relation in enumerate(relations):
+            key_values = OrderedDict.fromkeys(key[i] for key in item_keys if key is not None)
+            filters[relation['included_entity_field_name']] = list(key_values)
+
+        page = include_params.get('page') or {}
+        data_provider = self.get_include_data_provider(
+            include_settings,
+            dict(include_params, page={'total_count': page.get('total_count')}),
+            filters
+        )
+        if any(key is not None for key in item_keys):
+            grouped_data, total_counts = await self.get_paginated_include_data(
+                data_provider,
+                relations,
+                page.get('offset') or 0,
+                page.get('limit') if page.get('limit') is not None else self.include_limit
+            )
+        else:
+            grouped_data, total_counts = {}, {}
+
+        pages = [grouped_data.get(key, []) if key is not None else [] for key in item_keys]
+
+        # every included entity gets its nested includes only once, even if it is shared between several items
+        unique_included_data = list(OrderedDict((id(item), item) for page_data in pages for item in page_data).values())
+        await data_provider.extend_data_with_all_includes(unique_included_data)
+        data_provider.remove_extra_fields(unique_included_data)
+
+        result = []
+        for page_data, key in zip(pages, item_keys):
+            meta = data_provider.build_total_count_meta(total_counts.get(key, 0))
+            meta['offset'] = page.get('offset')
+            result.append(self.build_many(page_data, meta))
+
+        return result
+
+    async def get_paginated_include_data(self, data_provider, relations, offset, limit):
+        """
+        Returns pages of the included entities and their total counts by relation keys.
+
+        All the included entities are loaded with get_data of the included data provider and paginated in Python.
+        """
+        included_data = await self.load(data_provider, 'data', data_provider.get_data)
+
+        grouped_data = {}
+        for included_item in included_data:
+            key = self._get_relation_key(included_item, relations, 'included_entity_field_name')
+            grouped_data.setdefault(key, []).append(included_item)
+
+        end = offset + limit if limit is not None else None
+        # the loaded items are shared with the other lookups of the request, so the includes are added to copies
+        pages = {key: [dict(item) for item in key_data[offset:end]] for key, key_data in grouped_data.items()}
+        total_counts = {key: len(key_data) for key, key_data in grouped_data.items()}
+
+        return pages, total_counts
+
+    def get_include_data_provider(self, include_settings, include_params, filters):
         init_params = dict(
             filters=filters,
             page=include_params.get('page'),
@@ -128,6 +661,15 @@ class BaseDataProvider(ABC):
             available_includes=include_params.get('available_includes')
         )
 
+        if include_params.get('fields'):
+            # relation keys are needed to distribute the included entities between the items
+            init_params['fields'] = include_params['fields']
+            init_params['required_fields'] = [
+                relation['included_entity_field_name'] for relation in include_settings.get('relations', [])
+            ]
+        if include_params.get('deferred_fields') is not None:
+            init_params['deferred_fields'] = include_params['deferred_fields']
+
         if 'data_provider_init_params' in include_settings:
             for init_param in include_settings['data_provider_init_params']:
                 assert hasattr(self, init_param['attribute_name']), \
@@ -135,6 +677,23 @@ class BaseDataProvider(ABC):
                     (init_param['attribute_name'], include_settings['data_provider_class'].__name__)
                 init_params[init_param['param_name']] = getattr(self, init_param['attribute_name'])
 
-        data_provider = include_settings['data_provider_class'](**init_params)
+        if self._loader is not None:
+            init_params['loader'] = self._loader
+        if self._deadline is not None:
+            init_params['deadline'] = self._deadline
+        if self._read_replica:
+            init_params['read_replica'] = self._read_replica
 
-        return await data_provider.get_many()
+        return include_settings['data_provider_class'](**init_params)
+
+    @staticmethod
+    def _check_include_relations(include_settings):
+        assert 'relations' in include_settings, \
+            'Improperly configured include: missing relations settings for %s' % \
+            include_settings['data_provider_class'].__name__
+
+    @staticmethod
+    def _get_relation_key(item, relations, field_name_key):
+        key = tuple(item.get(relation[field_name_key]) for relation in relations)
+
+        return key if None not in key else None
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+
+from aiohttp_baseapi.log import logger
+
+__all__ = (
+    'QueryCache',
+    'PlanCache',
+    'make_cache_key',
+    'estimate_size',
+    'query_cache',
+    'plan_cache',
+)
+
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'size', 'expires_at', 'stale_until', 'tags'])
+
+
+def _freeze(value):
+    if isinstance(value, Mapping):
+        return tuple(sorted(((str(key), _freeze(item)) for key, item in value.items()), key=lambda item: item[0]))
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(item) for item in value))
+
+    if isinstance(value, type):
+        return '{}.{}'.format(value.__module__, value.__qualname__)
+
+    return value
+
+
+def make_cache_key(*parts):
+    """
+    Builds a hashable key from request parameters: dicts (including multidicts) are compared regardless of
+    the order of the keys, lists are compared item by item.
+    """
+    return _freeze(parts)
+
+
+def estimate_size(value, sample_size=3):
+    """
+    Approximate length of the JSON representation of the value. Lists are estimated by their first sample_size
+    items, so big results are not walked (or serialized) as a whole.
+    """
+    if isinstance(value, str):
+        return len(value) + 2
+
+    if isinstance(value, Mapping):
+        return 2 + sum(len(str(key)) + 4 + estimate_size(item, sample_size) for key, item in value.items())
+
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return 2
+
+        sample = value[:sample_size]
+        item_size = sum(estimate_size(item, sample_size) for item in sample) // len(sample) + 1
+        return 2 + len(value) * item_size
+
+    return 8
+
+
+class QueryCache:
+    """
+    In-process cache of data provider results.
+
+    Entries live for the given TTL and are evicted in LRU order when there are more than max_entries of them
+    or their total size (estimated length of the JSON representation, see estimate_size) exceeds max_size.
+    After the TTL the entry is still returned during stale TTL while it is refreshed in the background.
+    Entries are tagged (with model names) to be invalidated on writes.
+    """
+
+    def __init__(self, max_entries=1000, max_size=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_size = max_size
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._refreshing = set()
+        self._tag_versions = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._size
+
+    def get_entry(self, key):
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            self._entries.move_to_end(key)
+
+        return entry
+
+    def get_tags_version(self, tags):
+        return tuple(self._tag_versions.get(tag, 0) for tag in tags)
+
+    def set(self, key, value, ttl, stale_ttl=0, tags=(), tags_version=None):
+        tags = tuple(sorted(tags))
+
+        if tags_version is not None and tags_version != self.get_tags_version(tags):
+            # the data was invalidated while it was being fetched
+            return
+
+        size = estimate_size(value)
+        if size > self.max_size:
+            return
+
+        self.delete(key)
+
+        now = time.monotonic()
+        self._entries[key] = CacheEntry(value, size, now + ttl, now + ttl + (stale_ttl or 0), tags)
+        self._size += size
+
+        while len(self._entries) > self.max_entries or self._size > self.max_size:
+            self.delete(next(iter(self._entries)))
+
+    def delete(self, key):
+        entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            self._size -= entry.size
+
+    def invalidate(self, tag):
+        self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+
+        for key, entry in list(self._entries.items()):
+            if tag in entry.tags:
+                self.delete(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    async def fetch(self, key, fetch, ttl, stale_ttl=0, tags=()):
+        tags = tuple(sorted(tags))
+        tags_version = self.get_tags_version(tags)
+
+        value = await fetch()
+        self.set(key, value, ttl, stale_ttl, tags, tags_version)
+
+        return value
+
+    async def _refresh(self, key, fetch, ttl, stale_ttl, tags):
+        try:
+            await self.fetch(key, fetch, ttl, stale_ttl, tags)
+        except Exception as e:
+            logger.exception('Refresh of the cache entry failed: %s', e)
+        finally:
+            self._refreshing.discard(key)
+
+    async def get_or_fetch(self, key, fetch, ttl, stale_ttl=0, tags=()):
+        entry = self.get_entry(key)
+        now = time.monotonic()
+
+        if entry is not None and now < entry.expires_at:
+            return entry.value
+
+        if entry is not None and now < entry.stale_until:
+            if key not in self._refreshing:
+                self._refreshing.add(key)
+                asyncio.ensure_future(self._refresh(key, fetch, ttl, stale_ttl, tags))
+            return entry.value
+
+        return await self.fetch(key, fetch, ttl, stale_ttl, tags)
+
+
+class PlanCache:
+    """
+    In-process LRU cache of compiled SQL statements keyed by the shape of the request.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+
+        self._plans = OrderedDict()
+
+    def __len__(self):
+        return len(self._plans)
+
+    def get(self, key):
+        plan = self._plans.get(key)
+
+        if plan is not None:
+            self._plans.move_to_end(key)
+
+        return plan
+
+    def set(self, key, plan):
+        self._plans[key] = plan
+        self._plans.move_to_end(key)
+
+        while len(self._plans) > self.max_entries:
+            self._plans.popitem(last=False)
+
+    def clear(self):
+        self._plans.clear()
+
+
+query_cache = QueryCache()
+plan_cache = PlanCache()
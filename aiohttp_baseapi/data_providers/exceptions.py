@@ -17,3 +17,11 @@ class DataProviderValidationError(DataProviderError):
 
 class DataProviderNotFoundError(DataProviderError):
     pass
+
+
+class DataProviderTimeoutError(DataProviderError):
+    pass
+
+
+class DataProviderUnavailableError(DataProviderError):
+    pass
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+from functools import partial
+
+import aiohttp
+import simplejson as json
+
+from aiohttp_baseapi.data_providers.base import BaseDataProvider
+from aiohttp_baseapi.data_providers.exceptions import DataProviderUnavailableError, DataProviderValidationError
+from aiohttp_baseapi.errors import ApiError
+from aiohttp_baseapi.response import json_dumps
+
+__all__ = (
+    'CircuitBreaker',
+    'HttpClient',
+    'HttpDataProvider',
+    'circuit_breakers',
+    'http_client',
+)
+
+
+class HttpClient:
+    """
+    The ClientSession shared by the HTTP data providers of the application. Its connections are kept alive
+    and reused, there are not more than limit of them and not more than limit_per_host to a single host.
+
+    Usage:
+        await http_client.start(limit_per_host=20)  # on startup
+        await http_client.close()  # on shutdown
+    """
+
+    def __init__(self, limit=100, limit_per_host=10, keepalive_timeout=30):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+
+        self._session = None
+
+    @property
+    def session(self):
+        assert self._session is not None, 'Please, start the HTTP client.'
+
+        return self._session
+
+    async def start(self, **params):
+        for name, value in params.items():
+            setattr(self, name, value)
+
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        self._session = aiohttp.ClientSession(connector=connector, json_serialize=json_dumps)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+http_client = HttpClient()
+
+
+class CircuitBreaker:
+    """
+    Stops the calls of a failing upstream: after failure_threshold failures in a row the circuit is open
+    and the calls fail at once. After reset_timeout seconds a single trial call is let through, its success
+    closes the circuit and its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self.opened_at = None
+        self._is_trial_running = False
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+
+        if self._is_trial_running or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+
+        self._is_trial_running = True
+
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._is_trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._is_trial_running = False
+
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Finishes the call which neither succeeded nor failed (e.g. it was cancelled).
+        """
+        self._is_trial_running = False
+
+
+# circuit breakers of the upstreams by their base urls
+circuit_breakers = {}
+
+
+class HttpDataProvider(BaseDataProvider):
+    """
+    A data provider of the list resource of another HTTP service (base_url + path).
+
+    Fields, filters, pagination and sort are passed to the upstream as the query parameters of this library
+    (fields=a,b&filter[a]=1,2&page[limit]=10&sort=-b), the upstream responds with {"data": [...], "meta":
+    {"total_count": ...}} (see parse_data and parse_total_count). Data and total count come from a single call.
+
+    Includes are loaded with the batch strategy: the keys of all the parents are passed in one filter. Filters with
+    more than batch_size values are split into chunks requested concurrently (the upstream should return all the
+    matching items when there is no limit), so the items are ordered within the chunks only.
+
+    Calls use the keep-alive connections of the shared http_client, are limited as the queries of other data
+    providers (see run_query) and are stopped by the circuit breaker of the upstream when it fails.
+    DataProviderUnavailableError is raised when the upstream is not reachable, fails, doesn't respond in
+    request_timeout or the circuit is open; only these failures count for the circuit breaker.
+    DataProviderValidationError is raised when the upstream rejects the request (4xx).
+    """
+
+    include_strategy = BaseDataProvider.INCLUDE_STRATEGY_BATCH
+
+    base_url = None
+    path = ''
+    batch_size = 100
+    request_timeout = 10
+
+    failure_threshold = 5
+    reset_timeout = 30
+
+    http_client = http_client
+    circuit_breakers = circuit_breakers
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._response = None
+
+    def get_url(self):
+        assert self.base_url is not None, 'Please, set base_url of {}.'.format(type(self).__name__)
+
+        return '{}/{}'.format(self.base_url.rstrip('/'), self.path.lstrip('/'))
+
+    def get_headers(self):
+        return {'Accept': 'application/json'}
+
+    def get_circuit_breaker(self):
+        circuit_breaker = self.circuit_breakers.get(self.base_url)
+
+        if circuit_breaker is None:
+            circuit_breaker = self.circuit_breakers[self.base_url] = CircuitBreaker(
+                self.failure_threshold, self.reset_timeout
+            )
+
+        return circuit_breaker
+
+    @staticmethod
+    def format_value(value):
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+
+        return str(value)
+
+    def get_query_params(self, filters, limit=None, offset=None):
+        params = []
+
+        fields = self.get_fields()
+        if fields:
+            fields += [field for field in self.get_required_fields() if field not in fields]
+            params.append(('fields', ','.join(fields)))
+
+        for name, value in filters.items():
+            values = value if isinstance(value, list) else [value]
+            params.append(('filter[{}]'.format(name), ','.join(self.format_value(item) for item in values)))
+
+        if self._sort:
+            params.append(('sort', ','.join(self._sort)))
+
+        if limit is not None:
+            params.append(('page[limit]', str(limit)))
+        if offset is not None:
+            params.append(('page[offset]', str(offset)))
+
+        return params
+
+    def split_filters(self, filters):
+        """
+        Splits the filters with more than batch_size values of a list filter into the filters of the chunks.
+        """
+        for name, value in filters.items():
+            if isinstance(value, list) and len(value) > self.batch_size:
+                return [
+                    dict(filters, **{name: value[i:i + self.batch_size]})
+                    for i in range(0, len(value), self.batch_size)
+                ]
+
+        return [filters]
+
+    def parse_data(self, body):
+        return body['data']
+
+    def parse_total_count(self, body):
+        return (body.get('meta') or {}).get('total_count')
+
+    def build_client_error(self, status, reason, text):
+        detail = 'Upstream responded with status {}: {}'.format(status, text)
+        return ApiError().BaseClientError(reason or 'Bad Request', detail)
+
+    async def fetch_json(self, params):
+        # the total timeout in seconds (not ClientTimeout) is accepted by all the supported aiohttp versions
+        request = self.http_client.session.get(self.get_url(), params=params, headers=self.get_headers(),
+                                               timeout=self.request_timeout)
+
+        try:
+            async with request as response:
+                if response.status >= 500:
+                    raise DataProviderUnavailableError('Upstream responded with status {}'.format(response.status))
+
+                if response.status >= 400:
+                    error = self.build_client_error(response.status, response.reason, await response.text())
+                    raise DataProviderValidationError(error)
+
+                return await response.json(loads=json.loads)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # the deadline of the request cancels the call, so the timeout here is request_timeout of the upstream
+            raise DataProviderUnavailableError(str(e) or type(e).__name__) from e
+
+    async def request(self, params):
+        circuit_breaker = self.get_circuit_breaker()
+
+        if not circuit_breaker.allow():
+            raise DataProviderUnavailableError('Circuit of {} is open'.format(self.base_url))
+
+        try:
+            body = await self.run_query(partial(self.fetch_json, params))
+        except DataProviderUnavailableError:
+            circuit_breaker.record_failure()
+            raise
+        except DataProviderValidationError:
+            # the upstream works, it has rejected the request
+            circuit_breaker.record_success()
+            raise
+        except BaseException:
+            # e.g. the deadline of the request, which is set by the client, is not a failure of the upstream
+            circuit_breaker.release()
+            raise
+
+        circuit_breaker.record_success()
+
+        return body
+
+    async def fetch_response(self):
+        if self.get_cursor() is not None:
+            error = ApiError().InvalidQueryParameter('Cursor pagination is not supported').Parameter('page')
+            raise DataProviderValidationError(error)
+
+        filters = await self.get_filters()
+        limit = await self.get_limit()
+        offset = await self.get_offset()
+
+        chunks = self.split_filters(filters) if limit is None and offset is None else [filters]
+        bodies = await asyncio.gather(*[
+            self.request(self.get_query_params(chunk_filters, limit, offset)) for chunk_filters in chunks
+        ])
+
+        total_counts = [self.parse_total_count(body) for body in bodies]
+
+        return dict(
+            data=[item for body in bodies for item in self.parse_data(body)],
+            total_count=sum(total_counts) if None not in total_counts else None
+        )
+
+    async def get_response(self):
+        """
+        Data and total count are shared by get_data and get_total_count, so the upstream is called only once.
+        """
+        if self._response is None:
+            self._response = asyncio.ensure_future(self.fetch_response())
+
+        return await self._response
+
+    async def get_data(self):
+        return [dict(item) for item in (await self.get_response())['data']]
+
+    async def get_total_count(self):
+        return (await self.get_response())['total_count']
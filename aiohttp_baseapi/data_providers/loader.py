@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+from collections import Counter
+from functools import partial
+import asyncio
+
+__all__ = (
+    'DATA_LOADER_REQUEST_KEY',
+    'ConcurrencyLimiter',
+    'DataLoader',
+    'LimiterSlot',
+    'SingleFlight',
+    'single_flight',
+    'worker_limiter',
+)
+
+DATA_LOADER_REQUEST_KEY = 'data_loader'
+
+
+class ConcurrencyLimiter:
+    """
+    Limits the number of calls running at the same time, the others wait in the FIFO queue.
+    There is no limit if it's None.
+    """
+
+    def __init__(self, limit=None):
+        self._limit = limit
+        self._semaphore = None
+
+    @property
+    def limit(self):
+        return self._limit
+
+    @limit.setter
+    def limit(self, limit):
+        self._limit = limit
+        self._semaphore = None
+
+    def get_semaphore(self):
+        if self._limit is None:
+            return None
+
+        # the semaphore is created lazily to be bound to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._limit)
+
+        return self._semaphore
+
+    def acquire(self):
+        """
+        Slot held by the async with block, for the calls which can't be wrapped by run (e.g. async generators).
+        """
+        return LimiterSlot(self)
+
+    async def run(self, fetch):
+        async with self.acquire():
+            return await fetch()
+
+
+class LimiterSlot:
+    """
+    Async context manager holding a slot of every limiter (acquired in order, released in the reverse one).
+    The slot can be released and acquired again inside the block.
+    """
+
+    def __init__(self, *limiters):
+        self._limiters = limiters
+        self._semaphores = []
+
+    async def acquire(self):
+        for limiter in self._limiters:
+            semaphore = limiter.get_semaphore()
+            if semaphore is None:
+                continue
+            try:
+                await semaphore.acquire()
+            except BaseException:
+                self.release()
+                raise
+            self._semaphores.append(semaphore)
+
+    def release(self):
+        while self._semaphores:
+            self._semaphores.pop().release()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+worker_limiter = ConcurrencyLimiter()
+
+
+class DataLoader:
+    """
+    Request-scoped memo of data provider results.
+
+    The first call with a key starts the loading, concurrent calls with the same key wait for it and later
+    calls get the result from memory. Failed loadings are not remembered.
+    Results are shared between the callers, so they shouldn't be changed.
+
+    Queries of the request (see run) are limited by the concurrency of the request and then by the limiter
+    of the worker, so a request doesn't take more than concurrency places in the worker queue. By default
+    the concurrency of the request is the worker_share of the worker limit, so one request can't take all
+    the worker places (i.e. all the connections of the pool) and starve the others.
+    """
+
+    worker_share = 0.5
+
+    def __init__(self, concurrency=None, limiter=worker_limiter):
+        if concurrency is None and limiter.limit is not None:
+            concurrency = max(1, int(limiter.limit * self.worker_share))
+
+        self._futures = {}
+        self._request_limiter = ConcurrencyLimiter(concurrency)
+        self._limiter = limiter
+
+    def __len__(self):
+        return len(self._futures)
+
+    def _forget_failed(self, key, future):
+        if future.cancelled() or future.exception() is not None:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    async def load(self, key, fetch):
+        future = self._futures.get(key)
+
+        if future is None:
+            future = self._futures[key] = asyncio.ensure_future(fetch())
+            future.add_done_callback(lambda done_future: self._forget_failed(key, done_future))
+
+        # a cancelled caller doesn't cancel the loading awaited by the others
+        return await asyncio.shield(future)
+
+    def clear(self):
+        self._futures.clear()
+
+    def cancel(self):
+        """
+        Cancels the loadings in progress, e.g. when the request is abandoned by the client.
+        """
+        for future in self._futures.values():
+            future.cancel()
+
+    async def run(self, fetch):
+        return await self._request_limiter.run(partial(self._limiter.run, fetch))
+
+    def acquire(self):
+        """
+        Slot of the request and of the worker held by the async with block, for the queries which can't be
+        wrapped by run.
+        """
+        return LimiterSlot(self._request_limiter, self._limiter)
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls of the worker: while a call with a key is in flight, the other calls
+    with the same key wait for its result instead of making their own. Nothing is kept after the call is done.
+    A cancelled caller doesn't cancel the call awaited by the others, the call is cancelled when all of them are.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._waiters = Counter()
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._futures)
+
+    def _forget(self, key, future):
+        if self._futures.get(key) is future:
+            del self._futures[key]
+
+    async def do(self, key, fetch):
+        future = self._futures.get(key)
+
+        if future is None:
+            future = self._futures[key] = asyncio.ensure_future(fetch())
+            future.add_done_callback(lambda done_future: self._forget(key, done_future))
+        else:
+            self.hits += 1
+
+        self._waiters[future] += 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+                if not future.done():
+                    # nobody waits for the result anymore
+                    self._forget(key, future)
+                    future.cancel()
+
+
+single_flight = SingleFlight()
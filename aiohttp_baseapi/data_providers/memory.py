@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import re
+from abc import abstractmethod
+from bisect import bisect_left, bisect_right
+
+from aiohttp_baseapi.data_providers.base import BaseDataProvider
+from aiohttp_baseapi.data_providers.exceptions import DataProviderValidationError
+from aiohttp_baseapi.data_providers.model import ComparisonFiltersMixin
+from aiohttp_baseapi.errors import ApiError
+from aiohttp_baseapi.filters import coerce_filter_value
+from aiohttp_baseapi.log import logger
+
+__all__ = (
+    'InMemoryDataset',
+    'InMemoryDataProvider',
+)
+
+
+class SortedIndex:
+    """
+    Positions of the items ordered by the values of a field. Every value has a rank (its number among the distinct
+    values), None values are ranked last.
+    """
+
+    def __init__(self, values):
+        self.values = sorted({value for value in values if value is not None})
+        self._ranks = {value: rank for rank, value in enumerate(self.values)}
+        self.null_rank = len(self.values)
+
+        self.position_ranks = [self.get_rank(value) for value in values]
+        self.positions = sorted(range(len(values)), key=self.position_ranks.__getitem__)
+        self.ranks = [self.position_ranks[position] for position in self.positions]
+
+    def get_rank(self, value):
+        """
+        Rank of the value, a value which is not in the index is ranked between its neighbours.
+        """
+        if value is None:
+            return self.null_rank
+
+        rank = self._ranks.get(value)
+        if rank is not None:
+            return rank
+
+        return bisect_left(self.values, value) - 0.5
+
+    def get_range(self, lower=None, upper=None):
+        """
+        Positions of the items with lower <= value <= upper, None values are not compared with anything.
+        """
+        start = bisect_left(self.ranks, self.get_rank(lower)) if lower is not None else 0
+        end = bisect_right(self.ranks, self.get_rank(upper)) if upper is not None else \
+            bisect_left(self.ranks, self.null_rank)
+
+        return self.positions[start:end]
+
+
+class InMemoryDataset:
+    """
+    The items of an in-memory data provider with hash indexes (value -> positions) of all the fields
+    and sorted indexes of the sortable ones.
+    """
+
+    def __init__(self, items):
+        self.items = [dict(item) for item in items]
+        self.fields = list(self.items[0]) if self.items else []
+
+        self.hash_indexes = {}
+        self.sorted_indexes = {}
+        self.field_types = {}
+
+        for field in self.fields:
+            values = [item.get(field) for item in self.items]
+            self.field_types[field] = next((type(value) for value in values if value is not None), None)
+
+            try:
+                hash_index = {}
+                for position, value in enumerate(values):
+                    hash_index.setdefault(value, []).append(position)
+                self.hash_indexes[field] = hash_index
+            except TypeError:
+                # values of the field (lists, dicts) are not indexed, so it can't be filtered or sorted by
+                continue
+
+            try:
+                self.sorted_indexes[field] = SortedIndex(values)
+            except TypeError:
+                # values of the field can't be compared, so it can be used in equality filters only
+                pass
+
+    def __len__(self):
+        return len(self.items)
+
+
+class InMemoryDataProvider(ComparisonFiltersMixin, BaseDataProvider):
+    """
+    A data provider for small and rarely changing reference data kept in memory of the worker.
+
+    The items are loaded by load_data (should be implemented) on start and reloaded every refresh_interval seconds.
+    Filters (with the same operators and semantics as in ModelDataProvider) are resolved with the indexes
+    of the dataset (the text search ones - by scanning of the distinct values), the items are sorted by the ranks
+    of the sorted indexes. Fields, pagination (including the cursor one), sort and includes work as
+    in ModelDataProvider, so the data providers are interchangeable.
+    """
+
+    include_strategy = BaseDataProvider.INCLUDE_STRATEGY_BATCH
+
+    pk_field = 'id'
+    refresh_interval = None
+
+    dataset = None
+    _refresh_task = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._positions = None
+
+    @classmethod
+    @abstractmethod
+    async def load_data(cls) -> list:
+        pass
+
+    @classmethod
+    async def refresh(cls):
+        cls.dataset = InMemoryDataset(await cls.load_data())
+        cls.query_cache.invalidate(cls.get_cache_tag())
+
+    @classmethod
+    async def _refresh_periodically(cls):
+        while True:
+            await asyncio.sleep(cls.refresh_interval)
+
+            try:
+                await cls.refresh()
+            except Exception as e:
+                # the previous dataset is served until the next refresh
+                logger.exception('Refresh of the %s dataset failed: %s', cls.__name__, e)
+
+    @classmethod
+    async def start(cls):
+        await cls.refresh()
+
+        if cls.refresh_interval:
+            cls._refresh_task = asyncio.ensure_future(cls._refresh_periodically())
+
+    @classmethod
+    async def stop(cls):
+        if cls._refresh_task is not None:
+            cls._refresh_task.cancel()
+            cls._refresh_task = None
+
+    def get_dataset(self):
+        assert self.dataset is not None, 'Please, load the data of {}.'.format(type(self).__name__)
+
+        return self.dataset
+
+    def coerce_value(self, field, value):
+        """
+        Converts the value (e.g. a string from the query) to the type of the field values.
+        """
+        return coerce_filter_value(self.get_dataset().field_types.get(field), value)
+
+    def match_text(self, operator, field_value, text):
+        """
+        Text search operators with the semantics of the ModelDataProvider ones: "prefix" is case-sensitive,
+        "contains" is not, "search" matches the values containing all the words of the text.
+        """
+        if not isinstance(field_value, str):
+            return False
+
+        if operator == self.COMPARISON_OPERATOR_PREFIX:
+            return field_value.startswith(text)
+
+        if operator == self.COMPARISON_OPERATOR_CONTAINS:
+            return text.casefold() in field_value.casefold()
+
+        return set(re.findall(r'\w+', text.lower())) <= set(re.findall(r'\w+', field_value.lower()))
+
+    def get_filter_positions(self, filter_field, filter_value):
+        dataset = self.get_dataset()
+        field = self.remove_comparison_suffix(filter_field)
+        operator = self.get_comparison_operator(filter_field, filter_value)
+
+        if operator in self.TEXT_SEARCH_OPERATORS:
+            # the distinct values are scanned, there are no text indexes
+            return {
+                position
+                for value, positions in dataset.hash_indexes[field].items()
+                if self.match_text(operator, value, str(filter_value))
+                for position in positions
+            }
+
+        try:
+            if operator == self.COMPARISON_OPERATOR_IN:
+                values = [self.coerce_value(field, value) for value in filter_value]
+            else:
+                value = self.coerce_value(field, filter_value)
+        except (TypeError, ValueError):
+            detail = 'Invalid filter value - "{}"'.format(filter_value)
+            error = ApiError().InvalidQueryParameter(detail).Parameter('filter[{}]'.format(filter_field))
+            raise DataProviderValidationError(error)
+
+        hash_index = dataset.hash_indexes[field]
+
+        if operator == self.COMPARISON_OPERATOR_EQ:
+            return set(hash_index.get(value, ()))
+
+        if operator == self.COMPARISON_OPERATOR_IN:
+            return {position for value in values for position in hash_index.get(value, ())}
+
+        if operator == self.COMPARISON_OPERATOR_NE:
+            return set(range(len(dataset))) - set(hash_index.get(value, ())) - set(hash_index.get(None, ()))
+
+        sorted_index = dataset.sorted_indexes[field]
+        if operator == self.COMPARISON_OPERATOR_LTE:
+            return set(sorted_index.get_range(upper=value))
+
+        return set(sorted_index.get_range(lower=value))
+
+    async def get_positions(self):
+        """
+        Positions of the filtered items, unknown filters are ignored. They are shared by get_data
+        and get_total_count, so the filters are resolved once.
+        """
+        if self._positions is None:
+            self._positions = asyncio.ensure_future(self.get_filtered_positions())
+
+        return await self._positions
+
+    async def get_filtered_positions(self):
+        dataset = self.get_dataset()
+
+        filter_positions = [
+            self.get_filter_positions(filter_field, filter_value)
+            for filter_field, filter_value in (await self.get_filters()).items()
+            if self.remove_comparison_suffix(filter_field) in dataset.hash_indexes
+        ]
+
+        if not filter_positions:
+            return range(len(dataset))
+
+        filter_positions.sort(key=len)
+
+        return filter_positions[0].intersection(*filter_positions[1:])
+
+    def get_cursor_fields(self):
+        fields = super().get_cursor_fields()
+
+        if self.pk_field not in [field.lstrip('-') for field in fields]:
+            fields.append('-' + self.pk_field if fields and fields[-1].startswith('-') else self.pk_field)
+
+        return fields
+
+    def get_sort_indexes(self):
+        """
+        Returns (sign, field, sorted index) of every sort field, the sign is -1 for the descending order.
+        """
+        cursor = self.get_cursor()
+        is_reversed = cursor is not None and cursor[0] == self.CURSOR_BEFORE
+        sort_fields = self.get_cursor_fields() if cursor is not None else self._sort
+
+        result = []
+        for sort_field in sort_fields:
+            field = sort_field.lstrip('-')
+            sign = -1 if sort_field.startswith('-') != is_reversed else 1
+            result.append((sign, field, self.get_dataset().sorted_indexes[field]))
+
+        return result
+
+    async def get_sorted_positions(self):
+        positions = await self.get_positions()
+        sort_indexes = self.get_sort_indexes()
+
+        if not sort_indexes:
+            return sorted(positions)
+
+        def get_sort_key(position):
+            return tuple(sign * sorted_index.position_ranks[position] for sign, _, sorted_index in sort_indexes)
+
+        positions = sorted(positions, key=get_sort_key)
+
+        cursor = self.get_cursor()
+        if cursor is not None and cursor[1]:
+            if len(cursor[1]) != len(sort_indexes):
+                error = ApiError().InvalidQueryParameter('Cursor is not valid').Parameter('page[{}]'.format(cursor[0]))
+                raise DataProviderValidationError(error)
+
+            cursor_key = tuple(
+                sign * sorted_index.get_rank(self.coerce_value(field, value))
+                for (sign, field, sorted_index), value in zip(sort_indexes, cursor[1])
+            )
+            positions = positions[bisect_right([get_sort_key(position) for position in positions], cursor_key):]
+
+        return positions
+
+    def get_item_fields(self):
+        fields = self.get_fields()
+
+        if fields:
+            return fields + [field for field in self.get_required_fields() if field not in fields]
+
+        deferred_fields = set(self._deferred_fields) - set(self.get_required_fields())
+
+        return [field for field in self.get_dataset().fields if field not in deferred_fields]
+
+    async def get_data(self):
+        items = self.get_dataset().items
+        positions = await self.get_sorted_positions()
+
+        offset = await self.get_offset() or 0
+        limit = await self.get_limit()
+        positions = positions[offset:offset + limit if limit is not None else None]
+
+        fields = self.get_item_fields()
+        data = [{field: items[position].get(field) for field in fields} for position in positions]
+
+        cursor = self.get_cursor()
+        if cursor is not None and cursor[0] == self.CURSOR_BEFORE:
+            # items before the cursor are selected in the reversed order
+            data.reverse()
+
+        return data
+
+    async def get_total_count(self):
+        # the items before (after) the cursor are counted too
+        return len(await self.get_positions())
@@ -1,15 +1,30 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+import math
 import operator as op
-import re
+import uuid
+from collections import OrderedDict
+from functools import partial
 
-from sqlalchemy.sql.operators import in_op
-from sqlalchemy import select, func
+from sqlalchemy.sql.operators import like_op, ilike_op
+from sqlalchemy import select, func, tuple_, and_, or_, bindparam, any_, cast, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from aiosqlalchemy_miniorm import BaseModelManager, OrderBy
 
 from aiohttp_baseapi.data_providers.base import BaseDataProvider
+from aiohttp_baseapi.data_providers.cache import plan_cache
+from aiohttp_baseapi.data_providers.exceptions import DataProviderValidationError
+from aiohttp_baseapi.data_providers.replicas import replica_router
+from aiohttp_baseapi.decorators import cachedproperty
+from aiohttp_baseapi.errors import ApiError
+from aiohttp_baseapi.filters import (
+    InvalidFilterValueError,
+    TEXT_SEARCH_FILTER_OPERATORS,
+    coerce_filter_value,
+    parse_filter_name
+)
 
 __all__ = (
     'ComparisonFiltersMixin',
@@ -17,6 +32,33 @@ __all__ = (
 )
 
 
+# the default escape character of LIKE patterns in PostgreSQL
+LIKE_ESCAPE_CHAR = '\\'
+
+
+def escape_like(value):
+    for char in (LIKE_ESCAPE_CHAR, '%', '_'):
+        value = value.replace(char, LIKE_ESCAPE_CHAR + char)
+
+    return value
+
+
+def any_op(column, values):
+    # the list is bound as a single array, so the statement doesn't depend on the number of values
+    if isinstance(values, list):
+        values = bindparam(None, values)
+
+    return column == any_(cast(values, ARRAY(column.type)))
+
+
+def search_op(column, text, config='simple'):
+    # the configuration is a literal, so the expression matches the one of the index, e.g.
+    # CREATE INDEX ... USING gin (to_tsvector('simple'::regconfig, name))
+    config = literal_column("'{}'::regconfig".format(config))
+
+    return func.to_tsvector(config, column).op('@@')(func.plainto_tsquery(config, text))
+
+
 class ComparisonFiltersMixin:
 
     COMPARISON_OPERATOR_LTE = 'lte'
@@ -24,55 +66,219 @@ class ComparisonFiltersMixin:
     COMPARISON_OPERATOR_IN = 'in'
     COMPARISON_OPERATOR_EQ = 'eq'
     COMPARISON_OPERATOR_NE = 'ne'
+    COMPARISON_OPERATOR_PREFIX = 'prefix'
+    COMPARISON_OPERATOR_CONTAINS = 'contains'
+    COMPARISON_OPERATOR_SEARCH = 'search'
+
+    TEXT_SEARCH_OPERATORS = TEXT_SEARCH_FILTER_OPERATORS
 
-    COMPARISON_SIGNS = '|'.join([
-        COMPARISON_OPERATOR_LTE,
-        COMPARISON_OPERATOR_GTE,
-        COMPARISON_OPERATOR_NE
-    ])
+    # LIKE patterns of the searched text (escaped)
+    LIKE_PATTERNS = {
+        COMPARISON_OPERATOR_PREFIX: '{}%',
+        COMPARISON_OPERATOR_CONTAINS: '%{}%',
+    }
 
     filter_operators = {
         COMPARISON_OPERATOR_GTE: op.ge,
         COMPARISON_OPERATOR_LTE: op.le,
         COMPARISON_OPERATOR_EQ: op.eq,
         COMPARISON_OPERATOR_NE: op.ne,
-        COMPARISON_OPERATOR_IN: in_op
+        COMPARISON_OPERATOR_IN: any_op,
+        COMPARISON_OPERATOR_PREFIX: like_op,
+        COMPARISON_OPERATOR_CONTAINS: ilike_op,
+        COMPARISON_OPERATOR_SEARCH: search_op,
     }
 
     def remove_comparison_suffix(self, filter_name):
-        return re.sub('__({})$'.format(self.COMPARISON_SIGNS), '', filter_name)
+        return parse_filter_name(filter_name)[0]
 
     def get_comparison_operator(self, filter_name, filter_value):
-        found_operator = re.search('__({})$'.format(self.COMPARISON_SIGNS), filter_name)
+        operator = parse_filter_name(filter_name)[1]
 
-        if found_operator:
-            return found_operator.group(1)
+        if operator is not None:
+            return operator
 
         return self.COMPARISON_OPERATOR_IN if isinstance(filter_value, list) else self.COMPARISON_OPERATOR_EQ
 
+    def coerce_filter(self, filter_name, python_type, filter_value):
+        """
+        Converts the filter value (or every value of the list) to python_type, invalid values are reported
+        as validation errors instead of database ones.
+        """
+        try:
+            if isinstance(filter_value, list):
+                return [coerce_filter_value(python_type, value) for value in filter_value]
+
+            return coerce_filter_value(python_type, filter_value)
+        except InvalidFilterValueError:
+            detail = 'Invalid filter value - "{}"'.format(filter_value)
+            error = ApiError().InvalidQueryParameter(detail).Parameter('filter[{}]'.format(filter_name))
+            raise DataProviderValidationError(error)
+
+    def get_filter_value(self, operator, filter_value):
+        """
+        The value passed to the filter operator: LIKE pattern for the prefix and contains operators.
+        """
+        pattern = self.LIKE_PATTERNS.get(operator)
+
+        if pattern is None:
+            return filter_value
+
+        return pattern.format(escape_like(str(filter_value)))
+
 
 class ModelDataProvider(ComparisonFiltersMixin, BaseDataProvider):
     """
     A ready-to-use data provider working with database via aiosqlalchemy_miniorm.
+
+    Filter values are converted to the python types of the columns (invalid ones are reported as validation
+    errors), lists are bound as a single array parameter ("column = ANY(CAST(:param AS type[]))"), so the statements
+    don't depend on the number of the values.
+
+    Includes are loaded with the batch strategy by default: one query with "= ANY" filter per include.
+    To-one includes (relations point to the primary key of the included model) with the join strategy are loaded
+    by the root query itself: the included table is LEFT JOINed (include filters are a part of the join condition)
+    and its columns are selected with "__<include name>__" prefixed labels. Other includes with the join strategy
+    are loaded with the batch one.
+    Batch includes with limit or offset are paginated per parent by the database: the single query numbers
+    the included rows of every parent with "row_number() OVER (PARTITION BY <relation fields>)" and counts them
+    with "count(*) OVER (PARTITION BY ...)".
+
+    Besides the query modes of BaseDataProvider there is the window mode: data and total count are selected
+    with a single statement using "count(*) OVER ()".
+
+    Estimated total count is taken from the PostgreSQL planner ("EXPLAIN" of the filtered query).
+
+    In the cursor pagination mode the primary key is added to the sort fields as a tie-breaker and the cursor
+    is turned into the "(sort columns) > (cursor values)" condition. The total count queries don't have
+    this condition (see get_count_where_list), the window mode isn't used with cursors.
+
+    iter_data reads rows by batches from a server-side cursor ("DECLARE ... CURSOR" in a transaction).
+
+    With use_plan_cache the data and total count statements are compiled once per request shape (fields,
+    filters with operators, sort, cursor and presence of limit and offset) with bound parameters instead of
+    the values. Such plans are built from the request parameters, so get_filters, get_where_list, get_limit and
+    get_offset overrides are not applied to them.
+
+    Text search operators: "prefix" is compiled to "LIKE 'text%'" (can use a btree index with text_pattern_ops),
+    "contains" - to "ILIKE '%text%'" (can use a pg_trgm GIN index), "search" - to
+    "to_tsvector('simple', field) @@ plainto_tsquery('simple', text)" (can use a GIN index of the same expression;
+    override the operator in filter_operators with partial(search_op, config=...) for another configuration).
+
+    Aggregated data (see BaseDataProvider) is selected with a single "GROUP BY" query, the filters are applied
+    to the items, sort and pagination - to the groups.
+
+    With read_replica the reads (data, counts and includes) are made on the engines of replica_router,
+    the writes are always made on the primary engine (the one the model is bound to).
     """
 
+    QUERY_MODE_WINDOW = 'window'
+
+    INCLUDE_STRATEGY_JOIN = 'join'
+    JOIN_LABEL_TEMPLATE = '__{}__{}'
+
+    PLAN_DATA = 'data'
+    PLAN_COUNT = 'count'
+
+    TOTAL_COUNT_COLUMN_LABEL = '__total_count'
+    ROW_NUMBER_COLUMN_LABEL = '__row_number'
+    PARTITION_COUNT_COLUMN_LABEL = '__partition_count'
+
     model = None
 
+    include_strategy = BaseDataProvider.INCLUDE_STRATEGY_BATCH
+
+    plan_cache = plan_cache
+    use_plan_cache = False
+
+    replica_router = replica_router
+
+    aggregate_functions = {
+        'count': func.count,
+        'sum': func.sum,
+        'avg': func.avg,
+        'min': func.min,
+        'max': func.max,
+    }
+
+    @classmethod
+    def get_cache_tag(cls):
+        return cls.model.table.name
+
     def _get_table_field(self, field_name):
         return getattr(self.model, self.remove_comparison_suffix(field_name))
 
+    @staticmethod
+    def get_column_python_type(column):
+        """
+        Python type of the filter values of the column, None if the values are not converted (e.g. JSON or arrays).
+        """
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return None
+
+        return python_type if not issubclass(python_type, (dict, list, tuple)) else None
+
+    def get_bound_filter_value(self, field_name, operator, column, field_value):
+        """
+        The filter value converted to the python type of the column (the pattern for the LIKE operators).
+        """
+        if operator not in self.TEXT_SEARCH_OPERATORS:
+            field_value = self.coerce_filter(field_name, self.get_column_python_type(column), field_value)
+
+        return self.get_filter_value(operator, field_value)
+
     def get_field_where(self, field_name, field_value):
         operator = self.get_comparison_operator(field_name, field_value)
+        column = self._get_table_field(field_name)
 
-        return self.filter_operators[operator](self._get_table_field(field_name), field_value)
+        return self.filter_operators[operator](
+            column, self.get_bound_filter_value(field_name, operator, column, field_value)
+        )
 
     async def get_sort(self):
+        cursor = self.get_cursor()
+        is_reversed = cursor is not None and cursor[0] == self.CURSOR_BEFORE
+        sort_fields = self.get_cursor_fields() if cursor is not None else self._sort
+
         sort = []
-        for sort_field in self._sort:
-            sort_order = BaseModelManager.SORT_DOWN if sort_field.startswith('-') else BaseModelManager.SORT_UP
+        for sort_field in sort_fields:
+            is_descending = sort_field.startswith('-') != is_reversed
+            sort_order = BaseModelManager.SORT_DOWN if is_descending else BaseModelManager.SORT_UP
             sort.append(OrderBy(sort_field.strip('-'), sort_order))
         return sort
 
+    def get_cursor_fields(self):
+        fields = super().get_cursor_fields()
+        pk_field = self.model.pk_column.key
+
+        if pk_field not in [field.lstrip('-') for field in fields]:
+            fields.append('-' + pk_field if fields and fields[-1].startswith('-') else pk_field)
+
+        return fields
+
+    def get_cursor_where(self, direction, values):
+        fields = self.get_cursor_fields()
+
+        if len(values) != len(fields):
+            error = ApiError().InvalidQueryParameter('Cursor is not valid').Parameter('page[{}]'.format(direction))
+            raise DataProviderValidationError(error)
+
+        columns = [self.model.table.columns[field.lstrip('-')] for field in fields]
+        is_forward = [field.startswith('-') == (direction == self.CURSOR_BEFORE) for field in fields]
+
+        if len(set(is_forward)) == 1:
+            # all the columns are sorted in the same direction, so the index-friendly row comparison can be used
+            return tuple_(*columns) > tuple_(*values) if is_forward[0] else tuple_(*columns) < tuple_(*values)
+
+        conditions = []
+        for i, column in enumerate(columns):
+            comparison = column > values[i] if is_forward[i] else column < values[i]
+            conditions.append(and_(*[columns[j] == values[j] for j in range(i)] + [comparison]))
+
+        return or_(*conditions)
+
     async def get_sort_field(self):
         sort_list = await self.get_sort()
         if sort_list:
@@ -87,13 +293,21 @@ class ModelDataProvider(ComparisonFiltersMixin, BaseDataProvider):
         fields = super().get_fields()
 
         if fields:
+            fields += [field for field in self.get_required_fields() if field not in fields]
             return [self._get_table_field(field) for field in fields]
 
-        return list(self.model.columns)
+        return self.get_default_columns()
 
-    async def get_where_list(self):
+    def get_default_columns(self):
+        """
+        Columns retrieved when no fields are requested: all the columns except the deferred ones.
+        """
+        deferred_fields = set(self._deferred_fields) - set(self.get_required_fields())
+
+        return [column for column in self.model.columns if column.key not in deferred_fields]
+
+    def get_filters_where_list(self, filters):
         result = []
-        filters = await self.get_filters()
 
         for filter_field, filter_value in filters.items():
             if hasattr(self.model, self.remove_comparison_suffix(filter_field)):
@@ -101,27 +315,630 @@ class ModelDataProvider(ComparisonFiltersMixin, BaseDataProvider):
 
         return result
 
-    def _get_query(self):
-        return select(self.get_columns()).select_from(self.model.table)
+    async def get_count_where_list(self):
+        """
+        Conditions of the total count: the filters without the cursor.
+        """
+        return self.get_filters_where_list(await self.get_filters())
 
-    async def get_data(self):
-        rows = await self.model.objects.get_items(
-            query=self._get_query(),
+    async def get_where_list(self):
+        result = await self.get_count_where_list()
+
+        cursor = self.get_cursor()
+        if cursor is not None and cursor[1]:
+            result.append(self.get_cursor_where(*cursor))
+
+        return result
+
+    def _is_joinable_include(self, include_settings, include_params, joined_tables):
+        if include_settings.get('strategy', self.include_strategy) != self.INCLUDE_STRATEGY_JOIN:
+            return False
+
+        included_model = getattr(include_settings.get('data_provider_class'), 'model', None)
+        if included_model is None or included_model.table is self.model.table or included_model.table in joined_tables:
+            return False
+
+        page = include_params.get('page') or {}
+        if page.get('offset') or page.get('limit') == 0:
+            return False
+
+        self._check_include_relations(include_settings)
+        included_fields = [relation['included_entity_field_name'] for relation in include_settings['relations']]
+
+        return included_fields == [included_model.pk_column.key]
+
+    @cachedproperty
+    def join_includes(self):
+        """
+        Included data providers of the includes loaded by the root query.
+        """
+        result = OrderedDict()
+
+        for include_name, include_params in self._include.items():
+            include_settings = self._available_includes[include_name]
+            joined_tables = [data_provider.model.table for data_provider in result.values()]
+
+            if self._is_joinable_include(include_settings, include_params, joined_tables):
+                result[include_name] = self.get_include_data_provider(
+                    include_settings,
+                    include_params,
+                    include_params.get('filters', {})
+                )
+
+        return result
+
+    def _get_join_fields(self, include_name):
+        data_provider = self.join_includes[include_name]
+        fields = data_provider.get_fields() or [column.key for column in data_provider.get_default_columns()]
+        # the primary key tells if there is a joined entity
+        required_fields = [data_provider.model.pk_column.key] + data_provider.get_required_fields()
+
+        return fields + [field for field in OrderedDict.fromkeys(required_fields) if field not in fields]
+
+    def _get_query(self):
+        columns = self.get_columns()
+        from_clause = self.model.table
+
+        for include_name, data_provider in self.join_includes.items():
+            relations = self._available_includes[include_name]['relations']
+            conditions = [
+                data_provider._get_table_field(relation['included_entity_field_name']) ==
+                self._get_table_field(relation['root_entity_field_name'])
+                for relation in relations
+            ]
+            conditions += data_provider.get_filters_where_list(dict(data_provider._filters))
+            from_clause = from_clause.outerjoin(data_provider.model.table, and_(*conditions))
+
+            columns += [
+                data_provider._get_table_field(field).label(self.JOIN_LABEL_TEMPLATE.format(include_name, field))
+                for field in self._get_join_fields(include_name)
+            ]
+
+        return select(columns).select_from(from_clause)
+
+    async def set_statement_timeout(self, connection):
+        """
+        Limits the statements of the current transaction of the connection with the time left before the deadline.
+        """
+        timeout = self.get_timeout()
+
+        if timeout is not None:
+            statement_timeout = '{:d}ms'.format(math.ceil(timeout * 1000))
+            await connection.execute(select([func.set_config('statement_timeout', statement_timeout, True)]))
+
+    def is_replica_usable(self):
+        return self._read_replica and len(self.replica_router) > 0
+
+    def acquire(self, read=False):
+        """
+        Acquires a connection of a read replica for the reads if replicas can be used, of the primary otherwise.
+        """
+        if read and self.is_replica_usable():
+            return self.replica_router.acquire()
+
+        return self.model.objects.engine.acquire()
+
+    async def run_model_query(self, fetch, objects=None, read=False):
+        """
+        Runs fetch(objects) with the model manager (model.objects by default) as a query (see run_query).
+        A query still running at the deadline is cancelled by run_query, and the connection cancels it
+        in the database, so there are no extra statements per query (the statement_timeout of the connections
+        set once by the application bounds the queries which aren't cancelled).
+        """
+        objects = objects if objects is not None else self.model.objects
+
+        if read and self.is_replica_usable():
+            def fetch_with_connection(connection):
+                replica_objects = objects.new_instance()
+                # the manager runs the queries with its transaction connection if there is one
+                replica_objects.transaction_connection = connection
+                return fetch(replica_objects)
+
+            return await self.run_connection_query(fetch_with_connection, read)
+
+        return await self.run_query(partial(fetch, objects))
+
+    async def run_connection_query(self, fetch, read=False):
+        """
+        Runs fetch(connection) with a connection (see acquire) as a query (see run_model_query).
+        """
+        async def run():
+            async with self.acquire(read) as connection:
+                return await fetch(connection)
+
+        return await self.run_query(run)
+
+    async def _get_items(self, query):
+        return await self.run_model_query(op.methodcaller(
+            'get_items',
+            query=query,
             where_list=await self.get_where_list(),
             limit=await self.get_limit(),
             offset=await self.get_offset(),
             order_by=await self.get_sort()
+        ), read=True)
+
+    def _get_data_from_rows(self, rows):
+        data = [dict(row) for row in rows]
+
+        cursor = self.get_cursor()
+        if cursor is not None and cursor[0] == self.CURSOR_BEFORE:
+            # items before the cursor are selected in the reversed order
+            data.reverse()
+
+        return data
+
+    def is_plan_usable(self):
+        # filters of joined includes are not bound as plan parameters
+        return self.use_plan_cache and not self.join_includes and not self.is_aggregated()
+
+    def get_aggregated_columns(self):
+        """
+        Returns columns of the aggregated data by their names: the group by fields and the aggregated values.
+        """
+        columns = OrderedDict((field, self._get_table_field(field)) for field in self._group_by)
+
+        for function, fields in self._aggregate.items():
+            for field in fields:
+                label = self.AGGREGATE_LABEL_TEMPLATE.format(field, function)
+                columns[label] = self.aggregate_functions[function](self._get_table_field(field)).label(label)
+
+        return columns
+
+    async def get_aggregated_query(self):
+        columns = self.get_aggregated_columns()
+        query = select(list(columns.values())).select_from(self.model.table)
+
+        for where in await self.get_where_list():
+            query = query.where(where)
+
+        return query.group_by(*[columns[field] for field in self._group_by])
+
+    async def get_aggregated_rows(self):
+        columns = self.get_aggregated_columns()
+
+        order_by = []
+        for sort in await self.get_sort():
+            column = columns[sort.field]
+            order_by.append(column.desc() if sort.order == BaseModelManager.SORT_DOWN else column.asc())
+
+        query = (await self.get_aggregated_query()) \
+            .order_by(*order_by) \
+            .offset(await self.get_offset()) \
+            .limit(await self.get_limit())
+
+        objects = self.model.objects.new_instance()
+
+        return await self.run_model_query(op.methodcaller('fetchall', query), objects, read=True)
+
+    async def get_data(self):
+        if self.is_aggregated():
+            fetch = op.methodcaller('get_aggregated_rows')
+        elif self.is_plan_usable():
+            fetch = op.methodcaller('execute_plan', self.PLAN_DATA, BaseModelManager.FETCH_ALL)
+        else:
+            fetch = op.methodcaller('_get_items', self._get_query())
+
+        # rows can be shared with the coalesced calls, but every data provider gets its own dicts
+        rows = await self.coalesce('data', fetch)
+
+        return self._get_data_from_rows(rows)
+
+    def get_plan_key(self, kind):
+        cursor = self.get_cursor()
+
+        return (
+            kind,
+            type(self),
+            tuple(self.get_fields()),
+            tuple(self.get_required_fields()),
+            tuple(self._deferred_fields),
+            tuple((name, isinstance(value, list)) for name, value in dict(self._filters).items()),
+            tuple(self._sort),
+            (cursor[0], len(cursor[1])) if cursor is not None and kind == self.PLAN_DATA else None,
+            self._page.get('limit') is not None,
+            bool(self._page.get('offset')),
         )
 
-        return [dict(row) for row in rows]
+    def get_plan_params(self, kind=PLAN_DATA):
+        params = {}
+
+        for i, (filter_field, filter_value) in enumerate(dict(self._filters).items()):
+            if hasattr(self.model, self.remove_comparison_suffix(filter_field)):
+                operator = self.get_comparison_operator(filter_field, filter_value)
+                column = self._get_table_field(filter_field)
+                filter_value = self.get_bound_filter_value(filter_field, operator, column, filter_value)
+
+            params['filter_{}'.format(i)] = filter_value
+
+        cursor = self.get_cursor()
+        if cursor is not None and kind == self.PLAN_DATA:
+            params.update(('cursor_{}'.format(i), value) for i, value in enumerate(cursor[1]))
+
+        params.update(limit=self._page.get('limit'), offset=self._page.get('offset'))
+
+        return params
+
+    def get_plan_where_list(self, kind=PLAN_DATA):
+        result = []
+
+        for i, (filter_field, filter_value) in enumerate(dict(self._filters).items()):
+            if not hasattr(self.model, self.remove_comparison_suffix(filter_field)):
+                continue
+
+            column = self._get_table_field(filter_field)
+            operator = self.get_comparison_operator(filter_field, filter_value)
+            # lists are cast to arrays of the column type by the operator
+            param_type = column.type if operator != self.COMPARISON_OPERATOR_IN else None
+            result.append(self.filter_operators[operator](column, bindparam('filter_{}'.format(i), type_=param_type)))
+
+        cursor = self.get_cursor()
+        if cursor is not None and cursor[1] and kind == self.PLAN_DATA:
+            values = [bindparam('cursor_{}'.format(i)) for i in range(len(cursor[1]))]
+            result.append(self.get_cursor_where(cursor[0], values))
+
+        return result
+
+    async def build_plan(self, kind):
+        query = self._get_query()
+        manager = self.model.objects.new_instance()
+
+        if kind == self.PLAN_COUNT:
+            query = query.with_only_columns([func.count(self.model.pk_column)])
+            return str(self._compile(manager.set_sql(query).where(self.get_plan_where_list(kind)).get_sql()))
+
+        query = manager.set_sql(query).where(self.get_plan_where_list()).order_by(await self.get_sort()).get_sql()
+        if self._page.get('offset'):
+            query = query.offset(bindparam('offset'))
+        if self._page.get('limit') is not None:
+            query = query.limit(bindparam('limit'))
+
+        return str(self._compile(query))
+
+    async def get_plan(self, kind):
+        key = self.get_plan_key(kind)
+        plan = self.plan_cache.get(key)
+
+        if plan is None:
+            plan = await self.build_plan(kind)
+            self.plan_cache.set(key, plan)
+
+        return plan
+
+    async def execute_plan(self, kind, fetch):
+        plan = await self.get_plan(kind)
+
+        async def execute(connection):
+            result = await connection.execute(plan, self.get_plan_params(kind))
+            return await BaseModelManager.fetch_from_result_proxy(result, fetch)
+
+        return await self.run_connection_query(execute, read=True)
+
+    def _compile(self, query):
+        return query.compile(dialect=self.model.objects.engine.dialect, compile_kwargs={'render_postcompile': True})
+
+    async def _build_items_query(self, query):
+        return self.model.objects.new_instance().set_sql(query) \
+            .where(await self.get_where_list()) \
+            .order_by(await self.get_sort()) \
+            .offset(await self.get_offset() or 0) \
+            .limit(await self.get_limit()) \
+            .get_sql()
+
+    async def iter_data(self, batch_size=None):
+        cursor = self.get_cursor()
+        if cursor is not None and cursor[0] == self.CURSOR_BEFORE:
+            # rows before the cursor are selected in the reversed order, so they can't be streamed
+            async for data in super().iter_data(batch_size):
+                yield data
+            return
+
+        batch_size = batch_size or self.stream_batch_size
+        if self.is_plan_usable():
+            statement, params = await self.get_plan(self.PLAN_DATA), self.get_plan_params()
+        else:
+            compiled = self._compile(await self._build_items_query(self._get_query()))
+            statement, params = str(compiled), compiled.params
+        cursor_name = 'data_provider_{}'.format(uuid.uuid4().hex)
+
+        # the cursor is a query running until the last batch is read, so it holds its slot all this time except
+        # while a batch is handled: the queries of the batch (e.g. its includes) need the slots of the same limiters
+        slot = self.acquire_query_slot()
+        async with slot, self.acquire(read=True) as connection:
+            async with connection.begin():
+                await self.set_statement_timeout(connection)
+                await connection.execute('DECLARE {} NO SCROLL CURSOR FOR {}'.format(cursor_name, statement), params)
+
+                while True:
+                    result = await connection.execute('FETCH FORWARD {:d} FROM {}'.format(batch_size, cursor_name))
+                    rows = await result.fetchall()
+
+                    if rows:
+                        slot.release()
+                        yield [dict(row) for row in rows]
+                        await slot.acquire()
+
+                    if len(rows) < batch_size:
+                        break
+
+    async def get_data_with_total_count(self):
+        total_count_column = func.count().over().label(self.TOTAL_COUNT_COLUMN_LABEL)
+        rows = await self._get_items(self._get_query().column(total_count_column))
+
+        data = self._get_data_from_rows(rows)
+        total_count = data[0][self.TOTAL_COUNT_COLUMN_LABEL] if data else None
+        for item in data:
+            del item[self.TOTAL_COUNT_COLUMN_LABEL]
+
+        if total_count is None:
+            # there are no rows on the page: total count is unknown only if the page is out of range
+            total_count = await self.get_total_count() if await self.get_offset() else 0
+
+        return data, total_count
+
+    async def get_data_and_meta(self):
+        # count(*) OVER () would count only the rows after the cursor
+        if self._query_mode != self.QUERY_MODE_WINDOW or self.get_total_count_mode() != self.TOTAL_COUNT_EXACT or \
+                self.is_aggregated() or self.get_cursor() is not None:
+            return await super().get_data_and_meta()
+
+        data, total_count = await self.get_data_with_total_count()
+        meta = self.build_total_count_meta(total_count)
+        meta['offset'] = await self.get_offset()
+
+        return data, meta
 
     async def get_total_count(self):
-        return await self.model.objects.count(
+        if self.is_aggregated():
+            fetch = op.methodcaller('_count_groups')
+        elif self.is_plan_usable():
+            fetch = op.methodcaller('execute_plan', self.PLAN_COUNT, BaseModelManager.FETCH_SCALAR)
+        else:
+            fetch = op.methodcaller('_count')
+
+        return await self.coalesce('count', fetch)
+
+    async def _count(self):
+        return await self.run_model_query(op.methodcaller(
+            'count',
             query=self._get_query().with_only_columns([func.count(self.model.pk_column)]),
-            where_list=await self.get_where_list()
-        )
+            where_list=await self.get_count_where_list()
+        ), read=True)
+
+    async def _count_groups(self):
+        query = select([func.count()]).select_from((await self.get_aggregated_query()).alias('groups'))
+
+        return await self.run_model_query(op.methodcaller('count', query=query), read=True)
+
+    async def _get_filtered_query(self, columns):
+        query = self._get_query().with_only_columns(columns)
+
+        for where in await self.get_count_where_list():
+            query = query.where(where)
+
+        return query
+
+    async def get_capped_total_count(self):
+        if self.is_aggregated():
+            query = await self.get_aggregated_query()
+        else:
+            query = await self._get_filtered_query([self.model.pk_column])
+        query = query.limit(self._total_count_cap + 1).alias('capped')
+
+        query = select([func.count()]).select_from(query)
+
+        return await self.run_model_query(op.methodcaller('count', query=query), read=True)
+
+    async def get_estimated_total_count(self):
+        if self.is_aggregated():
+            # the planner estimates the number of the groups
+            query = await self.get_aggregated_query()
+        else:
+            query = await self._get_filtered_query([self.model.pk_column])
+        compiled = self._compile(query)
+
+        async def explain(connection):
+            result = await connection.execute('EXPLAIN (FORMAT JSON) {}'.format(compiled), compiled.params)
+            return await result.scalar()
+
+        plan = await self.run_connection_query(explain, read=True)
+
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    async def update_one(self, values):
+        """
+        Updates the filtered entity with "UPDATE ... RETURNING" and returns its selected fields,
+        None if there is no such entity.
+        """
+        if not values:
+            data = await self.get_data()
+            return data[0] if data else None
+
+        query = self.model.table.update().values(**values).returning(*self.get_columns())
+        for where in await self.get_where_list():
+            query = query.where(where)
+
+        row = await self.run_model_query(op.methodcaller('fetchone', query), self.model.objects.new_instance())
+
+        return dict(row) if row is not None else None
+
+    async def delete_one(self):
+        """
+        Deletes the filtered entity with "DELETE ... RETURNING" and returns its primary key,
+        None if there is no such entity.
+        """
+        query = self.model.table.delete().returning(self.model.pk_column)
+        for where in await self.get_where_list():
+            query = query.where(where)
+
+        return await self.run_model_query(op.methodcaller('scalar', query), self.model.objects.new_instance())
+
+    async def _execute_many(self, query, max_rows=None):
+        for where in await self.get_where_list():
+            query = query.where(where)
+
+        async def execute():
+            async with self.model.objects.transaction() as objects:
+                await self.set_statement_timeout(objects.transaction_connection)
+                count = await objects.rowcount(query)
+
+                if max_rows is not None and count > max_rows:
+                    # the exception rolls the transaction back
+                    detail = 'Requested filter affects {} entities. Maximum is {}'.format(count, max_rows)
+                    error = ApiError().BaseClientError('Too many entities', detail).Parameter('filter')
+                    raise DataProviderValidationError(error)
+
+            return count
+
+        return await self.run_query(execute)
+
+    async def update_many(self, values, max_rows=None):
+        """
+        Updates all the filtered entities with one statement and returns the number of the updated rows.
+        Nothing is changed if more than max_rows rows are affected.
+        """
+        return await self._execute_many(self.model.table.update().values(**values), max_rows)
+
+    async def delete_many(self, max_rows=None):
+        """
+        Deletes all the filtered entities with one statement and returns the number of the deleted rows.
+        Nothing is deleted if more than max_rows rows are affected.
+        """
+        return await self._execute_many(self.model.table.delete(), max_rows)
+
+    async def insert_many(self, items, chunk_size=500):
+        """
+        Inserts the items with multi-row "INSERT ... RETURNING" statements in a transaction.
+
+        Consecutive items with the same set of fields (but not more than chunk_size of them) are inserted
+        with one statement, so omitted fields still get their default values.
+        """
+        chunks = []
+        for item in items:
+            if chunks and len(chunks[-1]) < chunk_size and chunks[-1][0].keys() == item.keys():
+                chunks[-1].append(item)
+            else:
+                chunks.append([item])
+
+        async def insert():
+            result = []
+            async with self.model.objects.transaction() as objects:
+                await self.set_statement_timeout(objects.transaction_connection)
+                for chunk in chunks:
+                    result.extend(await objects.bulk_insert(chunk))
+
+            return result
+
+        return await self.run_query(insert)
+
+    async def extend_data_with_includes(self, data, include_name, include_params):
+        if include_name not in self.join_includes:
+            return await super().extend_data_with_includes(data, include_name, include_params)
+
+        include_data = await self.get_join_include_data(data, include_name, include_params)
+        self.update_with_include_data(data, include_name, include_data)
 
     async def get_list_include_data(self, data, include_settings, include_params):
+        if include_settings.get('strategy', self.include_strategy) == self.INCLUDE_STRATEGY_JOIN:
+            # the include can't be joined, so it's loaded with a separate query
+            return await self.get_batch_include_data(data, include_settings, include_params)
+
+        return await super().get_list_include_data(data, include_settings, include_params)
+
+    async def get_join_include_data(self, data, include_name, include_params):
+        """
+        Moves the joined columns of every item to the included entity.
+        """
+        data_provider = self.join_includes[include_name]
+        pk_field = data_provider.model.pk_column.key
+        page = include_params.get('page') or {}
+
+        result = []
+        included_data = []
+        for item in data:
+            included_item = {
+                field: item.pop(self.JOIN_LABEL_TEMPLATE.format(include_name, field))
+                for field in self._get_join_fields(include_name)
+            }
+
+            page_data = []
+            if included_item[pk_field] is not None:
+                page_data.append(included_item)
+                included_data.append(included_item)
+
+            meta = data_provider.build_total_count_meta(len(page_data))
+            meta['offset'] = page.get('offset')
+            result.append(self.build_many(page_data, meta))
+
+        await data_provider.extend_data_with_all_includes(included_data)
+        data_provider.remove_extra_fields(included_data)
+
+        return result
+
+    async def get_partitioned_data(self, partition_fields, offset, limit):
+        """
+        Returns a page of the data for every group of the partition fields values, ordered by these values.
+        Every item has the number in its group and the size of the group. The first item of the group is returned
+        even if it is out of the page, so the size of every group is known.
+        """
+        partition_columns = [self._get_table_field(field) for field in partition_fields]
+
+        order_by = []
+        for sort in await self.get_sort():
+            column = self.model.table.columns[sort.field]
+            order_by.append(column.desc() if sort.order == BaseModelManager.SORT_DOWN else column.asc())
+        order_by.append(self.model.pk_column)
+
+        query = self._get_query()
+        for where in await self.get_where_list():
+            query = query.where(where)
+        for column in partition_columns:
+            if column.key not in query.c:
+                query = query.column(column)
+        query = query \
+            .column(func.row_number().over(partition_by=partition_columns, order_by=order_by)
+                    .label(self.ROW_NUMBER_COLUMN_LABEL)) \
+            .column(func.count().over(partition_by=partition_columns).label(self.PARTITION_COUNT_COLUMN_LABEL)) \
+            .alias('partitioned')
+
+        row_number = query.c[self.ROW_NUMBER_COLUMN_LABEL]
+        page_condition = row_number > offset
+        if limit is not None:
+            page_condition = and_(page_condition, row_number <= offset + limit)
+
+        query = select([query]) \
+            .where(or_(page_condition, row_number == 1)) \
+            .order_by(*[query.c[column.key] for column in partition_columns] + [row_number])
+        objects = self.model.objects.new_instance()
+        rows = await self.run_model_query(op.methodcaller('fetchall', query), objects, read=True)
+
+        return [dict(row) for row in rows]
+
+    async def get_paginated_include_data(self, data_provider, relations, offset, limit):
+        if (limit is None and not offset) or not isinstance(data_provider, ModelDataProvider):
+            return await super().get_paginated_include_data(data_provider, relations, offset, limit)
+
+        partition_fields = [relation['included_entity_field_name'] for relation in relations]
+        included_data = await self.load(
+            data_provider,
+            ('partitioned', offset, limit),
+            partial(data_provider.get_partitioned_data, partition_fields, offset, limit)
+        )
+
+        pages = {}
+        total_counts = {}
+        for row in included_data:
+            # the loaded rows are shared with the other lookups of the request, so the labels are removed from copies
+            included_item = dict(row)
+            key = self._get_relation_key(included_item, relations, 'included_entity_field_name')
+            total_counts[key] = included_item.pop(self.PARTITION_COUNT_COLUMN_LABEL)
+            page_data = pages.setdefault(key, [])
+            if included_item.pop(self.ROW_NUMBER_COLUMN_LABEL) > offset:
+                page_data.append(included_item)
+
+        return pages, total_counts
+
+    async def get_each_item_include_data(self, data, include_settings, include_params):
         return await asyncio.gather(*[
             self.get_item_include_data(item, include_settings, include_params) for item in data
         ])
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+__all__ = (
+    'PRIMARY_PIN_COOKIE_NAME',
+    'ReplicaRouter',
+    'replica_router',
+)
+
+
+PRIMARY_PIN_COOKIE_NAME = 'read_primary'
+
+
+class _ReplicaConnectionContextManager:
+    def __init__(self, router):
+        self._router = router
+        self._index = None
+        self._engine_acquire_cm = None
+
+    async def __aenter__(self):
+        self._index = self._router.choose()
+        self._router.outstanding[self._index] += 1
+
+        try:
+            self._engine_acquire_cm = self._router.engines[self._index].acquire()
+            return await self._engine_acquire_cm.__aenter__()
+        except BaseException:
+            self._router.outstanding[self._index] -= 1
+            raise
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        try:
+            return await self._engine_acquire_cm.__aexit__(exc_type, exc_val, exc_tb)
+        finally:
+            self._router.outstanding[self._index] -= 1
+
+
+class ReplicaRouter:
+    """
+    Routes the reads between the engines of read replicas: a connection is acquired from the engine with the least
+    outstanding queries, engines with the same number of them are used in turn (round-robin).
+
+    Usage:
+        async with replica_router.acquire() as connection:
+            await connection.execute(query)
+    """
+
+    def __init__(self, engines=()):
+        self.engines = engines
+
+    def __len__(self):
+        return len(self._engines)
+
+    @property
+    def engines(self):
+        return self._engines
+
+    @engines.setter
+    def engines(self, engines):
+        self._engines = list(engines)
+        self.outstanding = [0] * len(self._engines)
+        self._next_index = 0
+
+    def choose(self):
+        count = len(self._engines)
+        index = min(range(count), key=lambda i: (self.outstanding[i], (i - self._next_index) % count))
+        self._next_index = (index + 1) % count
+
+        return index
+
+    def acquire(self):
+        return _ReplicaConnectionContextManager(self)
+
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+from asynctest import CoroutineMock
+
+from aiohttp_baseapi.data_providers.loader import ConcurrencyLimiter, DataLoader, SingleFlight
+
+
+class TestDataLoaderLoad:
+    @pytest.mark.asyncio
+    async def test_ok(self):
+        data_loader = DataLoader()
+        fetch_started = asyncio.Event()
+        fetch_finished = asyncio.Event()
+
+        async def fake_fetch():
+            fetch_started.set()
+            await fetch_finished.wait()
+            return {'data': [1]}
+
+        fetch = CoroutineMock(side_effect=fake_fetch)
+
+        first = asyncio.ensure_future(data_loader.load('key', fetch))
+        second = asyncio.ensure_future(data_loader.load('key', fetch))
+        await fetch_started.wait()
+        fetch_finished.set()
+
+        assert await first == await second == {'data': [1]}
+        assert await data_loader.load('key', fetch) == {'data': [1]}
+        fetch.assert_called_once_with()
+
+    @pytest.mark.asyncio
+    async def test_error(self):
+        data_loader = DataLoader()
+        fetch = CoroutineMock(side_effect=[ValueError(), {'data': [1]}])
+
+        with pytest.raises(ValueError):
+            await data_loader.load('key', fetch)
+
+        assert await data_loader.load('key', fetch) == {'data': [1]}
+        assert fetch.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_clear(self):
+        data_loader = DataLoader()
+        fetch = CoroutineMock(return_value={'data': [1]})
+
+        await data_loader.load('key', fetch)
+        data_loader.clear()
+        await data_loader.load('key', fetch)
+
+        assert fetch.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cancel(self):
+        data_loader = DataLoader()
+        fetch = CoroutineMock(side_effect=lambda: asyncio.sleep(10))
+
+        call = asyncio.ensure_future(data_loader.load('key', fetch))
+        await asyncio.sleep(0)
+        data_loader.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert len(data_loader) == 0
+
+
+class TestSingleFlightDo:
+    @pytest.mark.asyncio
+    async def test_ok(self):
+        single_flight = SingleFlight()
+        fetch_finished = asyncio.Event()
+
+        async def fake_fetch():
+            await fetch_finished.wait()
+            return [1]
+
+        fetch = CoroutineMock(side_effect=fake_fetch)
+
+        calls = [asyncio.ensure_future(single_flight.do('key', fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        fetch_finished.set()
+
+        assert await asyncio.gather(*calls) == [[1], [1], [1]]
+        assert single_flight.hits == 2
+        assert len(single_flight) == 0
+        fetch.assert_called_once_with()
+
+        # the finished call is not reused
+        assert await single_flight.do('key', fetch) == [1]
+        assert fetch.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cancel(self):
+        single_flight = SingleFlight()
+        fetch_finished = asyncio.Event()
+        fetch_cancelled = asyncio.Event()
+
+        async def fake_fetch():
+            try:
+                await fetch_finished.wait()
+            except asyncio.CancelledError:
+                fetch_cancelled.set()
+                raise
+            return [1]
+
+        calls = [asyncio.ensure_future(single_flight.do('key', fake_fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        # the call is awaited by the others
+        calls[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not fetch_cancelled.is_set()
+
+        # nobody waits for the call
+        calls[1].cancel()
+        calls[2].cancel()
+        await asyncio.sleep(0.01)
+        assert fetch_cancelled.is_set()
+        assert len(single_flight) == 0
+
+
+class TestConcurrencyLimiterRun:
+    @pytest.mark.asyncio
+    async def test_ok(self):
+        limiter = ConcurrencyLimiter(2)
+        fetch_finished = asyncio.Event()
+        running = []
+        started = []
+
+        async def fake_fetch(number):
+            started.append(number)
+            running.append(number)
+            await fetch_finished.wait()
+            running.remove(number)
+            return number
+
+        calls = [asyncio.ensure_future(limiter.run(lambda number=number: fake_fetch(number))) for number in range(5)]
+        await asyncio.sleep(0)
+
+        assert running == [0, 1]
+
+        fetch_finished.set()
+
+        assert await asyncio.gather(*calls) == [0, 1, 2, 3, 4]
+        # the waiting calls are run in FIFO order
+        assert started == [0, 1, 2, 3, 4]
+
+    @pytest.mark.asyncio
+    async def test_no_limit(self):
+        fetch = CoroutineMock(return_value=[1])
+
+        assert await ConcurrencyLimiter().run(fetch) == [1]
+        fetch.assert_called_once_with()
+
+
+class TestDataLoaderAcquire:
+    @pytest.mark.asyncio
+    async def test_ok(self):
+        worker_limiter = ConcurrencyLimiter(1)
+        data_loaders = [DataLoader(concurrency=2, limiter=worker_limiter) for _ in range(2)]
+        fetch = CoroutineMock(return_value=[1])
+
+        async with data_loaders[0].acquire():
+            calls = [asyncio.ensure_future(data_loader.run(fetch)) for data_loader in data_loaders]
+            await asyncio.sleep(0)
+            # the slot of the worker is held until the block is left
+            fetch.assert_not_called()
+
+        assert await asyncio.gather(*calls) == [[1], [1]]
+
+
+class TestDataLoaderRun:
+    @pytest.mark.asyncio
+    async def test_default_concurrency(self):
+        worker_limiter = ConcurrencyLimiter(4)
+        heavy_data_loader, data_loader = [DataLoader(limiter=worker_limiter) for _ in range(2)]
+        fetch_finished = asyncio.Event()
+
+        async def fake_fetch():
+            await fetch_finished.wait()
+            return [1]
+
+        heavy_calls = [asyncio.ensure_future(heavy_data_loader.run(fake_fetch)) for _ in range(10)]
+        await asyncio.sleep(0)
+
+        # the heavy request takes only a share of the worker limit, the other one isn't starved by its queries
+        assert await asyncio.wait_for(data_loader.run(CoroutineMock(return_value=[2])), 1) == [2]
+        assert not any(call.done() for call in heavy_calls)
+
+        fetch_finished.set()
+        assert await asyncio.gather(*heavy_calls) == [[1]] * 10
+
+    @pytest.mark.asyncio
+    async def test_ok(self):
+        worker_limiter = ConcurrencyLimiter(3)
+        data_loaders = [DataLoader(concurrency=1, limiter=worker_limiter) for _ in range(2)]
+        fetch_finished = asyncio.Event()
+        running = []
+
+        async def fake_fetch(number):
+            running.append(number)
+            await fetch_finished.wait()
+            return number
+
+        calls = [
+            asyncio.ensure_future(data_loader.run(lambda number=number: fake_fetch(number)))
+            for number in range(3)
+            for data_loader in data_loaders
+        ]
+        await asyncio.sleep(0)
+
+        # every request runs one query at a time, so the requests share the worker limit
+        assert running == [0, 0]
+
+        fetch_finished.set()
+
+        assert await asyncio.gather(*calls) == [0, 0, 1, 1, 2, 2]
@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+
 import pytest
 from asynctest import CoroutineMock
 from pytest_mock import MockFixture
 
+from aiohttp_baseapi.cursors import encode_cursor
+from aiohttp_baseapi.data_providers.exceptions import DataProviderTimeoutError
+from aiohttp_baseapi.data_providers.loader import DataLoader, SingleFlight
 from aiohttp_baseapi.data_providers.base import (
     BaseDataProvider,
 )
@@ -67,6 +72,106 @@ class TestBaseDataProviderGetMeta:
         mocked_get_offset.assert_called_once()
 
 
+class TestBaseDataProviderGetTotalCountMeta:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_mode, expected_meta', [
+        ('exact', {'total_count': 1234}),
+        ('estimated', {'total_count': 1200}),
+        ('capped', {'total_count': 1000, 'total_count_capped': True}),
+        ('none', {'total_count': None}),
+    ])
+    async def test_modes(self, mocker: MockFixture, fake_data_provider_cls, fake_mode, expected_meta):
+        fake_data_provider = fake_data_provider_cls(page={'total_count': fake_mode, 'limit': 2}, total_count_cap=1000)
+        mocker.patch.object(fake_data_provider, 'get_total_count', CoroutineMock(return_value=1234))
+        mocker.patch.object(fake_data_provider, 'get_estimated_total_count', CoroutineMock(return_value=1200))
+        mocker.patch.object(fake_data_provider, 'get_capped_total_count', CoroutineMock(return_value=1001))
+
+        compared_meta = await fake_data_provider.get_total_count_meta(2)
+
+        assert compared_meta == expected_meta
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_page, fake_count, expected_total_count', [
+        ({'limit': 10, 'offset': 20}, 3, 23),
+        ({'limit': 10, 'offset': 0}, 0, 0),
+        ({'offset': 5}, 1, 6),
+    ])
+    async def test_inferred(self, mocker: MockFixture, fake_data_provider_cls, fake_page, fake_count,
+                            expected_total_count):
+        fake_data_provider = fake_data_provider_cls(page=fake_page)
+        mocked_get_total_count = mocker.patch.object(fake_data_provider, 'get_total_count', CoroutineMock())
+
+        compared_meta = await fake_data_provider.get_total_count_meta(fake_count)
+
+        assert compared_meta == {'total_count': expected_total_count}
+        mocked_get_total_count.assert_not_called()
+
+
+class TestBaseDataProviderGetTotalCountMode:
+    @pytest.mark.parametrize('fake_page, expected_mode', [
+        ({}, BaseDataProvider.TOTAL_COUNT_EXACT),
+        ({'after': []}, BaseDataProvider.TOTAL_COUNT_NONE),
+        ({'after': [], 'total_count': 'exact'}, BaseDataProvider.TOTAL_COUNT_EXACT),
+        ({'total_count': 'capped'}, BaseDataProvider.TOTAL_COUNT_CAPPED),
+    ])
+    def test_ok(self, fake_data_provider_cls, fake_page, expected_mode):
+        assert fake_data_provider_cls(page=fake_page).get_total_count_mode() == expected_mode
+
+
+class TestBaseDataProviderGetCursorMeta:
+    @pytest.mark.parametrize('fake_page, expected_next, expected_prev', [
+        ({'limit': 2, 'after': []}, 2, None),
+        ({'limit': 2, 'after': [0]}, 2, 1),
+        ({'limit': 3, 'after': [0]}, None, 1),
+        ({'limit': 2, 'before': []}, None, 1),
+        ({'limit': 3, 'before': [3]}, 2, None),
+    ])
+    def test_ok(self, fake_data_provider_cls, fake_page, expected_next, expected_prev):
+        fake_data_provider = fake_data_provider_cls(page=fake_page, sort=['id'])
+        fake_data = [{'id': 1}, {'id': 2}]
+
+        compared_meta = fake_data_provider.get_cursor_meta(fake_data)
+        expected_meta = dict(
+            next_cursor=encode_cursor(['id'], [expected_next]) if expected_next else None,
+            prev_cursor=encode_cursor(['id'], [expected_prev]) if expected_prev else None,
+        )
+
+        assert compared_meta == expected_meta
+
+    def test_no_cursor(self, fake_data_provider: BaseDataProvider):
+        assert fake_data_provider.get_cursor_meta([{'id': 1}]) == {}
+
+
+class TestBaseDataProviderRemoveExtraFields:
+    def test_ok(self, fake_data_provider_cls):
+        fake_data_provider = fake_data_provider_cls(fields=['name'], sort=['-id'], page={'after': []})
+        fake_data = [{'name': 'foo', 'id': 1}]
+
+        fake_data_provider.remove_extra_fields(fake_data)
+
+        assert fake_data == [{'name': 'foo'}]
+
+
+class TestBaseDataProviderGetRequiredFields:
+    def test_ok(self, fake_data_provider_cls):
+        fake_data_provider = fake_data_provider_cls(
+            fields=['name'],
+            sort=['-id'],
+            page={'after': []},
+            include={'authors': {}},
+            available_includes={
+                'authors': {'relations': [{'included_entity_field_name': 'id', 'root_entity_field_name': 'author_id'}]},
+                'reviews': {'relations': [{'included_entity_field_name': 'book_id', 'root_entity_field_name': 'id'}]},
+            },
+            required_fields=['id']
+        )
+
+        assert fake_data_provider.get_required_fields() == ['id', 'author_id']
+
+    def test_empty(self, fake_data_provider: BaseDataProvider):
+        assert fake_data_provider.get_required_fields() == []
+
+
 class TestBaseDataProviderGetMany:
     @pytest.mark.asyncio
     async def test_ok(self, mocker: MockFixture, fake_data_provider: BaseDataProvider):
@@ -85,10 +190,115 @@ class TestBaseDataProviderGetMany:
         assert compared_many == expected_many
 
         mocked_get_data.assert_called_once_with()
-        mocked_get_meta.assert_called_once_with()
+        mocked_get_meta.assert_called_once_with(mocked_get_data.return_value)
         mocked_extend_data_with_includes.assert_called_once_with(mocked_get_data.return_value, 'baz', 'bar')
 
 
+class TestBaseDataProviderGetDataAndMeta:
+    @pytest.mark.asyncio
+    async def test_concurrent(self, mocker: MockFixture, fake_data_provider_cls):
+        fake_data_provider = fake_data_provider_cls(query_mode=BaseDataProvider.QUERY_MODE_CONCURRENT)
+        mocked_get_data = mocker.patch.object(fake_data_provider, 'get_data', CoroutineMock(return_value=[1, 2, 3]))
+        mocked_get_meta = mocker.patch.object(fake_data_provider, 'get_meta', CoroutineMock(return_value={'foo': 123}))
+        mocked_gather = mocker.spy(asyncio, 'gather')
+
+        compared_result = await fake_data_provider.get_data_and_meta()
+
+        assert compared_result == ([1, 2, 3], {'foo': 123})
+        mocked_get_data.assert_called_once_with()
+        mocked_get_meta.assert_called_once_with()
+        mocked_gather.assert_called_once()
+
+
+class TestBaseDataProviderGetCached:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture, fake_data_provider_cls):
+        fake_data_provider = fake_data_provider_cls(
+            filters={'foo': 'bar'},
+            include={'baz': {}},
+            available_includes={'baz': {'data_provider_class': fake_data_provider_cls}},
+            cache_ttl=10,
+            cache_stale_ttl=5
+        )
+        mocked_query_cache = mocker.patch.object(fake_data_provider, 'query_cache', mocker.Mock(
+            get_or_fetch=CoroutineMock()
+        ))
+        fake_fetch = CoroutineMock()
+
+        compared_result = await fake_data_provider.get_cached('many', fake_fetch)
+
+        assert compared_result == mocked_query_cache.get_or_fetch.return_value
+        mocked_query_cache.get_or_fetch.assert_called_once_with(
+            fake_data_provider.get_cache_key('many'),
+            fake_fetch,
+            ttl=10,
+            stale_ttl=5,
+            tags={fake_data_provider_cls.get_cache_tag()}
+        )
+        fake_fetch.assert_not_called()
+
+    def test_key(self, fake_data_provider_cls):
+        def get_key(**params):
+            include = {'books': dict({'fields': ['name'], 'loader': DataLoader(), 'deadline': 100}, **params)}
+            return fake_data_provider_cls(include=include, total_count_cap=params.get('total_count_cap')) \
+                .get_cache_key('many')
+
+        assert get_key() == get_key(loader=DataLoader(), deadline=200)
+        assert get_key() != get_key(fields=['id'])
+        assert get_key() != get_key(total_count_cap=1000)
+        assert fake_data_provider_cls(deferred_fields=['text']).get_cache_key('many') != \
+            fake_data_provider_cls().get_cache_key('many')
+
+    @pytest.mark.asyncio
+    async def test_disabled(self, mocker: MockFixture, fake_data_provider: BaseDataProvider):
+        mocked_query_cache = mocker.patch.object(fake_data_provider, 'query_cache')
+        fake_fetch = CoroutineMock()
+
+        compared_result = await fake_data_provider.get_cached('one', fake_fetch)
+
+        assert compared_result == fake_fetch.return_value
+        mocked_query_cache.get_or_fetch.assert_not_called()
+
+
+class TestBaseDataProviderStreamMany:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture, fake_data_provider_cls):
+        fake_data_provider = fake_data_provider_cls(
+            fields=['name'],
+            sort=['id'],
+            page={'limit': 3, 'after': [], 'total_count': 'exact'}
+        )
+        fake_batches = [[{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}], [{'id': 3, 'name': 'c'}]]
+
+        async def fake_iter_data(batch_size):
+            for batch in fake_batches:
+                yield batch
+
+        mocked_iter_data = mocker.patch.object(fake_data_provider, 'iter_data', mocker.Mock(side_effect=fake_iter_data))
+        mocked_extend_data_with_all_includes = mocker.patch.object(
+            fake_data_provider,
+            'extend_data_with_all_includes',
+            CoroutineMock()
+        )
+        mocker.patch.object(fake_data_provider, 'get_total_count', CoroutineMock(return_value=10))
+        written = []
+        fake_write = CoroutineMock(side_effect=lambda data: written.append(list(data)))
+
+        compared_meta = await fake_data_provider.stream_many(fake_write, 2)
+        expected_meta = dict(
+            count=3,
+            total_count=10,
+            offset=None,
+            next_cursor=encode_cursor(['id'], [3]),
+            prev_cursor=None
+        )
+
+        assert compared_meta == expected_meta
+        assert written == [[{'name': 'a'}, {'name': 'b'}], [{'name': 'c'}]]
+        mocked_iter_data.assert_called_once_with(2)
+        assert mocked_extend_data_with_all_includes.call_count == 2
+
+
 class TestBaseDataProviderGetOne:
     @pytest.mark.asyncio
     async def test_ok(self, mocker: MockFixture, fake_data_provider: BaseDataProvider):
@@ -245,6 +455,27 @@ class TestBaseDataProviderGetItemIncludeData:
         fake_get_many.assert_called_once_with()
         assert result == fake_get_many.return_value
 
+    @pytest.mark.asyncio
+    async def test_no_relation_key(self, mocker: MockFixture, fake_data_provider: BaseDataProvider):
+        fake_included_data_provider = mocker.Mock(
+            get_many=CoroutineMock(),
+            build_total_count_meta=mocker.Mock(side_effect=lambda total_count: dict(total_count=total_count))
+        )
+        fake_include_settings = {
+            'relations': [{'included_entity_field_name': 'id', 'root_entity_field_name': 'author_id'}],
+            'data_provider_class': mocker.Mock(return_value=fake_included_data_provider),
+        }
+        fake_include_params = {'page': {'offset': 10}}
+
+        result = await fake_data_provider.get_item_include_data(
+            {'author_id': None},
+            fake_include_settings,
+            fake_include_params
+        )
+
+        assert result == {'data': [], 'meta': {'count': 0, 'total_count': 0, 'offset': 10}}
+        fake_included_data_provider.get_many.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_relations_assertion(self, mocker: MockFixture, fake_data_provider: BaseDataProvider):
         fake_get_many = CoroutineMock()
@@ -292,3 +523,293 @@ class TestBaseDataProviderGetItemIncludeData:
         fake_item.get.assert_called_once_with('bar')
         fake_include_settings_data_provider.assert_not_called()
         fake_get_many.assert_not_called()
+
+
+class TestBaseDataProviderGetListIncludeDataStrategy:
+    @pytest.mark.asyncio
+    async def test_batch(self, mocker: MockFixture, fake_data_provider: BaseDataProvider):
+        fake_data = [mocker.Mock()]
+        fake_include_settings = {'strategy': BaseDataProvider.INCLUDE_STRATEGY_BATCH}
+        fake_include_params = mocker.Mock()
+        mocked_get_batch_include_data = mocker.patch.object(
+            fake_data_provider,
+            'get_batch_include_data',
+            CoroutineMock()
+        )
+        mocked_get_each_item_include_data = mocker.patch.object(
+            fake_data_provider,
+            'get_each_item_include_data',
+            CoroutineMock()
+        )
+
+        result = await fake_data_provider.get_list_include_data(fake_data, fake_include_settings, fake_include_params)
+
+        assert result == mocked_get_batch_include_data.return_value
+        mocked_get_batch_include_data.assert_called_once_with(fake_data, fake_include_settings, fake_include_params)
+        mocked_get_each_item_include_data.assert_not_called()
+
+
+class TestBaseDataProviderLoader:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture, fake_data_provider_cls):
+        mocked_get_data = CoroutineMock(side_effect=lambda: [{'id': 1}])
+        mocker.patch.object(fake_data_provider_cls, 'get_data', mocked_get_data)
+        mocker.patch.object(fake_data_provider_cls, 'get_total_count', CoroutineMock(return_value=1))
+        fake_include_settings = {
+            'data_provider_class': fake_data_provider_cls,
+            'relations': [{'included_entity_field_name': 'id', 'root_entity_field_name': 'author_id'}],
+            'strategy': BaseDataProvider.INCLUDE_STRATEGY_PER_ITEM,
+        }
+        fake_data_provider = fake_data_provider_cls(
+            available_includes={'authors': fake_include_settings},
+            loader=DataLoader()
+        )
+        fake_data = [{'author_id': 1}, {'author_id': 1}, {'author_id': 1}]
+        fake_include_params = {'filters': {}, 'page': {'limit': 10}}
+
+        result = await fake_data_provider.get_each_item_include_data(
+            fake_data,
+            fake_include_settings,
+            fake_include_params
+        )
+
+        assert [item_data['data'] for item_data in result] == [[{'id': 1}]] * 3
+        assert fake_include_params['filters'] == {}
+        mocked_get_data.assert_called_once_with()
+
+
+class TestBaseDataProviderLoaderBatchIncludes:
+    @pytest.mark.asyncio
+    async def test_ok(self, fake_data_provider_cls):
+        books = [{'id': 1, 'author_id': 1, 'name': 'foo'}, {'id': 2, 'author_id': 2, 'name': 'bar'}]
+
+        class FakeBooksDataProvider(fake_data_provider_cls):
+            async def get_data(self):
+                fields = self.get_fields() + self.get_required_fields() or list(books[0])
+                return [{field: book[field] for field in fields} for book in books]
+
+        include_settings = {
+            'data_provider_class': FakeBooksDataProvider,
+            'relations': [{'included_entity_field_name': 'author_id', 'root_entity_field_name': 'id'}],
+            'strategy': BaseDataProvider.INCLUDE_STRATEGY_BATCH,
+        }
+        fake_data_provider = fake_data_provider_cls(
+            include={
+                'books': {'fields': ['name']},
+                'same_books': {'fields': ['name']},
+                'book_ids': {'fields': ['id']},
+                'all_books': {},
+            },
+            available_includes={
+                'books': include_settings,
+                'same_books': include_settings,
+                'book_ids': include_settings,
+                'all_books': include_settings,
+            },
+            loader=DataLoader()
+        )
+        fake_data = [{'id': 1}, {'id': 2}]
+
+        await fake_data_provider.extend_data_with_all_includes(fake_data)
+
+        for include_name, expected_data in [
+            ('books', [[{'name': 'foo'}], [{'name': 'bar'}]]),
+            ('same_books', [[{'name': 'foo'}], [{'name': 'bar'}]]),
+            ('book_ids', [[{'id': 1}], [{'id': 2}]]),
+            ('all_books', [[books[0]], [books[1]]]),
+        ]:
+            assert [item[include_name]['data'] for item in fake_data] == expected_data
+
+
+class TestBaseDataProviderGetBatchIncludeData:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture, fake_data_provider: BaseDataProvider):
+        fake_included_data = [
+            {'id': 1, 'name': 'foo'},
+            {'id': 2, 'name': 'bar'},
+            {'id': 1, 'name': 'baz'},
+        ]
+        fake_included_data_provider = mocker.Mock(
+            get_data=CoroutineMock(return_value=fake_included_data),
+            extend_data_with_all_includes=CoroutineMock(),
+            build_total_count_meta=mocker.Mock(side_effect=lambda total_count: dict(total_count=total_count))
+        )
+        fake_include_settings_data_provider = mocker.Mock(
+            __name__='foo',
+            return_value=fake_included_data_provider
+        )
+        fake_data = [{'author_id': 1}, {'author_id': 2}, {'author_id': 1}, {'author_id': 3}, {'author_id': None}]
+        fake_include_settings = {
+            'relations': [{
+                'included_entity_field_name': 'id',
+                'root_entity_field_name': 'author_id',
+            }],
+            'data_provider_class': fake_include_settings_data_provider
+        }
+        fake_include_params = {
+            'filters': {'name': 'foo'},
+            'page': {'limit': 1, 'offset': 0},
+            'sort': ['name'],
+        }
+
+        result = await fake_data_provider.get_batch_include_data(fake_data, fake_include_settings, fake_include_params)
+
+        fake_include_settings_data_provider.assert_called_once_with(
+            filters={'name': 'foo', 'id': [1, 2, 3]},
+            page={'total_count': None},
+            sort=['name'],
+            include=None,
+            available_includes=None
+        )
+        fake_included_data_provider.get_data.assert_called_once_with()
+        fake_included_data_provider.extend_data_with_all_includes.assert_called_once_with(fake_included_data[:2])
+        assert result == [
+            {'data': [fake_included_data[0]], 'meta': {'count': 1, 'total_count': 2, 'offset': 0}},
+            {'data': [fake_included_data[1]], 'meta': {'count': 1, 'total_count': 1, 'offset': 0}},
+            {'data': [fake_included_data[0]], 'meta': {'count': 1, 'total_count': 2, 'offset': 0}},
+            {'data': [], 'meta': {'count': 0, 'total_count': 0, 'offset': 0}},
+            {'data': [], 'meta': {'count': 0, 'total_count': 0, 'offset': 0}},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_include_limit(self, mocker: MockFixture, fake_data_provider_cls):
+        fake_included_data = [{'id': 1, 'author_id': 1}, {'id': 2, 'author_id': 1}, {'id': 3, 'author_id': 2}]
+        fake_included_data_provider = mocker.Mock(
+            get_data=CoroutineMock(return_value=fake_included_data),
+            extend_data_with_all_includes=CoroutineMock(),
+            build_total_count_meta=mocker.Mock(side_effect=lambda total_count: dict(total_count=total_count))
+        )
+        fake_include_settings = {
+            'relations': [{'included_entity_field_name': 'author_id', 'root_entity_field_name': 'id'}],
+            'data_provider_class': mocker.Mock(return_value=fake_included_data_provider),
+        }
+        fake_data_provider = fake_data_provider_cls()
+        fake_data_provider.include_limit = 1
+
+        result = await fake_data_provider.get_batch_include_data([{'id': 1}, {'id': 2}], fake_include_settings, {})
+
+        assert result == [
+            {'data': [{'id': 1, 'author_id': 1}], 'meta': {'count': 1, 'total_count': 2, 'offset': None}},
+            {'data': [{'id': 3, 'author_id': 2}], 'meta': {'count': 1, 'total_count': 1, 'offset': None}},
+        ]
+
+
+class TestBaseDataProviderGetIncludeDataProvider:
+    def test_fields(self, mocker: MockFixture, fake_data_provider: BaseDataProvider):
+        include_data_provider_cls = mocker.Mock()
+        fake_include_settings = {
+            'data_provider_class': include_data_provider_cls,
+            'relations': [{'included_entity_field_name': 'author_id', 'root_entity_field_name': 'id'}],
+        }
+
+        fake_data_provider.get_include_data_provider(fake_include_settings, {'fields': ['name']}, {})
+
+        assert include_data_provider_cls.call_args[1]['fields'] == ['name']
+        assert include_data_provider_cls.call_args[1]['required_fields'] == ['author_id']
+
+    @pytest.mark.asyncio
+    async def test_batch_fields(self, fake_data_provider_cls):
+        class FakeBooksDataProvider(fake_data_provider_cls):
+            async def get_data(self):
+                return [{'author_id': 1, 'name': 'foo'}, {'author_id': 2, 'name': 'bar'}]
+
+        fake_data_provider = fake_data_provider_cls(
+            available_includes={
+                'books': {
+                    'data_provider_class': FakeBooksDataProvider,
+                    'relations': [{'included_entity_field_name': 'author_id', 'root_entity_field_name': 'id'}],
+                    'strategy': BaseDataProvider.INCLUDE_STRATEGY_BATCH,
+                }
+            }
+        )
+
+        result = await fake_data_provider.get_batch_include_data(
+            [{'id': 1}, {'id': 2}],
+            fake_data_provider._available_includes['books'],
+            {'fields': ['name'], 'page': {'total_count': 'none'}}
+        )
+
+        assert [item_data['data'] for item_data in result] == [[{'name': 'foo'}], [{'name': 'bar'}]]
+
+
+class TestBaseDataProviderCoalesce:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_coalesce_queries, expected_calls', [
+        (False, 2),
+        (True, 1),
+    ])
+    async def test_ok(self, mocker: MockFixture, fake_data_provider_cls, fake_coalesce_queries, expected_calls):
+        mocker.patch.object(fake_data_provider_cls, 'single_flight', SingleFlight())
+        fetch_finished = asyncio.Event()
+
+        async def fake_fetch(data_provider):
+            await fetch_finished.wait()
+            return [1]
+
+        fetch = CoroutineMock(side_effect=fake_fetch)
+        data_providers = [
+            fake_data_provider_cls(filters={'foo': 'bar'}, coalesce_queries=fake_coalesce_queries) for _ in range(2)
+        ]
+
+        calls = [asyncio.ensure_future(data_provider.coalesce('data', fetch)) for data_provider in data_providers]
+        await asyncio.sleep(0)
+        fetch_finished.set()
+
+        assert await asyncio.gather(*calls) == [[1], [1]]
+        assert fetch.call_count == expected_calls
+
+    @pytest.mark.asyncio
+    async def test_deadline(self, mocker: MockFixture, fake_data_provider_cls):
+        mocker.patch.object(fake_data_provider_cls, 'single_flight', SingleFlight())
+        fetch_finished = asyncio.Event()
+
+        async def fake_fetch(data_provider):
+            # the shared call is not bound by the deadline of the caller which has started it
+            assert data_provider.get_timeout() is None
+            await fetch_finished.wait()
+            return [1]
+
+        now = asyncio.get_event_loop().time()
+        data_providers = [
+            fake_data_provider_cls(filters={'foo': 'bar'}, coalesce_queries=True, deadline=deadline)
+            for deadline in (now + 0.01, now + 10)
+        ]
+
+        calls = [asyncio.ensure_future(data_provider.coalesce('data', fake_fetch)) for data_provider in data_providers]
+        await asyncio.sleep(0.02)
+        fetch_finished.set()
+
+        with pytest.raises(DataProviderTimeoutError):
+            await calls[0]
+        assert await calls[1] == [1]
+
+
+class TestBaseDataProviderRunQuery:
+    @pytest.mark.asyncio
+    async def test_ok(self, fake_data_provider_cls):
+        data_provider = fake_data_provider_cls(deadline=asyncio.get_event_loop().time() + 10)
+        fetch = CoroutineMock(return_value=[1])
+
+        assert await data_provider.run_query(fetch) == [1]
+        assert 0 < data_provider.get_timeout() <= 10
+
+    @pytest.mark.asyncio
+    async def test_timeout(self, fake_data_provider_cls):
+        data_provider = fake_data_provider_cls(deadline=asyncio.get_event_loop().time() + 0.01)
+        fetch = CoroutineMock(side_effect=lambda: asyncio.sleep(10))
+
+        with pytest.raises(DataProviderTimeoutError):
+            await data_provider.run_query(fetch)
+
+        # the deadline has passed, so the next query is not even started
+        with pytest.raises(DataProviderTimeoutError):
+            await data_provider.run_query(fetch)
+        assert fetch.call_count == 1
+
+    def test_include_deadline(self, mocker: MockFixture, fake_data_provider_cls):
+        include_data_provider_cls = mocker.Mock()
+        data_provider = fake_data_provider_cls(deadline=100)
+
+        data_provider.get_include_data_provider({'data_provider_class': include_data_provider_cls}, {}, {})
+
+        assert include_data_provider_cls.call_args[1]['deadline'] == 100
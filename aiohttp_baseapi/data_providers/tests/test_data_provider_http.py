@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from pytest_mock import MockFixture
+
+from aiohttp_baseapi.data_providers.exceptions import (
+    DataProviderTimeoutError,
+    DataProviderUnavailableError,
+    DataProviderValidationError
+)
+from aiohttp_baseapi.data_providers.http import CircuitBreaker, HttpClient, HttpDataProvider
+
+
+AUTHORS = [
+    {'id': 1, 'name': 'Leo'},
+    {'id': 2, 'name': 'Anton'},
+]
+
+BOOKS = [
+    {'id': 1, 'author_id': 1, 'name': 'War and Peace', 'is_available': True},
+    {'id': 2, 'author_id': 2, 'name': 'The Lady with the Dog', 'is_available': True},
+    {'id': 3, 'author_id': 1, 'name': 'Anna Karenina', 'is_available': False},
+]
+
+
+class FakeUpstream:
+    """
+    A stand-in of the upstream service: filters its lists by "filter[<field>]=<values>", selects "fields"
+    and records the requests.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+        self.delay = 0
+
+        self.app = web.Application()
+        self.app.router.add_get('/authors', self.handle(AUTHORS))
+        self.app.router.add_get('/books', self.handle(BOOKS))
+
+    def handle(self, items):
+        async def handler(request):
+            self.requests.append((request.path, list(request.query.items())))
+            await asyncio.sleep(self.delay)
+
+            if self.status != 200:
+                return web.json_response({'errors': []}, status=self.status)
+
+            data = list(items)
+            for name, value in request.query.items():
+                if name.startswith('filter['):
+                    field = name[len('filter['):-1]
+                    data = [item for item in data if str(item[field]).lower() in value.split(',')]
+
+            if 'fields' in request.query:
+                fields = request.query['fields'].split(',')
+                data = [{field: item[field] for field in fields} for item in data]
+
+            return web.json_response({'data': data, 'meta': {'total_count': len(data)}})
+
+        return handler
+
+
+@pytest.fixture
+async def fake_upstream():
+    upstream = FakeUpstream()
+    server = TestServer(upstream.app)
+    await server.start_server()
+    upstream.base_url = str(server.make_url(''))
+
+    yield upstream
+
+    await server.close()
+
+
+@pytest.fixture
+async def fake_http_client():
+    client = HttpClient(limit_per_host=2)
+    await client.start()
+
+    yield client
+
+    await client.close()
+
+
+@pytest.fixture
+def fake_data_provider_classes(mocker: MockFixture, fake_upstream, fake_http_client):
+    class FakeBooksDataProvider(HttpDataProvider):
+        base_url = fake_upstream.base_url
+        path = '/books'
+        http_client = fake_http_client
+        circuit_breakers = {}
+        failure_threshold = 2
+
+    class FakeAuthorsDataProvider(HttpDataProvider):
+        base_url = fake_upstream.base_url
+        path = '/authors'
+        http_client = fake_http_client
+        circuit_breakers = {}
+
+    return FakeAuthorsDataProvider, FakeBooksDataProvider
+
+
+class TestHttpClient:
+    @pytest.mark.asyncio
+    async def test_ok(self):
+        client = HttpClient(limit=10, limit_per_host=2)
+        await client.start(keepalive_timeout=5)
+
+        assert client.session.connector.limit == 10
+        assert client.session.connector.limit_per_host == 2
+
+        await client.close()
+
+        with pytest.raises(AssertionError):
+            client.session
+
+
+class TestCircuitBreaker:
+    def test_ok(self, mocker: MockFixture):
+        mocked_monotonic = mocker.patch('aiohttp_baseapi.data_providers.http.time.monotonic', return_value=100)
+        circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+        circuit_breaker.record_failure()
+        assert circuit_breaker.allow()
+
+        circuit_breaker.record_failure()
+        assert circuit_breaker.is_open
+        assert not circuit_breaker.allow()
+
+        mocked_monotonic.return_value = 110
+        assert circuit_breaker.allow()
+        # only one trial call is let through
+        assert not circuit_breaker.allow()
+
+        circuit_breaker.record_failure()
+        assert not circuit_breaker.allow()
+
+        mocked_monotonic.return_value = 120
+        assert circuit_breaker.allow()
+
+        circuit_breaker.record_success()
+        assert not circuit_breaker.is_open
+        assert circuit_breaker.allow()
+
+    def test_release(self, mocker: MockFixture):
+        mocked_monotonic = mocker.patch('aiohttp_baseapi.data_providers.http.time.monotonic', return_value=100)
+        circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+
+        circuit_breaker.record_failure()
+        mocked_monotonic.return_value = 110
+        assert circuit_breaker.allow()
+
+        circuit_breaker.release()
+        assert circuit_breaker.is_open
+        assert circuit_breaker.allow()
+
+
+class TestHttpDataProviderGetMany:
+    @pytest.mark.asyncio
+    async def test_ok(self, fake_upstream, fake_data_provider_classes):
+        _, books_data_provider_cls = fake_data_provider_classes
+        data_provider = books_data_provider_cls(
+            fields=['name'],
+            filters={'author_id': 1, 'is_available': True},
+            sort=['-id'],
+            page={'limit': 1, 'offset': 0}
+        )
+
+        compared_result = await data_provider.get_many()
+
+        assert compared_result == {
+            'data': [{'name': 'War and Peace'}],
+            'meta': {'count': 1, 'total_count': 1, 'offset': 0},
+        }
+        assert fake_upstream.requests == [('/books', [
+            ('fields', 'name'),
+            ('filter[author_id]', '1'),
+            ('filter[is_available]', 'true'),
+            ('sort', '-id'),
+            ('page[limit]', '1'),
+            ('page[offset]', '0'),
+        ])]
+
+    @pytest.mark.asyncio
+    async def test_batch_include(self, fake_upstream, fake_data_provider_classes):
+        authors_data_provider_cls, books_data_provider_cls = fake_data_provider_classes
+        data_provider = authors_data_provider_cls(
+            fields=['name'],
+            include={'books': {'fields': ['name']}},
+            available_includes={
+                'books': {
+                    'data_provider_class': books_data_provider_cls,
+                    'relations': [{'included_entity_field_name': 'author_id', 'root_entity_field_name': 'id'}],
+                }
+            }
+        )
+
+        compared_result = await data_provider.get_many()
+
+        assert compared_result['data'] == [
+            {'name': 'Leo', 'books': {
+                'data': [{'name': 'War and Peace'}, {'name': 'Anna Karenina'}],
+                'meta': {'count': 2, 'total_count': 2, 'offset': None},
+            }},
+            {'name': 'Anton', 'books': {
+                'data': [{'name': 'The Lady with the Dog'}],
+                'meta': {'count': 1, 'total_count': 1, 'offset': None},
+            }},
+        ]
+        # books of all the authors are requested at once, relation keys are requested but not returned
+        assert fake_upstream.requests == [
+            ('/authors', [('fields', 'name,id')]),
+            ('/books', [('fields', 'name,author_id'), ('filter[author_id]', '1,2')]),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_split_filters(self, fake_upstream, fake_data_provider_classes):
+        _, books_data_provider_cls = fake_data_provider_classes
+        data_provider = books_data_provider_cls(filters={'id': [1, 2, 3]})
+        data_provider.batch_size = 2
+
+        compared_result = await data_provider.get_many()
+
+        assert [item['id'] for item in compared_result['data']] == [1, 2, 3]
+        assert sorted(fake_upstream.requests) == [
+            ('/books', [('filter[id]', '1,2')]),
+            ('/books', [('filter[id]', '3')]),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_circuit_breaker(self, fake_upstream, fake_data_provider_classes):
+        _, books_data_provider_cls = fake_data_provider_classes
+        fake_upstream.status = 500
+
+        for _ in range(3):
+            with pytest.raises(DataProviderUnavailableError):
+                await books_data_provider_cls().get_many()
+
+        # the circuit is open after two failures, so the third call doesn't reach the upstream
+        assert len(fake_upstream.requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_unreachable(self, fake_data_provider_classes):
+        _, books_data_provider_cls = fake_data_provider_classes
+        books_data_provider_cls.base_url = 'http://127.0.0.1:1'
+
+        with pytest.raises(DataProviderUnavailableError):
+            await books_data_provider_cls().get_many()
+
+        assert books_data_provider_cls().get_circuit_breaker().failures == 1
+
+    @pytest.mark.asyncio
+    async def test_client_error(self, fake_upstream, fake_data_provider_classes):
+        _, books_data_provider_cls = fake_data_provider_classes
+        fake_upstream.status = 404
+
+        with pytest.raises(DataProviderValidationError) as e:
+            await books_data_provider_cls().get_many()
+
+        assert e.value.error['code'] == 'not_found'
+        # the upstream has responded, so it's not a failure
+        assert books_data_provider_cls().get_circuit_breaker().failures == 0
+
+    @pytest.mark.asyncio
+    async def test_request_timeout(self, fake_upstream, fake_data_provider_classes):
+        _, books_data_provider_cls = fake_data_provider_classes
+        books_data_provider_cls.request_timeout = 0.01
+        fake_upstream.delay = 1
+
+        with pytest.raises(DataProviderUnavailableError):
+            await books_data_provider_cls().get_many()
+
+        assert books_data_provider_cls().get_circuit_breaker().failures == 1
+
+    @pytest.mark.asyncio
+    async def test_deadline(self, fake_upstream, fake_data_provider_classes):
+        _, books_data_provider_cls = fake_data_provider_classes
+        fake_upstream.delay = 1
+
+        for _ in range(3):
+            data_provider = books_data_provider_cls(deadline=asyncio.get_event_loop().time() + 0.01)
+            with pytest.raises(DataProviderTimeoutError):
+                await data_provider.get_many()
+
+        # the deadlines set by the clients don't open the circuit for everybody
+        assert not books_data_provider_cls().get_circuit_breaker().is_open
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+
+import pytest
+from pytest_mock import MockFixture
+
+from aiohttp_baseapi.cursors import decode_cursor
+from aiohttp_baseapi.data_providers.exceptions import DataProviderValidationError
+from aiohttp_baseapi.data_providers.memory import InMemoryDataProvider, InMemoryDataset
+
+
+ITEMS = [
+    {'id': 1, 'name': 'b', 'rating': 3, 'is_active': True, 'created_at': datetime.date(2017, 1, 2)},
+    {'id': 2, 'name': 'a', 'rating': None, 'is_active': False, 'created_at': datetime.date(2017, 1, 1)},
+    {'id': 3, 'name': 'c', 'rating': 1, 'is_active': True, 'created_at': datetime.date(2017, 1, 3)},
+    {'id': 4, 'name': 'a', 'rating': 2, 'is_active': True, 'created_at': datetime.date(2017, 1, 1)},
+]
+
+
+@pytest.fixture
+def fake_data_provider_cls(mocker: MockFixture):
+    class FakeInMemoryDataProvider(InMemoryDataProvider):
+        @classmethod
+        async def load_data(cls):
+            return ITEMS
+
+    return FakeInMemoryDataProvider
+
+
+@pytest.fixture
+def fake_dataset(mocker: MockFixture, fake_data_provider_cls):
+    mocker.patch.object(fake_data_provider_cls, 'dataset', InMemoryDataset(ITEMS))
+
+
+class TestInMemoryDataProviderLoad:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture, fake_data_provider_cls):
+        mocked_invalidate = mocker.patch.object(fake_data_provider_cls.query_cache, 'invalidate')
+
+        await fake_data_provider_cls.start()
+
+        assert len(fake_data_provider_cls.dataset) == 4
+        assert InMemoryDataProvider.dataset is None
+        mocked_invalidate.assert_called_once_with(fake_data_provider_cls.get_cache_tag())
+
+        await fake_data_provider_cls.stop()
+
+
+class TestInMemoryDataProviderMatchText:
+    @pytest.mark.parametrize('fake_operator, fake_field_value, fake_text, expected_result', [
+        ('prefix', 'War and Peace', 'War', True),
+        ('prefix', 'War and Peace', 'war', False),
+        ('prefix', 'War and Peace', 'Peace', False),
+        ('contains', 'War and Peace', 'PEACE', True),
+        ('contains', 'War and Peace', 'piece', False),
+        ('search', 'War and Peace', 'peace war', True),
+        ('search', 'War and Peace', 'war and peas', False),
+        ('search', None, 'war', False),
+    ])
+    def test_ok(self, fake_data_provider_cls, fake_operator, fake_field_value, fake_text, expected_result):
+        data_provider = fake_data_provider_cls()
+
+        assert data_provider.match_text(fake_operator, fake_field_value, fake_text) is expected_result
+
+
+@pytest.mark.usefixtures('fake_dataset')
+class TestInMemoryDataProviderGetData:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_filters, expected_ids', [
+        ({}, [1, 2, 3, 4]),
+        ({'name': 'a'}, [2, 4]),
+        ({'id': ['1', '3', '5']}, [1, 3]),
+        ({'rating__gte': '2'}, [1, 4]),
+        ({'rating__lte': '2'}, [3, 4]),
+        ({'rating__ne': '2'}, [1, 3]),
+        ({'is_active': 'false'}, [2]),
+        ({'created_at__lte': '2017-01-01'}, [2, 4]),
+        ({'name': 'a', 'rating__gte': '1'}, [4]),
+        ({'unknown': 'a'}, [1, 2, 3, 4]),
+        ({'name__prefix': 'a'}, [2, 4]),
+        ({'name__contains': 'B'}, [1]),
+        ({'name__search': 'c'}, [3]),
+    ])
+    async def test_filters(self, fake_data_provider_cls, fake_filters, expected_ids):
+        data_provider = fake_data_provider_cls(filters=fake_filters)
+
+        assert [item['id'] for item in await data_provider.get_data()] == expected_ids
+        assert await data_provider.get_total_count() == len(expected_ids)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_sort, fake_page, expected_ids', [
+        (['name', '-id'], {}, [4, 2, 1, 3]),
+        (['rating'], {}, [3, 4, 1, 2]),
+        (['-rating'], {}, [2, 1, 4, 3]),
+        (['name'], {'offset': 1, 'limit': 2}, [4, 1]),
+    ])
+    async def test_sort(self, fake_data_provider_cls, fake_sort, fake_page, expected_ids):
+        data_provider = fake_data_provider_cls(sort=fake_sort, page=fake_page)
+
+        assert [item['id'] for item in await data_provider.get_data()] == expected_ids
+
+    @pytest.mark.asyncio
+    async def test_fields(self, fake_data_provider_cls):
+        data_provider = fake_data_provider_cls(fields=['name'], filters={'id': '1'})
+
+        assert await data_provider.get_data() == [{'name': 'b'}]
+
+    @pytest.mark.asyncio
+    async def test_deferred_fields(self, fake_data_provider_cls):
+        data_provider = fake_data_provider_cls(filters={'id': '1'}, deferred_fields=['name', 'created_at'])
+        requested_data_provider = fake_data_provider_cls(
+            fields=['name'],
+            filters={'id': '1'},
+            deferred_fields=['name', 'created_at']
+        )
+
+        assert await data_provider.get_data() == [{'id': 1, 'rating': 3, 'is_active': True}]
+        assert await requested_data_provider.get_data() == [{'name': 'b'}]
+
+    @pytest.mark.asyncio
+    async def test_cursor_total_count(self, mocker: MockFixture, fake_data_provider_cls):
+        page = {'after': [], 'limit': 2, 'total_count': 'exact'}
+        first_result = await fake_data_provider_cls(sort=['name'], page=page).get_many()
+
+        _, values = decode_cursor(first_result['meta']['next_cursor'])
+        data_provider = fake_data_provider_cls(sort=['name'], page=dict(page, after=values))
+        mocked_get_filtered_positions = mocker.spy(data_provider, 'get_filtered_positions')
+        second_result = await data_provider.get_many()
+
+        assert first_result['meta']['total_count'] == second_result['meta']['total_count'] == 4
+        # the filters are resolved once for the data and the total count
+        mocked_get_filtered_positions.assert_called_once_with()
+
+    @pytest.mark.asyncio
+    async def test_cursor(self, fake_data_provider_cls):
+        data_provider = fake_data_provider_cls(sort=['name'], page={'after': [], 'limit': 2})
+        result = await data_provider.get_many()
+
+        assert [item['id'] for item in result['data']] == [2, 4]
+
+        _, values = decode_cursor(result['meta']['next_cursor'])
+        data_provider = fake_data_provider_cls(sort=['name'], page={'after': values, 'limit': 2})
+        result = await data_provider.get_many()
+
+        assert [item['id'] for item in result['data']] == [1, 3]
+
+        _, values = decode_cursor(result['meta']['prev_cursor'])
+        data_provider = fake_data_provider_cls(sort=['name'], page={'before': values, 'limit': 2})
+
+        assert [item['id'] for item in await data_provider.get_data()] == [2, 4]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_filters, fake_page', [
+        ({'id': 'foo'}, {}),
+        ({}, {'after': [1]}),
+    ])
+    async def test_error(self, fake_data_provider_cls, fake_filters, fake_page):
+        data_provider = fake_data_provider_cls(sort=['name'], filters=fake_filters, page=fake_page)
+
+        with pytest.raises(DataProviderValidationError):
+            await data_provider.get_data()
+
+    @pytest.mark.asyncio
+    async def test_include(self, mocker: MockFixture, fake_data_provider_cls):
+        class FakeRatingsDataProvider(InMemoryDataProvider):
+            dataset = InMemoryDataset([{'id': 1, 'title': 'low'}, {'id': 3, 'title': 'high'}])
+
+            @classmethod
+            async def load_data(cls):
+                return cls.dataset.items
+
+        available_includes = {
+            'ratings': {
+                'data_provider_class': FakeRatingsDataProvider,
+                'relations': [{'included_entity_field_name': 'id', 'root_entity_field_name': 'rating'}],
+            }
+        }
+        data_provider = fake_data_provider_cls(
+            fields=['id', 'rating'],
+            sort=['id'],
+            page={'limit': 2},
+            include={'ratings': {}},
+            available_includes=available_includes
+        )
+
+        result = await data_provider.get_many()
+
+        assert [item['ratings']['data'] for item in result['data']] == [[{'id': 3, 'title': 'high'}], []]
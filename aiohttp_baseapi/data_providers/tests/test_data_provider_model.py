@@ -1,13 +1,23 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+import datetime
+
 import pytest
+import sqlalchemy as sa
 from asynctest import CoroutineMock
 from pytest_mock import MockFixture
-from aiosqlalchemy_miniorm import OrderBy
+from aiosqlalchemy_miniorm import BaseModelManager, OrderBy
+from sqlalchemy.dialects import postgresql
 
+from aiohttp_baseapi.cursors import decode_cursor
+from aiohttp_baseapi.data_providers.cache import PlanCache
+from aiohttp_baseapi.data_providers.exceptions import DataProviderTimeoutError, DataProviderValidationError
+from aiohttp_baseapi.data_providers.loader import DataLoader
 from aiohttp_baseapi.data_providers.model import (
     ModelDataProvider
 )
+from aiohttp_baseapi.data_providers.replicas import ReplicaRouter
 
 
 @pytest.fixture
@@ -16,75 +26,31 @@ def fake_model_data_provider(mocker: MockFixture):
 
 
 class TestModelDataProviderRemoveComparisonSuffix:
-    @pytest.mark.asyncio
-    async def test_ok(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
-        fake_filter_name = mocker.Mock()
-        mocked_sub = mocker.patch('re.sub')
-
-        compared_result = fake_model_data_provider.remove_comparison_suffix(fake_filter_name)
-        expected_result = mocked_sub.return_value
-
-        assert compared_result == expected_result
-
-        mocked_sub.assert_called_once_with(
-            '__({})$'.format(fake_model_data_provider.COMPARISON_SIGNS),
-            '',
-            fake_filter_name
-        )
+    @pytest.mark.parametrize('fake_filter_name, expected_result', [
+        ('test', 'test'),
+        ('test__gte', 'test'),
+        ('test__prefix', 'test'),
+        ('test__unknown', 'test__unknown'),
+        ('created__at__lte', 'created__at'),
+    ])
+    def test_ok(self, fake_model_data_provider: ModelDataProvider, fake_filter_name, expected_result):
+        assert fake_model_data_provider.remove_comparison_suffix(fake_filter_name) == expected_result
 
 
 class TestBaseDataProviderGetComparisonOperator:
-    @pytest.mark.asyncio
-    async def test_ok_eq(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
-        fake_filter_name = mocker.Mock()
-        fake_filter_value = mocker.Mock(spec=str)
-        fake_eq = mocker.patch.object(fake_model_data_provider, 'COMPARISON_OPERATOR_EQ')
-        mocked_search = mocker.patch('re.search', return_value=None)
-
-        compared_operator = fake_model_data_provider.get_comparison_operator(fake_filter_name, fake_filter_value)
-        expected_operator = fake_eq
-
-        assert compared_operator == expected_operator
-
-        mocked_search.assert_called_once_with(
-            '__({})$'.format(fake_model_data_provider.COMPARISON_SIGNS),
-            fake_filter_name
-        )
-
-    @pytest.mark.asyncio
-    async def test_ok_in(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
-        fake_filter_name = mocker.Mock()
-        fake_filter_value = mocker.Mock(spec=list)
-        fake_in = mocker.patch.object(fake_model_data_provider, 'COMPARISON_OPERATOR_IN')
-        mocked_search = mocker.patch('re.search', return_value=None)
-
+    @pytest.mark.parametrize('fake_filter_name, fake_filter_value, expected_operator', [
+        ('test', 'foo', ModelDataProvider.COMPARISON_OPERATOR_EQ),
+        ('test', ['foo'], ModelDataProvider.COMPARISON_OPERATOR_IN),
+        ('test__ne', 'foo', ModelDataProvider.COMPARISON_OPERATOR_NE),
+        ('test__search', 'foo', ModelDataProvider.COMPARISON_OPERATOR_SEARCH),
+        ('test__unknown', 'foo', ModelDataProvider.COMPARISON_OPERATOR_EQ),
+    ])
+    def test_ok(self, fake_model_data_provider: ModelDataProvider, fake_filter_name, fake_filter_value,
+                expected_operator):
         compared_operator = fake_model_data_provider.get_comparison_operator(fake_filter_name, fake_filter_value)
-        expected_operator = fake_in
 
         assert compared_operator == expected_operator
 
-        mocked_search.assert_called_once_with(
-            '__({})$'.format(fake_model_data_provider.COMPARISON_SIGNS),
-            fake_filter_name
-        )
-
-    @pytest.mark.asyncio
-    async def test_ok_signs(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
-        fake_filter_name = mocker.Mock()
-        fake_filter_value = mocker.Mock()
-        mocked_search = mocker.patch('re.search')
-
-        compared_operator = fake_model_data_provider.get_comparison_operator(fake_filter_name, fake_filter_value)
-        expected_operator = mocked_search.return_value.group.return_value
-
-        assert compared_operator == expected_operator
-
-        mocked_search.assert_called_once_with(
-            '__({})$'.format(fake_model_data_provider.COMPARISON_SIGNS),
-            fake_filter_name
-        )
-        mocked_search.return_value.group.assert_called_once_with(1)
-
 
 class TestModelDataProviderGetTableField:
     def test_ok(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
@@ -116,6 +82,7 @@ class TestModelDataProviderGetFieldWhere:
             return_value=fake_operator
         )
         mocked_get_table_field = mocker.patch.object(fake_model_data_provider, '_get_table_field')
+        mocked_get_bound_filter_value = mocker.patch.object(fake_model_data_provider, 'get_bound_filter_value')
 
         compared_field_where = fake_model_data_provider.get_field_where(fake_field_name, fake_field_value)
         expected_field_where = fake_operator_func.return_value
@@ -124,65 +91,87 @@ class TestModelDataProviderGetFieldWhere:
 
         mocked_get_comparison_operator.assert_called_once_with(fake_field_name, fake_field_value)
         mocked_get_table_field.assert_called_once_with(fake_field_name)
+        mocked_get_bound_filter_value.assert_called_once_with(
+            fake_field_name, fake_operator, mocked_get_table_field.return_value, fake_field_value
+        )
         fake_operator_func.assert_called_once_with(
             mocked_get_table_field.return_value,
-            fake_field_value
+            mocked_get_bound_filter_value.return_value
         )
 
 
 class TestModelDataProviderGetWhereList:
+    @pytest.fixture
+    def fake_data_provider_cls(self, mocker: MockFixture):
+        fake_table = sa.Table('t', sa.MetaData(), sa.Column('id', sa.Integer, primary_key=True),
+                              sa.Column('foo', sa.String), sa.Column('is_active', sa.Boolean),
+                              sa.Column('created_at', sa.DateTime), sa.Column('payload', postgresql.JSONB))
+
+        class FakeDataProvider(ModelDataProvider):
+            model = mocker.Mock(spec=['table', 'pk_column', 'id', 'foo', 'is_active', 'created_at', 'payload'],
+                                table=fake_table, pk_column=fake_table.c.id, **fake_table.c)
+
+        return FakeDataProvider
+
+    @staticmethod
+    def compile(where_list):
+        return [
+            (str(where.compile(dialect=postgresql.dialect())), where.compile(dialect=postgresql.dialect()).params)
+            for where in where_list
+        ]
+
     @pytest.mark.asyncio
-    async def test_ok_filter_value_is_not_list(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
-        fake_filters = dict(test=mocker.Mock())
-        mocked_hasattr = mocker.patch('aiohttp_baseapi.data_providers.model.hasattr', mocker.Mock(return_value=True))
+    async def test_ok(self, fake_data_provider_cls):
+        fake_data_provider = fake_data_provider_cls(filters={
+            'id__gte': '5',
+            'is_active': 'false',
+            'created_at__lte': '2017-01-01T10:00:00+0000',
+            'foo': 'bar',
+            'unknown': 'baz',
+        })
+
+        compared_where_list = self.compile(await fake_data_provider.get_where_list())
+
+        assert compared_where_list == [
+            ('t.id >= %(id_1)s', {'id_1': 5}),
+            ('t.is_active = false', {}),
+            ('t.created_at <= %(created_at_1)s', {
+                'created_at_1': datetime.datetime(2017, 1, 1, 10, tzinfo=datetime.timezone.utc)
+            }),
+            ('t.foo = %(foo_1)s', {'foo_1': 'bar'}),
+        ]
 
-        mocked_get_table_field = mocker.patch.object(fake_model_data_provider, '_get_table_field')
-        mocked_remove_comparison_suffix = mocker.patch.object(fake_model_data_provider, 'remove_comparison_suffix')
-        mocked_get_filters = mocker.patch.object(
-            fake_model_data_provider, 'get_filters', CoroutineMock(return_value=fake_filters)
-        )
+    @pytest.mark.asyncio
+    async def test_ok_filter_values_is_list(self, fake_data_provider_cls):
+        fake_data_provider = fake_data_provider_cls(filters={'id': [str(i) for i in range(1000)]})
 
-        compared_where_list = await fake_model_data_provider.get_where_list()
+        compared_where_list = self.compile(await fake_data_provider.get_where_list())
 
-        expected_where_list = [
-            (mocked_get_table_field.return_value == filter_value) for filter_value in fake_filters.values()
-        ]
-        assert compared_where_list == expected_where_list
-        mocked_get_table_field.has_calls([mocker.call(filter_name) for filter_name in fake_filters.keys()])
-        mocked_remove_comparison_suffix.has_calls([mocker.call(filter_value) for filter_value in fake_filters.values()])
-        mocked_hasattr.has_calls(
-            [mocker.call(fake_model_data_provider.model, mocked_remove_comparison_suffix.return_value)
-             for _ in fake_filters.keys()]
-        )
-        mocked_get_filters.assert_called_once()
+        # the list is bound as a single array parameter
+        assert compared_where_list == [('t.id = ANY (CAST(%(param_1)s AS INTEGER[]))', {'param_1': list(range(1000))})]
 
     @pytest.mark.asyncio
-    async def test_ok_filter_values_is_list(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
-        fake_filters = dict(test=[mocker.Mock()])
-        mocked_hasattr = mocker.patch('aiohttp_baseapi.data_providers.model.hasattr', mocker.Mock(return_value=True))
-        mocked_remove_comparison_suffix = mocker.patch.object(fake_model_data_provider, 'remove_comparison_suffix')
-        mocked_get_table_field = mocker.patch.object(fake_model_data_provider, '_get_table_field')
-        mocked_get_filters = mocker.patch.object(
-            fake_model_data_provider, 'get_filters', CoroutineMock(return_value=fake_filters)
-        )
+    async def test_not_coerced(self, fake_data_provider_cls):
+        fake_data_provider = fake_data_provider_cls(filters={'payload': '{}', 'foo__prefix': '1'})
 
-        compared_where_list = await fake_model_data_provider.get_where_list()
-        expected_where_list = [
-            mocked_get_table_field.return_value.in_.return_value for _ in fake_filters.values()
-        ]
-        expected_filter_calls = [mocker.call(filter_name) for filter_name in fake_filters.keys()]
-        expected_in_calls = [mocker.call(filter_value) for filter_value in fake_filters.values()]
+        compared_where_list = self.compile(await fake_data_provider.get_where_list())
 
-        assert compared_where_list == expected_where_list
+        assert [params for _, params in compared_where_list] == [{'payload_1': '{}'}, {'foo_1': '1%'}]
 
-        mocked_get_table_field.has_calls(expected_filter_calls, any_order=True)
-        mocked_get_table_field.return_value.in_.has_calls(expected_in_calls, any_order=True)
-        mocked_remove_comparison_suffix.has_calls([mocker.call(filter_value) for filter_value in fake_filters.values()])
-        mocked_hasattr.has_calls(
-            [mocker.call(fake_model_data_provider.model, mocked_remove_comparison_suffix.return_value)
-             for _ in fake_filters.keys()]
-        )
-        mocked_get_filters.assert_called_once()
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_filters, expected_parameter', [
+        ({'id': 'foo'}, 'filter[id]'),
+        ({'id': ['1', 'foo']}, 'filter[id]'),
+        ({'is_active__ne': 'maybe'}, 'filter[is_active__ne]'),
+        ({'created_at__gte': '01.01.2017'}, 'filter[created_at__gte]'),
+    ])
+    async def test_error(self, fake_data_provider_cls, fake_filters, expected_parameter):
+        fake_data_provider = fake_data_provider_cls(filters=fake_filters)
+
+        with pytest.raises(DataProviderValidationError) as e:
+            await fake_data_provider.get_where_list()
+
+        assert e.value.error['source']['parameter'] == expected_parameter
 
 
 class TestModelDataProviderGetData:
@@ -217,6 +206,36 @@ class TestModelDataProviderGetData:
         )
 
 
+class TestModelDataProviderGetDataWithTotalCount:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
+        fake_rows = [dict(test=1, __total_count=10), dict(test=2, __total_count=10)]
+        mocked_get_query = mocker.patch.object(fake_model_data_provider, '_get_query')
+        mocked_get_items = mocker.patch.object(fake_model_data_provider, '_get_items', CoroutineMock(
+            return_value=fake_rows
+        ))
+        mocked_get_total_count = mocker.patch.object(fake_model_data_provider, 'get_total_count', CoroutineMock())
+
+        compared_result = await fake_model_data_provider.get_data_with_total_count()
+
+        assert compared_result == ([dict(test=1), dict(test=2)], 10)
+        mocked_get_items.assert_called_once_with(mocked_get_query.return_value.column.return_value)
+        mocked_get_total_count.assert_not_called()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_offset, expected_total_count', [(0, 0), (100, 5)])
+    async def test_empty_page(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider,
+                              fake_offset, expected_total_count):
+        mocker.patch.object(fake_model_data_provider, '_get_query')
+        mocker.patch.object(fake_model_data_provider, '_get_items', CoroutineMock(return_value=[]))
+        mocker.patch.object(fake_model_data_provider, 'get_offset', CoroutineMock(return_value=fake_offset))
+        mocker.patch.object(fake_model_data_provider, 'get_total_count', CoroutineMock(return_value=5))
+
+        compared_result = await fake_model_data_provider.get_data_with_total_count()
+
+        assert compared_result == ([], expected_total_count)
+
+
 class TestModelDataProviderGetTotalCount:
     @pytest.mark.asyncio
     async def test_ok(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
@@ -275,3 +294,666 @@ class TestModelDataProviderGetSort:
         result = await fake_model_data_provider.get_sort()
 
         assert result == [OrderBy('foo', 'asc'), OrderBy('bar', 'desc',)]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_page, expected_sort', [
+        ({'after': []}, [OrderBy('foo', 'asc'), OrderBy('bar', 'desc'), OrderBy('id', 'desc')]),
+        ({'before': []}, [OrderBy('foo', 'desc'), OrderBy('bar', 'asc'), OrderBy('id', 'asc')]),
+    ])
+    async def test_cursor(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider, fake_page,
+                          expected_sort):
+        mocker.patch.object(fake_model_data_provider, '_sort', new=['foo', '-bar'])
+        mocker.patch.object(fake_model_data_provider, '_page', new=fake_page)
+        mocker.patch.object(fake_model_data_provider, 'model', mocker.Mock(**{'pk_column.key': 'id'}))
+
+        result = await fake_model_data_provider.get_sort()
+
+        assert result == expected_sort
+
+
+class TestModelDataProviderGetCursorWhere:
+    @pytest.mark.parametrize('fake_cursor_fields, fake_direction, expected_where', [
+        (['foo', 'id'], 'after', '(t.foo, t.id) > (:param_1, :param_2)'),
+        (['-foo', '-id'], 'after', '(t.foo, t.id) < (:param_1, :param_2)'),
+        (['foo', 'id'], 'before', '(t.foo, t.id) < (:param_1, :param_2)'),
+        (['-foo', 'id'], 'after', 't.foo < :foo_1 OR t.foo = :foo_2 AND t.id > :id_1'),
+    ])
+    def test_ok(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider, fake_cursor_fields,
+                fake_direction, expected_where):
+        fake_table = sa.Table('t', sa.MetaData(), sa.Column('id', sa.Integer), sa.Column('foo', sa.String))
+        mocker.patch.object(fake_model_data_provider, 'get_cursor_fields', return_value=fake_cursor_fields)
+        mocker.patch.object(fake_model_data_provider, 'model', mocker.Mock(table=fake_table))
+
+        result = fake_model_data_provider.get_cursor_where(fake_direction, ['bar', 1])
+
+        assert str(result) == expected_where
+
+    def test_error(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
+        mocker.patch.object(fake_model_data_provider, 'get_cursor_fields', return_value=['foo', 'id'])
+
+        with pytest.raises(DataProviderValidationError):
+            fake_model_data_provider.get_cursor_where('after', ['bar'])
+
+
+class TestModelDataProviderGetPlan:
+    @pytest.fixture
+    def fake_model(self, mocker: MockFixture):
+        fake_table = sa.Table('t', sa.MetaData(), sa.Column('id', sa.Integer, primary_key=True),
+                              sa.Column('foo', sa.String))
+        return mocker.Mock(
+            table=fake_table,
+            columns=list(fake_table.columns),
+            pk_column=fake_table.c.id,
+            id=fake_table.c.id,
+            foo=fake_table.c.foo,
+            objects=mocker.Mock(**{
+                'engine.dialect': postgresql.dialect(),
+                'new_instance.side_effect': lambda: BaseModelManager(fake_table, None),
+            }),
+            spec=['table', 'columns', 'pk_column', 'id', 'foo', 'objects']
+        )
+
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture, fake_model):
+        mocker.patch.object(ModelDataProvider, 'model', fake_model)
+        mocker.patch.object(ModelDataProvider, 'plan_cache', PlanCache())
+        fake_page = {'limit': 10, 'offset': 20}
+        fake_data_provider = ModelDataProvider(filters={'id': ['1', '2'], 'foo__ne': 'bar'}, sort=['-foo'],
+                                               page=fake_page)
+        mocked_build_plan = mocker.spy(fake_data_provider, 'build_plan')
+
+        compared_plan = await fake_data_provider.get_plan(ModelDataProvider.PLAN_DATA)
+        expected_plan = 'SELECT t.id, t.foo \nFROM t \nWHERE t.id = ANY (CAST(%(filter_0)s AS INTEGER[])) ' \
+                        'AND t.foo != %(filter_1)s ORDER BY t.foo DESC \n LIMIT %(limit)s OFFSET %(offset)s'
+
+        assert compared_plan == expected_plan
+        assert fake_data_provider.get_plan_params() == {
+            'filter_0': [1, 2], 'filter_1': 'bar', 'limit': 10, 'offset': 20
+        }
+
+        # the same shape with other values reuses the plan
+        other_data_provider = ModelDataProvider(filters={'id': ['3'], 'foo__ne': 'baz'}, sort=['-foo'],
+                                                page={'limit': 5, 'offset': 5})
+
+        assert await other_data_provider.get_plan(ModelDataProvider.PLAN_DATA) is compared_plan
+        mocked_build_plan.assert_called_once_with(ModelDataProvider.PLAN_DATA)
+
+    @pytest.mark.asyncio
+    async def test_count(self, mocker: MockFixture, fake_model):
+        mocker.patch.object(ModelDataProvider, 'model', fake_model)
+        mocker.patch.object(ModelDataProvider, 'plan_cache', PlanCache())
+        fake_data_provider = ModelDataProvider(filters={'foo': 'bar', 'unknown': 'baz'}, page={'limit': 10})
+
+        compared_plan = await fake_data_provider.get_plan(ModelDataProvider.PLAN_COUNT)
+        expected_plan = 'SELECT count(t.id) AS count_1 \nFROM t \nWHERE t.foo = %(filter_0)s'
+
+        assert compared_plan == expected_plan
+
+    @pytest.mark.asyncio
+    async def test_text_search(self, mocker: MockFixture, fake_model):
+        mocker.patch.object(ModelDataProvider, 'model', fake_model)
+        mocker.patch.object(ModelDataProvider, 'plan_cache', PlanCache())
+        fake_data_provider = ModelDataProvider(filters={
+            'foo__prefix': '50%_',
+            'foo__contains': 'Bar',
+            'foo__search': 'war and peace',
+        })
+
+        compared_plan = await fake_data_provider.get_plan(ModelDataProvider.PLAN_COUNT)
+        expected_plan = 'SELECT count(t.id) AS count_1 \nFROM t \nWHERE t.foo LIKE %(filter_0)s ' \
+                        'AND t.foo ILIKE %(filter_1)s ' \
+                        "AND (to_tsvector('simple'::regconfig, t.foo) @@ plainto_tsquery('simple'::regconfig, " \
+                        '%(filter_2)s))'
+
+        assert compared_plan == expected_plan
+        assert fake_data_provider.get_plan_params() == {
+            'filter_0': '50\\%\\_%', 'filter_1': '%Bar%', 'filter_2': 'war and peace', 'limit': None, 'offset': None
+        }
+
+    @pytest.mark.asyncio
+    async def test_cursor_count(self, mocker: MockFixture, fake_model):
+        mocker.patch.object(ModelDataProvider, 'model', fake_model)
+        mocker.patch.object(ModelDataProvider, 'plan_cache', PlanCache())
+        fake_data_provider = ModelDataProvider(filters={'foo__ne': 'bar'}, sort=['foo'], page={'after': ['b', 2]})
+
+        compared_plan = await fake_data_provider.get_plan(ModelDataProvider.PLAN_COUNT)
+        expected_plan = 'SELECT count(t.id) AS count_1 \nFROM t \nWHERE t.foo != %(filter_0)s'
+
+        assert compared_plan == expected_plan
+        assert fake_data_provider.get_plan_params(ModelDataProvider.PLAN_COUNT) == {
+            'filter_0': 'bar', 'limit': None, 'offset': None
+        }
+
+    def test_plan_key(self):
+        fake_data_provider = ModelDataProvider(filters={'id': ['1']}, page={'limit': 10, 'offset': 0})
+        other_data_provider = ModelDataProvider(filters={'id': ['2', '3']}, page={'limit': 20})
+        another_data_provider = ModelDataProvider(filters={'id': '2'}, page={'limit': 20})
+
+        compared_key = fake_data_provider.get_plan_key(ModelDataProvider.PLAN_DATA)
+
+        assert compared_key == other_data_provider.get_plan_key(ModelDataProvider.PLAN_DATA)
+        assert compared_key != another_data_provider.get_plan_key(ModelDataProvider.PLAN_DATA)
+
+
+class TestModelDataProviderCursorTotalCount:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_query_mode', [
+        ModelDataProvider.QUERY_MODE_SEQUENTIAL,
+        ModelDataProvider.QUERY_MODE_WINDOW,
+    ])
+    async def test_ok(self, mocker: MockFixture, fake_query_mode):
+        table = sa.Table('books', sa.MetaData(), sa.Column('id', sa.Integer, primary_key=True),
+                         sa.Column('name', sa.String))
+        rows = [{'id': i, 'name': name} for i, name in enumerate('abcde', 1)]
+
+        class FakeObjects:
+            @staticmethod
+            def matches(row, where_list):
+                # the only condition is the cursor one: (name, id) > (values)
+                return all(
+                    (row['name'], row['id']) > tuple(clause.value for clause in where.right.clauses)
+                    for where in where_list
+                )
+
+            async def get_items(self, query, where_list, limit, offset, order_by):
+                return [row for row in rows if self.matches(row, where_list)][:limit]
+
+            async def count(self, query, where_list):
+                return len([row for row in rows if self.matches(row, where_list)])
+
+        class FakeDataProvider(ModelDataProvider):
+            model = mocker.Mock(table=table, columns=list(table.columns), pk_column=table.c.id, id=table.c.id,
+                                name=table.c.name, spec=['table', 'columns', 'pk_column', 'id', 'name', 'objects'])
+
+        mocker.patch.object(FakeDataProvider, 'run_model_query', CoroutineMock(
+            side_effect=lambda fetch, objects=None, read=False: fetch(FakeObjects())
+        ))
+
+        def make_data_provider(after):
+            return FakeDataProvider(sort=['name'], page={'after': after, 'limit': 2, 'total_count': 'exact'},
+                                    query_mode=fake_query_mode)
+
+        first_page = await make_data_provider([]).get_many()
+        second_page = await make_data_provider(decode_cursor(first_page['meta']['next_cursor'])[1]).get_many()
+
+        assert [item['id'] for item in second_page['data']] == [3, 4]
+        assert first_page['meta']['total_count'] == second_page['meta']['total_count'] == 5
+
+
+class TestModelDataProviderIterData:
+    @pytest.fixture
+    def fake_batches(self):
+        return [[{'id': 1}, {'id': 2}], [{'id': 3}]]
+
+    @pytest.fixture
+    def fake_data_provider(self, mocker: MockFixture, fake_batches):
+        fake_connection = mocker.Mock(
+            begin=mocker.Mock(return_value=mocker.Mock(
+                __aenter__=CoroutineMock(return_value=None),
+                __aexit__=CoroutineMock(return_value=None),
+            )),
+            execute=CoroutineMock(side_effect=[mocker.Mock()] + [
+                mocker.Mock(fetchall=CoroutineMock(return_value=batch)) for batch in fake_batches
+            ]),
+        )
+        fake_data_provider = ModelDataProvider(loader=DataLoader(concurrency=1))
+        mocker.patch.object(fake_data_provider, 'is_plan_usable', return_value=True)
+        mocker.patch.object(fake_data_provider, 'get_plan', CoroutineMock(return_value='SELECT 1'))
+        mocker.patch.object(fake_data_provider, 'get_plan_params', return_value={})
+        mocker.patch.object(fake_data_provider, 'set_statement_timeout', CoroutineMock())
+        mocker.patch.object(fake_data_provider, 'acquire', return_value=mocker.Mock(
+            __aenter__=CoroutineMock(return_value=fake_connection),
+            __aexit__=CoroutineMock(return_value=None),
+        ))
+        return fake_data_provider
+
+    @pytest.mark.asyncio
+    async def test_query_slot(self, mocker: MockFixture, fake_data_provider, fake_batches):
+        fetch = CoroutineMock(return_value=[1])
+        batches = fake_data_provider.iter_data(batch_size=2)
+        slot = fake_data_provider.acquire_query_slot()
+
+        await slot.acquire()
+        first_batch = asyncio.ensure_future(batches.__anext__())
+        await asyncio.sleep(0)
+        # the cursor waits for the slot of the request
+        assert not first_batch.done()
+        slot.release()
+
+        assert await first_batch == fake_batches[0]
+        # the slot is released while the batch is handled
+        assert await asyncio.wait_for(fake_data_provider.run_query(fetch), 1) == [1]
+        assert [batch async for batch in batches] == fake_batches[1:]
+
+    @pytest.mark.asyncio
+    async def test_stream_includes(self, mocker: MockFixture, fake_data_provider, fake_batches):
+        async def fake_extend_data_with_all_includes(data):
+            # the include queries need the slot of the request held by the cursor
+            await fake_data_provider.run_query(CoroutineMock(return_value=[]))
+
+        mocker.patch.object(fake_data_provider, 'extend_data_with_all_includes', fake_extend_data_with_all_includes)
+        mocker.patch.object(fake_data_provider, 'get_meta_by_count', CoroutineMock(return_value={}))
+        mocker.patch.object(fake_data_provider, 'get_cursor_meta', return_value={})
+        write = CoroutineMock()
+
+        compared_meta = await asyncio.wait_for(fake_data_provider.stream_many(write, batch_size=2), 1)
+
+        assert compared_meta == {'count': 3}
+        write.assert_has_calls([mocker.call(batch) for batch in fake_batches])
+
+
+class TestModelDataProviderInsertMany:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
+        fake_items = [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}, {'name': 'd', 'category': 'x'}]
+        mocked_objects = mocker.Mock(bulk_insert=CoroutineMock(side_effect=lambda chunk: chunk))
+        mocked_transaction = mocker.MagicMock(**{
+            '__aenter__': CoroutineMock(return_value=mocked_objects),
+            '__aexit__': CoroutineMock(return_value=None),
+        })
+        mocker.patch.object(fake_model_data_provider, 'model', mocker.Mock(**{
+            'objects.transaction.return_value': mocked_transaction
+        }))
+
+        compared_result = await fake_model_data_provider.insert_many(fake_items, chunk_size=2)
+
+        assert compared_result == fake_items
+        mocked_objects.bulk_insert.assert_has_calls([
+            mocker.call(fake_items[0:2]),
+            mocker.call(fake_items[2:3]),
+            mocker.call(fake_items[3:4]),
+        ])
+
+
+class TestModelDataProviderUpdateOne:
+    @pytest.fixture
+    def fake_model(self, mocker: MockFixture):
+        fake_table = sa.Table('t', sa.MetaData(), sa.Column('id', sa.Integer, primary_key=True),
+                              sa.Column('foo', sa.String))
+        return mocker.Mock(table=fake_table, columns=list(fake_table.columns), pk_column=fake_table.c.id)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_row, expected_result', [
+        ({'id': 1, 'foo': 'bar'}, {'id': 1, 'foo': 'bar'}),
+        (None, None),
+    ])
+    async def test_ok(self, mocker: MockFixture, fake_model, fake_model_data_provider: ModelDataProvider,
+                      fake_row, expected_result):
+        mocked_fetchone = CoroutineMock(return_value=fake_row)
+        fake_model.objects.new_instance.return_value.fetchone = mocked_fetchone
+        mocker.patch.object(fake_model_data_provider, 'model', fake_model)
+        mocker.patch.object(fake_model_data_provider, 'get_where_list', CoroutineMock(
+            return_value=[fake_model.table.c.id == 1]
+        ))
+
+        compared_result = await fake_model_data_provider.update_one({'foo': 'bar'})
+
+        assert compared_result == expected_result
+        compared_query = str(mocked_fetchone.call_args[0][0])
+        assert compared_query == 'UPDATE t SET foo=:foo WHERE t.id = :id_1 RETURNING t.id, t.foo'
+
+    @pytest.mark.asyncio
+    async def test_empty(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
+        mocker.patch.object(fake_model_data_provider, 'get_data', CoroutineMock(return_value=[]))
+
+        assert await fake_model_data_provider.update_one({}) is None
+
+
+class TestModelDataProviderDeleteOne:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
+        fake_table = sa.Table('t', sa.MetaData(), sa.Column('id', sa.Integer, primary_key=True))
+        mocked_scalar = CoroutineMock(return_value=1)
+        mocker.patch.object(fake_model_data_provider, 'model', mocker.Mock(**{
+            'table': fake_table,
+            'pk_column': fake_table.c.id,
+            'objects.new_instance.return_value.scalar': mocked_scalar,
+        }))
+        mocker.patch.object(fake_model_data_provider, 'get_where_list', CoroutineMock(
+            return_value=[fake_table.c.id == 1]
+        ))
+
+        assert await fake_model_data_provider.delete_one() == 1
+        assert str(mocked_scalar.call_args[0][0]) == 'DELETE FROM t WHERE t.id = :id_1 RETURNING t.id'
+
+
+class TestModelDataProviderUpdateMany:
+    @pytest.fixture
+    def fake_objects(self, mocker: MockFixture, fake_model_data_provider: ModelDataProvider):
+        fake_table = sa.Table('t', sa.MetaData(), sa.Column('id', sa.Integer, primary_key=True),
+                              sa.Column('foo', sa.String))
+        fake_objects = mocker.Mock(rowcount=CoroutineMock(return_value=3))
+        fake_transaction = mocker.MagicMock(**{
+            '__aenter__': CoroutineMock(return_value=fake_objects),
+            '__aexit__': CoroutineMock(return_value=None),
+        })
+        mocker.patch.object(fake_model_data_provider, 'model', mocker.Mock(**{
+            'table': fake_table,
+            'objects.transaction.return_value': fake_transaction,
+        }))
+        mocker.patch.object(fake_model_data_provider, 'get_where_list', CoroutineMock(
+            return_value=[fake_table.c.foo == 'bar']
+        ))
+        return fake_objects
+
+    @pytest.mark.asyncio
+    async def test_ok(self, fake_objects, fake_model_data_provider: ModelDataProvider):
+        compared_count = await fake_model_data_provider.update_many({'foo': 'baz'}, max_rows=3)
+
+        assert compared_count == 3
+        assert str(fake_objects.rowcount.call_args[0][0]) == 'UPDATE t SET foo=:foo WHERE t.foo = :foo_1'
+
+    @pytest.mark.asyncio
+    async def test_delete(self, fake_objects, fake_model_data_provider: ModelDataProvider):
+        compared_count = await fake_model_data_provider.delete_many()
+
+        assert compared_count == 3
+        assert str(fake_objects.rowcount.call_args[0][0]) == 'DELETE FROM t WHERE t.foo = :foo_1'
+
+    @pytest.mark.asyncio
+    async def test_error_max_rows(self, fake_objects, fake_model_data_provider: ModelDataProvider):
+        with pytest.raises(DataProviderValidationError):
+            await fake_model_data_provider.update_many({'foo': 'baz'}, max_rows=2)
+
+
+class TestModelDataProviderJoinInclude:
+    @staticmethod
+    def make_fake_model(mocker: MockFixture, table):
+        fake_model = mocker.Mock(
+            table=table,
+            columns=list(table.columns),
+            pk_column=table.c.id,
+            spec=['table', 'columns', 'pk_column', 'objects'] + list(table.c.keys())
+        )
+        for key, column in table.c.items():
+            setattr(fake_model, key, column)
+
+        return fake_model
+
+    @pytest.fixture
+    def fake_data_provider_factory(self, mocker: MockFixture):
+        metadata = sa.MetaData()
+        authors = sa.Table('authors', metadata, sa.Column('id', sa.Integer, primary_key=True),
+                           sa.Column('name', sa.String))
+        books = sa.Table('books', metadata, sa.Column('id', sa.Integer, primary_key=True),
+                         sa.Column('author_id', sa.Integer))
+
+        class FakeAuthorsDataProvider(ModelDataProvider):
+            model = self.make_fake_model(mocker, authors)
+
+        class FakeBooksDataProvider(ModelDataProvider):
+            model = self.make_fake_model(mocker, books)
+
+        def factory(strategy, relation_field='id', fields=None):
+            available_includes = {
+                'authors': {
+                    'data_provider_class': FakeAuthorsDataProvider,
+                    'relations': [{
+                        'included_entity_field_name': relation_field,
+                        'root_entity_field_name': 'author_id',
+                    }],
+                    'strategy': strategy,
+                }
+            }
+            include = {'authors': {'fields': ['name'], 'filters': {'name': 'foo'}, 'page': {'total_count': 'none'}}}
+            return FakeBooksDataProvider(fields=fields, include=include, available_includes=available_includes)
+
+        return factory
+
+    def test_query(self, fake_data_provider_factory):
+        fake_data_provider = fake_data_provider_factory(ModelDataProvider.INCLUDE_STRATEGY_JOIN)
+        compared_query = str(fake_data_provider._get_query())
+        expected_query = 'SELECT books.id, books.author_id, authors.name AS __authors__name, ' \
+                         'authors.id AS __authors__id \nFROM books LEFT OUTER JOIN authors ' \
+                         'ON authors.id = books.author_id AND authors.name = :name_1'
+
+        assert compared_query == expected_query
+
+    @pytest.mark.parametrize('fake_strategy, fake_relation_field', [
+        (ModelDataProvider.INCLUDE_STRATEGY_BATCH, 'id'),
+        (ModelDataProvider.INCLUDE_STRATEGY_JOIN, 'name'),
+    ])
+    def test_not_joined(self, fake_data_provider_factory, fake_strategy, fake_relation_field):
+        fake_data_provider = fake_data_provider_factory(fake_strategy, fake_relation_field)
+
+        assert fake_data_provider.join_includes == {}
+        assert str(fake_data_provider._get_query()) == 'SELECT books.id, books.author_id \nFROM books'
+
+    def test_relation_key_selected(self, fake_data_provider_factory):
+        fake_data_provider = fake_data_provider_factory(ModelDataProvider.INCLUDE_STRATEGY_BATCH, fields=['id'])
+
+        assert [column.key for column in fake_data_provider.get_columns()] == ['id', 'author_id']
+
+    def test_deferred_fields(self, fake_data_provider_factory):
+        fake_data_provider = fake_data_provider_factory(ModelDataProvider.INCLUDE_STRATEGY_JOIN)
+        fake_data_provider._deferred_fields = ['author_id']
+        fake_data_provider._include['authors'].update(fields=None, deferred_fields=['name'])
+
+        # the relation key of the include is retrieved even if it is deferred
+        assert str(fake_data_provider._get_query()) == \
+            'SELECT books.id, books.author_id, authors.id AS __authors__id \nFROM books LEFT OUTER JOIN authors ' \
+            'ON authors.id = books.author_id AND authors.name = :name_1'
+
+        fake_data_provider._include = {}
+        assert [column.key for column in fake_data_provider.get_columns()] == ['id']
+
+    @pytest.mark.asyncio
+    async def test_extend_data(self, fake_data_provider_factory):
+        fake_data_provider = fake_data_provider_factory(ModelDataProvider.INCLUDE_STRATEGY_JOIN)
+        fake_data = [
+            {'id': 1, 'author_id': 1, '__authors__name': 'foo', '__authors__id': 1},
+            {'id': 2, 'author_id': 2, '__authors__name': None, '__authors__id': None},
+        ]
+
+        await fake_data_provider.extend_data_with_all_includes(fake_data)
+
+        assert fake_data == [
+            {'id': 1, 'author_id': 1, 'authors': {
+                'data': [{'name': 'foo'}], 'meta': {'count': 1, 'total_count': None, 'offset': None}
+            }},
+            {'id': 2, 'author_id': 2, 'authors': {
+                'data': [], 'meta': {'count': 0, 'total_count': None, 'offset': None}
+            }},
+        ]
+
+
+class TestModelDataProviderGetPaginatedIncludeData:
+    @pytest.fixture
+    def fake_data_provider_cls(self, mocker: MockFixture):
+        fake_table = sa.Table('books', sa.MetaData(), sa.Column('id', sa.Integer, primary_key=True),
+                              sa.Column('author_id', sa.Integer), sa.Column('title', sa.String))
+        fake_model = TestModelDataProviderJoinInclude.make_fake_model(mocker, fake_table)
+
+        class FakeBooksDataProvider(ModelDataProvider):
+            model = fake_model
+
+        return FakeBooksDataProvider
+
+    @pytest.mark.asyncio
+    async def test_query(self, mocker: MockFixture, fake_data_provider_cls):
+        fake_data_provider = fake_data_provider_cls(filters={'author_id': [1, 2]}, sort=['-title'])
+        mocked_fetchall = CoroutineMock(return_value=[])
+        fake_data_provider.model.objects.new_instance.return_value.fetchall = mocked_fetchall
+
+        await fake_data_provider.get_partitioned_data(['author_id'], 2, 10)
+
+        compared_query = str(mocked_fetchall.call_args[0][0])
+        expected_query = \
+            'SELECT partitioned.id, partitioned.author_id, partitioned.title, partitioned.__row_number, ' \
+            'partitioned.__partition_count \n' \
+            'FROM (SELECT books.id AS id, books.author_id AS author_id, books.title AS title, ' \
+            'row_number() OVER (PARTITION BY books.author_id ORDER BY books.title DESC, books.id) AS __row_number, ' \
+            'count(*) OVER (PARTITION BY books.author_id) AS __partition_count \n' \
+            'FROM books \nWHERE books.author_id = ANY (CAST(:param_1 AS ARRAY))) AS partitioned \n' \
+            'WHERE partitioned.__row_number > :row_number_1 AND partitioned.__row_number <= :row_number_2 ' \
+            'OR partitioned.__row_number = :row_number_3 ' \
+            'ORDER BY partitioned.author_id, partitioned.__row_number'
+
+        assert compared_query == expected_query
+
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture, fake_data_provider_cls, fake_model_data_provider):
+        fake_included_data_provider = fake_data_provider_cls()
+        mocker.patch.object(fake_included_data_provider, 'get_partitioned_data', CoroutineMock(return_value=[
+            {'id': 1, 'author_id': 1, '__row_number': 1, '__partition_count': 3},
+            {'id': 2, 'author_id': 1, '__row_number': 2, '__partition_count': 3},
+            {'id': 4, 'author_id': 2, '__row_number': 1, '__partition_count': 1},
+        ]))
+        fake_relations = [{'included_entity_field_name': 'author_id', 'root_entity_field_name': 'id'}]
+
+        compared_pages, compared_total_counts = await fake_model_data_provider.get_paginated_include_data(
+            fake_included_data_provider,
+            fake_relations,
+            1,
+            1
+        )
+
+        assert compared_pages == {(1,): [{'id': 2, 'author_id': 1}], (2,): []}
+        assert compared_total_counts == {(1,): 3, (2,): 1}
+        fake_included_data_provider.get_partitioned_data.assert_called_once_with(['author_id'], 1, 1)
+
+    @pytest.mark.asyncio
+    async def test_include_limit(self, mocker: MockFixture, fake_data_provider_cls):
+        fake_data_provider = ModelDataProvider()
+        mocked_get_partitioned_data = mocker.patch.object(
+            fake_data_provider_cls,
+            'get_partitioned_data',
+            CoroutineMock(return_value=[])
+        )
+        fake_include_settings = {
+            'data_provider_class': fake_data_provider_cls,
+            'relations': [{'included_entity_field_name': 'author_id', 'root_entity_field_name': 'id'}],
+        }
+
+        await fake_data_provider.get_batch_include_data([{'id': 1}], fake_include_settings, {'page': {}})
+
+        # the included books are limited per author by the database without the page limit too
+        mocked_get_partitioned_data.assert_called_once_with(['author_id'], 0, ModelDataProvider.include_limit)
+
+    @pytest.mark.asyncio
+    async def test_loader(self, mocker: MockFixture, fake_data_provider_cls):
+        fake_data_provider = ModelDataProvider(loader=DataLoader())
+        fake_included_data_provider = fake_data_provider_cls(filters={'author_id': [1]})
+        mocker.patch.object(fake_included_data_provider, 'get_partitioned_data', CoroutineMock(return_value=[
+            {'id': 1, 'author_id': 1, '__row_number': 1, '__partition_count': 2},
+        ]))
+        fake_relations = [{'included_entity_field_name': 'author_id', 'root_entity_field_name': 'id'}]
+
+        results = [
+            await fake_data_provider.get_paginated_include_data(fake_included_data_provider, fake_relations, 0, 1)
+            for _ in range(2)
+        ]
+
+        # the second lookup gets the rows loaded by the first one intact
+        assert results[0] == results[1] == ({(1,): [{'id': 1, 'author_id': 1}]}, {(1,): 2})
+        fake_included_data_provider.get_partitioned_data.assert_called_once_with(['author_id'], 0, 1)
+
+
+class TestModelDataProviderRunModelQuery:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker: MockFixture):
+        fake_objects = mocker.Mock(scalar=CoroutineMock(return_value=1))
+        fake_model_data_provider = ModelDataProvider()
+        mocker.patch.object(fake_model_data_provider, 'model', mocker.Mock(objects=fake_objects))
+
+        assert await fake_model_data_provider.run_model_query(lambda objects: objects.scalar('query')) == 1
+
+        fake_objects.transaction.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_deadline(self, mocker: MockFixture):
+        cancelled = asyncio.Event()
+
+        async def fake_scalar(query):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                # the connection cancels the query in the database when its coroutine is cancelled
+                cancelled.set()
+                raise
+
+        fake_objects = mocker.Mock(scalar=CoroutineMock(side_effect=fake_scalar))
+        fake_model_data_provider = ModelDataProvider(deadline=asyncio.get_event_loop().time() + 0.01)
+        mocker.patch.object(fake_model_data_provider, 'model', mocker.Mock(objects=fake_objects))
+
+        with pytest.raises(DataProviderTimeoutError):
+            await fake_model_data_provider.run_model_query(lambda objects: objects.scalar('query'))
+
+        assert cancelled.is_set()
+        # the query runs without an extra transaction and statement timeout
+        fake_objects.transaction.assert_not_called()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_read, expected_replica', [
+        (True, True),
+        (False, False),
+    ])
+    async def test_replica(self, mocker: MockFixture, fake_read, expected_replica):
+        fake_connection = mocker.Mock()
+        fake_router = ReplicaRouter([mocker.Mock(**{'acquire.return_value': mocker.Mock(
+            __aenter__=CoroutineMock(return_value=fake_connection),
+            __aexit__=CoroutineMock(return_value=None)
+        )})])
+        fake_objects = mocker.Mock(scalar=CoroutineMock(return_value=1))
+        fake_objects.new_instance.return_value.scalar = CoroutineMock(return_value=2)
+        fake_model_data_provider = ModelDataProvider(read_replica=True)
+        mocker.patch.object(fake_model_data_provider, 'model', mocker.Mock(objects=fake_objects))
+        mocker.patch.object(fake_model_data_provider, 'replica_router', fake_router)
+
+        compared_result = await fake_model_data_provider.run_model_query(
+            lambda objects: objects.scalar('query'), read=fake_read
+        )
+
+        assert compared_result == (2 if expected_replica else 1)
+        if expected_replica:
+            assert fake_objects.new_instance.return_value.transaction_connection is fake_connection
+
+
+class TestModelDataProviderGetAggregatedData:
+    @pytest.fixture
+    def fake_data_provider(self, mocker: MockFixture):
+        table = sa.Table('books', sa.MetaData(), sa.Column('id', sa.Integer, primary_key=True),
+                         sa.Column('category', sa.String), sa.Column('price', sa.Integer))
+        fake_model = mocker.Mock(table=table, pk_column=table.c.id, spec=['table', 'pk_column', 'objects'])
+        for column in table.c:
+            setattr(fake_model, column.key, column)
+
+        data_provider = ModelDataProvider(
+            filters={'price__gte': 10},
+            group_by=['category'],
+            aggregate={'count': ['id'], 'sum': ['price']},
+            sort=['-price__sum'],
+            page={'limit': 5, 'offset': 10}
+        )
+        mocker.patch.object(data_provider, 'model', fake_model)
+
+        return data_provider
+
+    @pytest.mark.asyncio
+    async def test_ok(self, fake_data_provider: ModelDataProvider):
+        mocked_fetchall = CoroutineMock(return_value=[{'category': 'a', 'id__count': 2, 'price__sum': 30}])
+        fake_data_provider.model.objects.new_instance.return_value.fetchall = mocked_fetchall
+
+        compared_data = await fake_data_provider.get_data()
+
+        assert compared_data == [{'category': 'a', 'id__count': 2, 'price__sum': 30}]
+        compared_query = str(mocked_fetchall.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert ' '.join(compared_query.split()) == (
+            'SELECT books.category, count(books.id) AS id__count, sum(books.price) AS price__sum FROM books '
+            'WHERE books.price >= %(price_1)s GROUP BY books.category ORDER BY sum(books.price) DESC '
+            'LIMIT %(param_1)s OFFSET %(param_2)s'
+        )
+
+    @pytest.mark.asyncio
+    async def test_total_count(self, fake_data_provider: ModelDataProvider):
+        mocked_count = CoroutineMock(return_value=3)
+        fake_data_provider.model.objects.count = mocked_count
+
+        assert await fake_data_provider.get_total_count() == 3
+
+        compared_query = str(mocked_count.call_args[1]['query'].compile(dialect=postgresql.dialect()))
+        assert ' '.join(compared_query.split()) == (
+            'SELECT count(*) AS count_1 FROM (SELECT books.category AS category, count(books.id) AS id__count, '
+            'sum(books.price) AS price__sum FROM books WHERE books.price >= %(price_1)s GROUP BY books.category) '
+            'AS groups'
+        )
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+from asynctest import CoroutineMock
+from multidict import MultiDict
+from pytest_mock import MockFixture
+
+from aiohttp_baseapi.data_providers.cache import QueryCache, PlanCache, estimate_size, make_cache_key
+
+
+class TestMakeCacheKey:
+    def test_ok(self):
+        compared_key = make_cache_key(dict, {'b': [1, 2], 'a': MultiDict(c='d')})
+        expected_key = make_cache_key(dict, MultiDict([('a', {'c': 'd'}), ('b', (1, 2))]))
+
+        assert compared_key == expected_key
+        assert hash(compared_key) == hash(expected_key)
+
+    def test_different(self):
+        assert make_cache_key({'a': [1, 2]}) != make_cache_key({'a': [2, 1]})
+
+
+class TestEstimateSize:
+    @pytest.mark.parametrize('fake_value, expected_size', [
+        ('foo', 5),
+        (1, 8),
+        ([], 2),
+        ({'a': 'foo'}, 12),
+        ({'data': [{'a': 'foo'}] * 1000}, 13012),
+    ])
+    def test_ok(self, fake_value, expected_size):
+        assert estimate_size(fake_value) == expected_size
+
+    def test_sample(self, mocker: MockFixture):
+        fake_items = [mocker.Mock() for _ in range(1000)]
+
+        assert estimate_size(fake_items) == 2 + 1000 * 9
+        # only the first items are estimated
+        assert all(not item.mock_calls for item in fake_items[3:])
+
+
+class TestQueryCacheGetOrFetch:
+    @pytest.mark.asyncio
+    async def test_ok(self):
+        query_cache = QueryCache()
+        fetch = CoroutineMock(return_value={'data': [1]})
+
+        compared_first = await query_cache.get_or_fetch('key', fetch, ttl=10)
+        compared_second = await query_cache.get_or_fetch('key', fetch, ttl=10)
+
+        assert compared_first == compared_second == {'data': [1]}
+        fetch.assert_called_once_with()
+
+    @pytest.mark.asyncio
+    async def test_expired(self, mocker: MockFixture):
+        query_cache = QueryCache()
+        fetch = CoroutineMock(return_value={'data': [1]})
+        mocked_time = mocker.patch('aiohttp_baseapi.data_providers.cache.time.monotonic', return_value=0)
+
+        await query_cache.get_or_fetch('key', fetch, ttl=10)
+        mocked_time.return_value = 11
+        await query_cache.get_or_fetch('key', fetch, ttl=10)
+
+        assert fetch.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_stale(self, mocker: MockFixture):
+        query_cache = QueryCache()
+        fetch = CoroutineMock(side_effect=[{'data': [1]}, {'data': [2]}])
+        mocked_time = mocker.patch('aiohttp_baseapi.data_providers.cache.time.monotonic', return_value=0)
+
+        await query_cache.get_or_fetch('key', fetch, ttl=10, stale_ttl=10)
+        mocked_time.return_value = 11
+        compared_stale = await query_cache.get_or_fetch('key', fetch, ttl=10, stale_ttl=10)
+        await asyncio.sleep(0)
+        compared_refreshed = await query_cache.get_or_fetch('key', fetch, ttl=10, stale_ttl=10)
+
+        assert compared_stale == {'data': [1]}
+        assert compared_refreshed == {'data': [2]}
+        assert fetch.call_count == 2
+
+
+class TestQueryCacheLimits:
+    def test_max_entries(self):
+        query_cache = QueryCache(max_entries=2)
+
+        query_cache.set('a', 1, ttl=10)
+        query_cache.set('b', 2, ttl=10)
+        query_cache.get_entry('a')
+        query_cache.set('c', 3, ttl=10)
+
+        assert len(query_cache) == 2
+        assert query_cache.get_entry('b') is None
+        assert query_cache.get_entry('a').value == 1
+
+    def test_max_size(self):
+        query_cache = QueryCache(max_size=8)
+
+        query_cache.set('a', 'foo', ttl=10)
+        query_cache.set('b', 'bar', ttl=10)
+        query_cache.set('c', 'a' * 100, ttl=10)
+
+        assert query_cache.size == 5
+        assert query_cache.get_entry('a') is None
+        assert query_cache.get_entry('c') is None
+
+
+class TestQueryCacheInvalidate:
+    @pytest.mark.asyncio
+    async def test_ok(self):
+        query_cache = QueryCache()
+        query_cache.set('a', 1, ttl=10, tags=['books', 'authors'])
+        query_cache.set('b', 2, ttl=10, tags=['authors'])
+        query_cache.set('c', 3, ttl=10, tags=['books'])
+
+        query_cache.invalidate('authors')
+
+        assert query_cache.get_entry('a') is None
+        assert query_cache.get_entry('b') is None
+        assert query_cache.get_entry('c').value == 3
+
+    @pytest.mark.asyncio
+    async def test_during_fetch(self):
+        query_cache = QueryCache()
+
+        async def fetch():
+            query_cache.invalidate('books')
+            return 1
+
+        await query_cache.fetch('a', fetch, ttl=10, tags=['books'])
+
+        assert query_cache.get_entry('a') is None
+
+
+class TestPlanCache:
+    def test_ok(self):
+        plan_cache = PlanCache(max_entries=2)
+
+        plan_cache.set('a', 'SELECT 1')
+        plan_cache.set('b', 'SELECT 2')
+        plan_cache.get('a')
+        plan_cache.set('c', 'SELECT 3')
+
+        assert len(plan_cache) == 2
+        assert plan_cache.get('a') == 'SELECT 1'
+        assert plan_cache.get('b') is None
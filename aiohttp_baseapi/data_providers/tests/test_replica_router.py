@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from asynctest import CoroutineMock
+
+from aiohttp_baseapi.data_providers.replicas import ReplicaRouter
+
+
+class TestReplicaRouterChoose:
+    def test_round_robin(self, mocker):
+        router = ReplicaRouter([mocker.Mock() for _ in range(3)])
+
+        assert [router.choose() for _ in range(4)] == [0, 1, 2, 0]
+
+    def test_least_outstanding(self, mocker):
+        router = ReplicaRouter([mocker.Mock() for _ in range(3)])
+        router.outstanding = [2, 0, 1]
+
+        assert router.choose() == 1
+
+
+class TestReplicaRouterAcquire:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker):
+        connection = mocker.Mock()
+        engines = [
+            mocker.Mock(**{'acquire.return_value': mocker.Mock(
+                __aenter__=CoroutineMock(return_value=connection),
+                __aexit__=CoroutineMock(return_value=None)
+            )})
+            for _ in range(2)
+        ]
+        router = ReplicaRouter(engines)
+
+        async with router.acquire() as compared_connection:
+            assert compared_connection is connection
+            assert router.outstanding == [1, 0]
+
+            async with router.acquire():
+                assert router.outstanding == [1, 1]
+
+        assert router.outstanding == [0, 0]
+        engines[0].acquire.return_value.__aexit__.assert_called_once_with(None, None, None)
+
+    @pytest.mark.asyncio
+    async def test_error(self, mocker):
+        engine = mocker.Mock(**{'acquire.return_value': mocker.Mock(__aenter__=CoroutineMock(side_effect=OSError()))})
+        router = ReplicaRouter([engine])
+
+        with pytest.raises(OSError):
+            async with router.acquire():
+                pass
+
+        assert router.outstanding == [0]
@@ -51,6 +51,10 @@ class Parameter(BaseErrorSource):
     name = 'parameter'
 
 
+class Header(BaseErrorSource):
+    name = 'header'
+
+
 class BaseClientError(BaseErrorType):
     def __call__(self, code, detail=None):
         self.code = code.lower().replace(' ', '_')
@@ -101,6 +105,14 @@ class EntityNotFound(BaseErrorType):
     code = 'entity_not_found'
 
 
+class QueryTimeout(BaseErrorType):
+    code = 'query_timeout'
+
+
+class ServiceUnavailable(BaseErrorType):
+    code = 'service_unavailable'
+
+
 def callable_wrapper(klass, obj):
     return klass(obj)
 
@@ -119,6 +131,7 @@ class ApiError(dict):
 
     Pointer = property_wrapper(Pointer)
     Parameter = property_wrapper(Parameter)
+    Header = property_wrapper(Header)
 
     InvalidQueryParameter = property_wrapper(InvalidQueryParameter)
     UserIsBanned = property_wrapper(UserIsBanned)
@@ -131,4 +144,6 @@ class ApiError(dict):
     InvalidFilterOperator = property_wrapper(InvalidFilterOperator)
     InvalidSortOrder = property_wrapper(InvalidSortOrder)
     EntityNotFound = property_wrapper(EntityNotFound)
+    QueryTimeout = property_wrapper(QueryTimeout)
+    ServiceUnavailable = property_wrapper(ServiceUnavailable)
     BaseClientError = property_wrapper(BaseClientError)
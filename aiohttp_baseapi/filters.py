@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import re
+from functools import lru_cache
+
+__all__ = (
+    'COMPARISON_FILTER_OPERATORS',
+    'TEXT_SEARCH_FILTER_OPERATORS',
+    'SINGLE_VALUE_FILTER_OPERATORS',
+    'FILTER_OPERATORS',
+    'InvalidFilterValueError',
+    'FilterTable',
+    'parse_filter_name',
+    'coerce_filter_value',
+)
+
+
+# operators available for all the filters unless the allowed ones are set for the field
+COMPARISON_FILTER_OPERATORS = ('lte', 'gte', 'ne')
+TEXT_SEARCH_FILTER_OPERATORS = ('prefix', 'contains', 'search')
+# operators which can't be applied to a list of values
+SINGLE_VALUE_FILTER_OPERATORS = ('lte', 'gte') + TEXT_SEARCH_FILTER_OPERATORS
+
+FILTER_OPERATORS = COMPARISON_FILTER_OPERATORS + TEXT_SEARCH_FILTER_OPERATORS
+
+FILTER_NAME_TEMPLATE = '{}__{}'
+
+_FILTER_NAME_RE = re.compile('^(.+?)__({})$'.format('|'.join(FILTER_OPERATORS)))
+_UTC_OFFSET_RE = re.compile(r'([+-]\d{2}):(\d{2})$')
+
+# the boolean strings accepted by PostgreSQL, which parsed the boolean filter values before they were coerced here
+_BOOLEAN_VALUES = {
+    'true': True, 't': True, 'yes': True, 'y': True, 'on': True, '1': True,
+    'false': False, 'f': False, 'no': False, 'n': False, 'off': False, '0': False,
+}
+
+_DATE_FORMAT = '%Y-%m-%d'
+_TIME_FORMATS = ('%H:%M', '%H:%M:%S', '%H:%M:%S.%f')
+_DATETIME_FORMATS = (_DATE_FORMAT,) + tuple(
+    '{}{}{}'.format(_DATE_FORMAT, separator, time_format) for separator in 'T ' for time_format in _TIME_FORMATS
+)
+
+
+class InvalidFilterValueError(ValueError):
+    pass
+
+
+@lru_cache(maxsize=4096)
+def parse_filter_name(filter_name):
+    """
+    Returns (field, operator) of the filter name, the operator is None if there is no operator suffix.
+    """
+    found = _FILTER_NAME_RE.match(filter_name)
+
+    if found is None:
+        return filter_name, None
+
+    return found.group(1), found.group(2)
+
+
+class FilterTable:
+    """
+    Filter names available in a view (with and without operator suffixes) -> (field, operator).
+    Fields without the allowed operators set in available_filter_operators can use the comparison ones.
+    """
+
+    def __init__(self, available_filters, available_filter_operators=None):
+        available_filter_operators = available_filter_operators or {}
+
+        self.fields = frozenset(available_filters)
+        self.filters = {}
+
+        for field in available_filters:
+            self.filters[field] = (field, None)
+            for operator in available_filter_operators.get(field, COMPARISON_FILTER_OPERATORS):
+                self.filters[FILTER_NAME_TEMPLATE.format(field, operator)] = (field, operator)
+
+    def get(self, filter_name):
+        """
+        (field, operator) of the available filter, None if it's not available.
+        """
+        return self.filters.get(filter_name)
+
+
+def _parse_datetime(python_type, value):
+    """
+    Parses ISO 8601 dates, times and datetimes with optional offsets (+03:00 or +0300 as in the responses).
+    """
+    if issubclass(python_type, datetime.datetime):
+        formats = _DATETIME_FORMATS
+    elif issubclass(python_type, datetime.date):
+        formats = (_DATE_FORMAT,)
+    else:
+        formats = _TIME_FORMATS
+
+    # %z of strptime doesn't accept the offsets with a colon before python 3.7
+    value = _UTC_OFFSET_RE.sub(r'\1\2', value)
+
+    for value_format in formats:
+        for offset_format in ('', '%z'):
+            try:
+                parsed = datetime.datetime.strptime(value, value_format + offset_format)
+            except ValueError:
+                continue
+
+            if issubclass(python_type, datetime.datetime):
+                return parsed
+            if issubclass(python_type, datetime.date):
+                return parsed.date()
+            return parsed.timetz()
+
+    raise ValueError(value)
+
+
+def coerce_filter_value(python_type, value):
+    """
+    Converts the filter value (e.g. a string of the query) to python_type, None type means any type.
+    Raises InvalidFilterValueError if it can't be converted.
+    """
+    if python_type is None or value is None or (isinstance(value, python_type) and not isinstance(value, bool)):
+        return value
+
+    try:
+        if python_type is bool:
+            return _BOOLEAN_VALUES[str(value).strip().lower()]
+
+        if issubclass(python_type, (datetime.date, datetime.time)):
+            return _parse_datetime(python_type, str(value))
+
+        return python_type(value)
+    except (ArithmeticError, KeyError, TypeError, ValueError):
+        raise InvalidFilterValueError(value)
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from aiohttp_baseapi.data_providers.loader import DATA_LOADER_REQUEST_KEY
+
+__all__ = (
+    'cancellation_handler',
+)
+
+
+async def cancellation_handler(app, handler):
+    async def handle(request):
+        try:
+            return await handler(request)
+        except asyncio.CancelledError:
+            # the client is gone: the queries shared within the request are not awaited by anybody
+            data_loader = request.get(DATA_LOADER_REQUEST_KEY)
+            if data_loader is not None:
+                data_loader.cancel()
+            raise
+
+    return handle
@@ -1,13 +1,30 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+from http import HTTPStatus
+
 from aiohttp.web import HTTPNotFound, HTTPClientError
 
+from aiohttp_baseapi.data_providers.exceptions import (
+    DataProviderValidationError,
+    DataProviderTimeoutError,
+    DataProviderUnavailableError
+)
 from aiohttp_baseapi.exceptions import HTTPCustomError
 from aiohttp_baseapi.errors import ApiError
 from aiohttp_baseapi.log import logger
 
 
 INTERNAL_SERVER_ERROR_MESSAGE = 'Internal server error'
+QUERY_TIMEOUT_MESSAGE = 'Request timeout is exceeded'
+SERVICE_UNAVAILABLE_MESSAGE = 'Upstream service is unavailable'
+
+
+def build_unavailable_error(e):
+    if isinstance(e, DataProviderTimeoutError):
+        return HTTPCustomError(ApiError().QueryTimeout(QUERY_TIMEOUT_MESSAGE), HTTPStatus.GATEWAY_TIMEOUT)
+
+    return HTTPCustomError(ApiError().ServiceUnavailable(SERVICE_UNAVAILABLE_MESSAGE), HTTPStatus.SERVICE_UNAVAILABLE)
 
 
 def error_handler(*, is_debug=False):
@@ -15,8 +32,13 @@ def error_handler(*, is_debug=False):
         async def handle(request):
             try:
                 return await handler(request)
-            except HTTPCustomError:
+            except (HTTPCustomError, asyncio.CancelledError):
+                # the cancelled request has nobody to respond to
                 raise
+            except DataProviderValidationError as e:
+                raise HTTPCustomError(e.error, HTTPStatus.UNPROCESSABLE_ENTITY)
+            except (DataProviderTimeoutError, DataProviderUnavailableError) as e:
+                raise build_unavailable_error(e)
             except HTTPNotFound as e:
                 error = ApiError().EntityNotFound(e.body.decode())
                 raise HTTPCustomError(error, HTTPNotFound.status_code)
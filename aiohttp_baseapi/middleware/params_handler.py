@@ -102,8 +102,8 @@ class ParamsDict(MultiDictProxy):
 
     INCLUDE_PARAM = 'include'
 
-    ENUMERATED_ENTITIES_FIELDS_PARAMS = ['fields', 'retrieve', 'sort']
-    DICT_ENTITIES_FIELDS_PARAMS = ['filter', 'page']
+    ENUMERATED_ENTITIES_FIELDS_PARAMS = ['fields', 'retrieve', 'sort', 'group_by']
+    DICT_ENTITIES_FIELDS_PARAMS = ['filter', 'page', 'aggregate']
 
     ALL_AVAILABLE_PARAMS = ENUMERATED_ENTITIES_FIELDS_PARAMS + DICT_ENTITIES_FIELDS_PARAMS
 
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+from aiohttp import hdrs
+
+from aiohttp_baseapi.data_providers.replicas import PRIMARY_PIN_COOKIE_NAME
+
+__all__ = (
+    'read_your_writes_handler',
+)
+
+
+WRITE_METHODS = (hdrs.METH_POST, hdrs.METH_PUT, hdrs.METH_PATCH, hdrs.METH_DELETE)
+
+
+def read_your_writes_handler(*, ttl=5):
+    """
+    Pins the client to the primary database for ttl seconds after a successful write: the cookie set here turns off
+    the reads from the replicas, so the client reads its own writes even if the replicas lag behind.
+    """
+    async def read_your_writes_handler_factory(app, handler):
+        async def handle(request):
+            response = await handler(request)
+
+            if request.method in WRITE_METHODS and response.status < 400 and not response.prepared:
+                response.set_cookie(PRIMARY_PIN_COOKIE_NAME, '1', max_age=ttl, httponly=True)
+
+            return response
+
+        return handle
+    return read_your_writes_handler_factory
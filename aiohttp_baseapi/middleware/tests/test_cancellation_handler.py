@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+from asynctest import CoroutineMock
+
+from aiohttp_baseapi.middleware.cancellation_handler import cancellation_handler
+
+
+class TestCancellationHandler:
+    @pytest.mark.asyncio
+    async def test_ok(self, mocker):
+        app = mocker.Mock()
+        handler = CoroutineMock(return_value='response')
+        data_loader = mocker.Mock()
+        request = {'data_loader': data_loader}
+
+        handle_func = await cancellation_handler(app, handler)
+
+        assert await handle_func(request) == 'response'
+        data_loader.cancel.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_cancelled(self, mocker):
+        app = mocker.Mock()
+        handler = CoroutineMock(side_effect=asyncio.CancelledError())
+        data_loader = mocker.Mock()
+        request = {'data_loader': data_loader}
+
+        handle_func = await cancellation_handler(app, handler)
+
+        with pytest.raises(asyncio.CancelledError):
+            await handle_func(request)
+
+        data_loader.cancel.assert_called_once_with()
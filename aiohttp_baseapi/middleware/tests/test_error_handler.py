@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+import json
+from http import HTTPStatus
+
 import pytest
 from aiohttp.web import HTTPInternalServerError
 from asynctest import CoroutineMock
 
+from aiohttp_baseapi.data_providers.exceptions import (
+    DataProviderValidationError,
+    DataProviderTimeoutError,
+    DataProviderUnavailableError
+)
 from aiohttp_baseapi.exceptions import HTTPCustomError
 from aiohttp_baseapi.middleware.error_handler import (
     error_handler,
@@ -81,3 +90,56 @@ class TestErrorHandler:
             await handle_func(request)
 
         mocked_error.return_value.InternalError.assert_called_once_with(fake_error_text)
+
+    @pytest.mark.asyncio
+    async def test_data_provider_validation_error(self, mocker):
+        app = mocker.Mock()
+        fake_error = {'code': 'invalid_query_parameter'}
+        handler = CoroutineMock(side_effect=DataProviderValidationError(fake_error))
+        request = mocker.Mock()
+        factory = error_handler()
+        handle_func = await factory(app, handler)
+
+        with pytest.raises(HTTPCustomError) as e:
+            await handle_func(request)
+
+        assert e.value.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    @pytest.mark.asyncio
+    async def test_data_provider_timeout_error(self, mocker):
+        app = mocker.Mock()
+        handler = CoroutineMock(side_effect=DataProviderTimeoutError())
+        request = mocker.Mock()
+        factory = error_handler()
+        handle_func = await factory(app, handler)
+
+        with pytest.raises(HTTPCustomError) as e:
+            await handle_func(request)
+
+        assert e.value.status_code == HTTPStatus.GATEWAY_TIMEOUT
+        assert json.loads(e.value.text)['errors'][0]['code'] == 'query_timeout'
+
+    @pytest.mark.asyncio
+    async def test_data_provider_unavailable_error(self, mocker):
+        app = mocker.Mock()
+        handler = CoroutineMock(side_effect=DataProviderUnavailableError())
+        request = mocker.Mock()
+        factory = error_handler()
+        handle_func = await factory(app, handler)
+
+        with pytest.raises(HTTPCustomError) as e:
+            await handle_func(request)
+
+        assert e.value.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+        assert json.loads(e.value.text)['errors'][0]['code'] == 'service_unavailable'
+
+    @pytest.mark.asyncio
+    async def test_cancelled(self, mocker):
+        app = mocker.Mock()
+        handler = CoroutineMock(side_effect=asyncio.CancelledError())
+        request = mocker.Mock()
+        factory = error_handler()
+        handle_func = await factory(app, handler)
+
+        with pytest.raises(asyncio.CancelledError):
+            await handle_func(request)
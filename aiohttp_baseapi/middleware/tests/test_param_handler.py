@@ -28,6 +28,25 @@ class TestOverallOnSamples:
     @pytest.mark.asyncio
     @pytest.mark.parametrize('input, expected_output', [
 
+        # aggregation
+        ({
+            "filter[is_available]": "true",
+            "group_by": "category,is_available",
+            "aggregate[count]": "id",
+            "aggregate[sum]": "price,pages",
+            "sort": "-id__count"
+        }, {
+            "filter": {
+                "is_available": "true"
+            },
+            "group_by": ["category", "is_available"],
+            "aggregate": {
+                "count": "id",
+                "sum": ["price", "pages"]
+            },
+            "sort": ["-id__count"]
+        }),
+
         # without includes
         ({
             "filter[campaign_id]": "1,2,3",
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from aiohttp import web
+from asynctest import CoroutineMock
+
+from aiohttp_baseapi.middleware.read_your_writes_handler import read_your_writes_handler
+
+
+class TestReadYourWritesHandler:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_method, fake_status, expected_cookie', [
+        ('GET', 200, False),
+        ('POST', 201, True),
+        ('DELETE', 204, True),
+        ('PUT', 404, False),
+    ])
+    async def test_ok(self, mocker, fake_method, fake_status, expected_cookie):
+        app = mocker.Mock()
+        response = web.Response(status=fake_status)
+        handler = CoroutineMock(return_value=response)
+        request = mocker.Mock(method=fake_method)
+
+        factory = read_your_writes_handler(ttl=10)
+        handle_func = await factory(app, handler)
+
+        assert await handle_func(request) is response
+        assert ('read_primary' in response.cookies) == expected_cookie
+        if expected_cookie:
+            assert response.cookies['read_primary']['max-age'] == '10'
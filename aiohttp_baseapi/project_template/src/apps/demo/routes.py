@@ -6,7 +6,10 @@ from apps.demo.views import AuthorsListView, AuthorByIdView
 urls = SmartUrlDispatcher()
 
 urls.add_route('GET', r'/books', BooksListView, name='books-list')
+urls.add_route('GET', r'/books.{format:ndjson|csv}', BooksListView, name='books-export')
 urls.add_route('POST', r'/books', BooksListView, name='book-create')
+urls.add_route('PATCH', r'/books', BooksListView, name='books-update')
+urls.add_route('DELETE', r'/books', BooksListView, name='books-delete')
 urls.add_route('GET', r'/books/{id:\d+}', BookByIdView, name='book-details')
 urls.add_route('PUT', r'/books/{id:\d+}', BookByIdView, name='book-update')
 urls.add_route('DELETE', r'/books/{id:\d+}', BookByIdView, name='book-delete')
@@ -36,6 +36,7 @@ class BaseBooksMeta(BaseMeta):
 class BooksListView(BaseListView):
     class Meta(BaseBooksMeta):
         available_filters = ['id', 'category', 'name', 'is_available']
+        available_filter_operators = {'name': ['prefix', 'contains', 'search']}
         available_fields = ['category', 'name', 'is_available']
         available_includes = {
             'authors': {
@@ -44,9 +45,13 @@ class BooksListView(BaseListView):
                     'included_entity_field_name': Author.id.name,
                     'root_entity_field_name': Book.author_id.name,
                 }],
+                'strategy': BooksDataProvider.INCLUDE_STRATEGY_JOIN,
             }
         }
         available_sort_fields = ['category', 'name', 'is_available']
+        available_aggregates = {'count': ['id']}
+        export_formats = (BaseListView.EXPORT_NDJSON, BaseListView.EXPORT_CSV)
+        timeout = 10
 
 
 class BookByIdView(BaseEntityView):
@@ -19,7 +19,21 @@ DATABASE = {
     'user': 'test',
     'password': 'test',
     'minsize': 1,
-    'maxsize': 10
+    'maxsize': 10,
+    # seconds, statement_timeout of the connections (the requests cancel their queries at their deadlines)
+    'statement_timeout': 30,
+    # read replicas: every one is described by the keys which differ from the primary, e.g. {'host': 'replica-1'}
+    'replicas': [],
+}
+
+# seconds the client reads from the primary database after a write
+READ_YOUR_WRITES_TTL = 5
+
+# keep-alive connection pool of the HTTP data providers
+HTTP_CLIENT = {
+    'limit': 100,
+    'limit_per_host': 10,
+    'keepalive_timeout': 30,
 }
 
 LOGGERS = {}
@@ -3,6 +3,8 @@ import asyncio
 
 from aiohttp import web
 
+from aiohttp_baseapi.data_providers.http import http_client
+
 from conf import settings
 from core import database
 from core.middlewares import middlewares
@@ -22,11 +24,16 @@ class Application(web.Application):
 
     async def setup(self):
         await database.setup(self)
+        await http_client.start(**settings.HTTP_CLIENT)
+        self['http_client'] = http_client
         self.init_middlewares(middlewares)
 
     async def stop(self, app):
-        app['db_engine'].close()
-        await app['db_engine'].wait_closed()
+        for engine in [app['db_engine']] + app['db_replica_engines']:
+            engine.close()
+            await engine.wait_closed()
+
+        await app['http_client'].close()
 
     def init_middlewares(self, middlewares):
         for middleware in middlewares:
@@ -9,6 +9,9 @@ from sqlalchemy.ext.declarative import declarative_base
 
 from aiosqlalchemy_miniorm import RowModel, RowModelDeclarativeMeta
 
+from aiohttp_baseapi.data_providers.loader import worker_limiter
+from aiohttp_baseapi.data_providers.replicas import replica_router
+
 from conf import settings
 from core.log import logger
 
@@ -16,15 +19,18 @@ metadata = MetaData()
 BaseModel = declarative_base(metadata=metadata, cls=RowModel, metaclass=RowModelDeclarativeMeta)
 
 
-async def get_db_engine():
+async def get_db_engine(**params):
+    params = dict(settings.DATABASE, **params)
+
     return await create_engine(
-        user=settings.DATABASE['user'],
-        database=settings.DATABASE['database'],
-        host=settings.DATABASE['host'],
-        port=settings.DATABASE['port'],
-        password=settings.DATABASE['password'],
-        minsize=settings.DATABASE['minsize'],
-        maxsize=settings.DATABASE['maxsize'],
+        user=params['user'],
+        database=params['database'],
+        host=params['host'],
+        port=params['port'],
+        password=params['password'],
+        minsize=params['minsize'],
+        maxsize=params['maxsize'],
+        options='-c statement_timeout={:d}'.format(int(params.get('statement_timeout', 0) * 1000)),
         echo=settings.DEBUG,
     )
 
@@ -32,10 +38,17 @@ async def get_db_engine():
 async def setup(app=None):
     engine = await get_db_engine()
 
+    replica_engines = [await get_db_engine(**replica) for replica in settings.DATABASE.get('replicas', [])]
+
     if app is not None:
         app['db_engine'] = engine
+        app['db_replica_engines'] = replica_engines
 
     metadata.bind = engine
+    replica_router.engines = replica_engines
+
+    # queries wait for a free place in the worker queue instead of waiting for a connection in the pool
+    worker_limiter.limit = settings.DATABASE['maxsize']
 
 
 def init_models():
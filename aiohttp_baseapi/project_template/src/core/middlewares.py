@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
 from aiohttp.web_middlewares import normalize_path_middleware
+from aiohttp_baseapi.middleware.cancellation_handler import cancellation_handler
 from aiohttp_baseapi.middleware.error_handler import error_handler
 from aiohttp_baseapi.middleware.params_handler import params_handler
+from aiohttp_baseapi.middleware.read_your_writes_handler import read_your_writes_handler
 
 from conf import settings
 
@@ -15,3 +17,5 @@ middlewares = list()
 middlewares.append(normalize_path_middleware())
 middlewares.append(params_handler)
 middlewares.append(error_handler(is_debug=settings.DEBUG))
+middlewares.append(read_your_writes_handler(ttl=settings.READ_YOUR_WRITES_TTL))
+middlewares.append(cancellation_handler)
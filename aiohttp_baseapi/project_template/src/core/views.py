@@ -3,7 +3,10 @@
 from aiohttp.web_exceptions import HTTPNotFound
 
 from aiohttp_baseapi.decorators import jsonify_response
+from aiohttp_baseapi.errors import ApiError
+from aiohttp_baseapi.response import JSONListStreamResponse, NDJSONStreamResponse, CSVStreamResponse
 from aiohttp_baseapi.views.base import BaseDataProviderView
+from aiohttp_baseapi.views.exceptions import ViewError, ViewValidationError
 
 
 __all__ = (
@@ -25,21 +28,91 @@ class BaseMeta(BaseDataProviderView.Meta):
 
 
 class BaseListView(BaseDataProviderView):
-    @jsonify_response
+    PARTIAL_UPDATE_METHODS = ('PATCH',)
+    EXPORT_RESPONSE_CLASSES = {
+        BaseDataProviderView.EXPORT_NDJSON: NDJSONStreamResponse,
+        BaseDataProviderView.EXPORT_CSV: CSVStreamResponse,
+    }
+
     async def get(self):
+        if self.export_format is not None:
+            return await self.export_list()
+        if self.Meta.stream:
+            return await self.stream_list()
+        return await self.get_list()
+
+    @jsonify_response
+    async def get_list(self):
         return await self.data_provider.get_many()
 
+    async def stream_list(self):
+        response = JSONListStreamResponse(self.request)
+        meta = await self.data_provider.stream_many(response.write_items, self.Meta.stream_batch_size)
+        await response.write_meta(meta)
+        return response
+
+    async def export_list(self):
+        response_class = self.EXPORT_RESPONSE_CLASSES[self.export_format]
+        response = response_class(self.request, fields=self._fields)
+
+        async for data in self.data_provider.iter_data(self.Meta.stream_batch_size):
+            self.data_provider.remove_extra_fields(data)
+            await response.write_items(data)
+
+        await response.finish()
+        return response
+
     @jsonify_response(status=201)
     async def post(self):
         await self.validate_body()
         data = self.body_data['data']
+        if isinstance(data, list):
+            new_entities = await self.data_provider.insert_many(data, self.Meta.bulk_create_chunk_size)
+            self.data_provider.invalidate_cache()
+            return {
+                'data': [dict(new_entity) for new_entity in new_entities]
+            }
+
         new_entity = await self.data_provider.model.objects.insert(**data)
+        self.data_provider.invalidate_cache()
         return {
             'data': dict(new_entity)
         }
 
+    def validate_bulk_write(self):
+        if not self._filters:
+            detail = 'Entities to change should be filtered.'
+            error = ApiError().InvalidQueryParameter(detail).Parameter('filter')
+            raise ViewValidationError(errors=error)
+
+    @jsonify_response
+    async def patch(self):
+        self.validate_bulk_write()
+        await self.validate_body()
+        data = self.body_data['data']
+        if not data or not isinstance(data, dict):
+            error = ApiError().InvalidDataSchema('An object with the fields to update is required').Pointer('data')
+            raise ViewValidationError(errors=error)
+
+        count = await self.data_provider.update_many(data, self.Meta.bulk_write_max_rows)
+        self.data_provider.invalidate_cache()
+        return {
+            'meta': {'count': count}
+        }
+
+    @jsonify_response
+    async def delete(self):
+        self.validate_bulk_write()
+        count = await self.data_provider.delete_many(self.Meta.bulk_write_max_rows)
+        self.data_provider.invalidate_cache()
+        return {
+            'meta': {'count': count}
+        }
+
 
 class BaseEntityView(BaseDataProviderView):
+    PARTIAL_UPDATE_METHODS = ('PUT',)
+
     def get_filters_from_request(self):
         filters = super().get_filters_from_request()
         filters.update({
@@ -47,6 +120,11 @@ class BaseEntityView(BaseDataProviderView):
         })
         return filters
 
+    def validate_body_items(self, data):
+        # an entity is changed by a single object, not by the array of items accepted by the list
+        error = ApiError().InvalidDataSchema('An object with the fields of the entity is required').Pointer('data')
+        raise ViewError(errors=error)
+
     async def _get_entity(self):
         entity = await self.data_provider.get_one()
         if not entity:
@@ -62,17 +140,29 @@ class BaseEntityView(BaseDataProviderView):
 
     @jsonify_response(status=204)
     async def delete(self):
-        entity = await self._get_entity()
-        await entity.delete()
+        if self.Meta.read_before_write:
+            entity = await self._get_entity()
+            await entity.delete()
+        elif await self.data_provider.delete_one() is None:
+            raise HTTPNotFound()
+        self.data_provider.invalidate_cache()
 
     @jsonify_response()
     async def put(self):
-        entity = await self._get_entity()
-        self.Meta.body_data_schema['properties']['data'].pop('required', None)
+        if self.Meta.read_before_write:
+            entity = await self._get_entity()
         await self.validate_body()
         new_data = self.body_data['data']
-        await entity.update(**new_data)
+
+        if self.Meta.read_before_write:
+            await entity.update(**new_data)
+            item = dict(entity)
+        else:
+            item = await self.data_provider.update_one(new_data)
+            if item is None:
+                raise HTTPNotFound()
+        self.data_provider.invalidate_cache()
 
         return {
-            'data': dict(entity)
+            'data': item
         }
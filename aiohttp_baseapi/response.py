@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
 
+import csv
 import http
+import io
+from abc import ABC, abstractmethod
 from datetime import datetime, date
 
 import simplejson as json
-from aiohttp.web import json_response
+from aiohttp.web import json_response, StreamResponse
 
 __all__ = (
     'json_dumps',
-    'JSONResponse'
+    'JSONResponse',
+    'ListStreamResponse',
+    'JSONListStreamResponse',
+    'NDJSONStreamResponse',
+    'CSVStreamResponse',
 )
 
 
@@ -31,3 +38,110 @@ class JSONResponse:
 
     def __new__(cls, data=None, status=http.HTTPStatus.OK):
         return json_response(data or cls.empty_data, status=status, dumps=json_dumps)
+
+
+class ListStreamResponse(StreamResponse, ABC):
+    """
+    Base class of responses written by parts: items are written as soon as they are retrieved.
+
+    Headers are sent with the first part, so errors occurred before it are still returned as usual responses.
+    """
+
+    content_type_value = None
+
+    def __init__(self, request, fields=None, status=http.HTTPStatus.OK, **kwargs):
+        super().__init__(status=status, **kwargs)
+        self.content_type = self.content_type_value
+        self.enable_chunked_encoding()
+        self._request = request
+        self._fields = list(fields) if fields else None
+        self._is_items_written = False
+
+    def get_prefix(self):
+        return ''
+
+    async def _write_str(self, data):
+        if not self.prepared:
+            await self.prepare(self._request)
+            data = self.get_prefix() + data
+
+        # waits for the client if the write buffer is full
+        await self.write(data.encode('utf-8'))
+
+    @abstractmethod
+    def serialize_items(self, items):
+        pass
+
+    async def write_items(self, items):
+        if not items:
+            return
+
+        await self._write_str(self.serialize_items(items))
+        self._is_items_written = True
+
+    async def finish(self):
+        if not self.prepared:
+            await self._write_str('')
+        await self.write_eof()
+
+
+class JSONListStreamResponse(ListStreamResponse):
+    """
+    Writes {"data": [...], "meta": {...}} document by parts, meta is written at the end.
+    """
+
+    content_type_value = 'application/json'
+
+    ITEMS_DELIMITER = ', '
+
+    def get_prefix(self):
+        return '{"data": ['
+
+    def serialize_items(self, items):
+        chunk = self.ITEMS_DELIMITER.join(json_dumps(item) for item in items)
+        if self._is_items_written:
+            chunk = self.ITEMS_DELIMITER + chunk
+
+        return chunk
+
+    async def write_meta(self, meta):
+        await self._write_str('], "meta": {}}}'.format(json_dumps(meta)))
+        await self.write_eof()
+
+
+class NDJSONStreamResponse(ListStreamResponse):
+    """
+    Writes items as newline delimited JSON.
+    """
+
+    content_type_value = 'application/x-ndjson'
+
+    def serialize_items(self, items):
+        return ''.join(json_dumps(item) + '\n' for item in items)
+
+
+class CSVStreamResponse(ListStreamResponse):
+    """
+    Writes items as CSV with a header row. Columns are the given fields or the fields of the first item.
+    """
+
+    content_type_value = 'text/csv'
+
+    @staticmethod
+    def _format_value(value):
+        if isinstance(value, (datetime, date)):
+            return DateTimeEncoder().default(value)
+        return value
+
+    def serialize_items(self, items):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        if not self._is_items_written:
+            self._fields = self._fields or list(items[0])
+            writer.writerow(self._fields)
+
+        for item in items:
+            writer.writerow([self._format_value(item.get(field)) for field in self._fields])
+
+        return buffer.getvalue()
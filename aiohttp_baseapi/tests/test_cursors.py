@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from aiohttp_baseapi.cursors import encode_cursor, decode_cursor, InvalidCursorError
+
+
+class TestCursor:
+    @pytest.mark.parametrize('fake_sort, fake_values', [
+        ([], [1]),
+        (['-name', 'category'], ['foo', 'bar', 100500]),
+    ])
+    def test_ok(self, fake_sort, fake_values):
+        cursor = encode_cursor(fake_sort, fake_values)
+
+        assert isinstance(cursor, str)
+        assert decode_cursor(cursor) == (fake_sort, fake_values)
+
+    @pytest.mark.parametrize('fake_cursor', ['foo', 'e30', ['foo', 'bar'], encode_cursor([], [])[:-2]])
+    def test_error(self, fake_cursor):
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(fake_cursor)
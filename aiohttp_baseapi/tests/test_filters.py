@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import decimal
+import uuid
+
+import pytest
+
+from aiohttp_baseapi.filters import FilterTable, InvalidFilterValueError, coerce_filter_value, parse_filter_name
+
+
+class TestParseFilterName:
+    @pytest.mark.parametrize('fake_filter_name, expected_result', [
+        ('name', ('name', None)),
+        ('name__gte', ('name', 'gte')),
+        ('name__search', ('name', 'search')),
+        ('name__unknown', ('name__unknown', None)),
+        ('__ne', ('__ne', None)),
+    ])
+    def test_ok(self, fake_filter_name, expected_result):
+        assert parse_filter_name(fake_filter_name) == expected_result
+
+
+class TestFilterTable:
+    def test_ok(self):
+        filter_table = FilterTable(['id', 'name'], {'name': ['prefix']})
+
+        assert filter_table.fields == {'id', 'name'}
+        assert filter_table.get('id') == ('id', None)
+        assert filter_table.get('id__lte') == ('id', 'lte')
+        assert filter_table.get('name__prefix') == ('name', 'prefix')
+        assert filter_table.get('name__lte') is None
+        assert filter_table.get('id__prefix') is None
+        assert filter_table.get('unknown') is None
+
+
+class TestCoerceFilterValue:
+    @pytest.mark.parametrize('fake_python_type, fake_value, expected_value', [
+        (None, 'foo', 'foo'),
+        (int, None, None),
+        (int, '5', 5),
+        (int, 5, 5),
+        (float, '0.5', 0.5),
+        (decimal.Decimal, '0.5', decimal.Decimal('0.5')),
+        (bool, 'TRUE', True),
+        (bool, 't', True),
+        (bool, 'yes', True),
+        (bool, 'y', True),
+        (bool, 'on', True),
+        (bool, '1', True),
+        (bool, 'false', False),
+        (bool, 'F', False),
+        (bool, 'no', False),
+        (bool, 'n', False),
+        (bool, 'off', False),
+        (bool, '0', False),
+        (str, 5, '5'),
+        (datetime.date, '2017-01-02', datetime.date(2017, 1, 2)),
+        (datetime.datetime, '2017-01-02T10:00:00+0300',
+         datetime.datetime(2017, 1, 2, 10, tzinfo=datetime.timezone(datetime.timedelta(hours=3)))),
+        (datetime.datetime, '2017-01-02 10:00:00.5+03:00',
+         datetime.datetime(2017, 1, 2, 10, 0, 0, 500000, tzinfo=datetime.timezone(datetime.timedelta(hours=3)))),
+        (datetime.datetime, '2017-01-02', datetime.datetime(2017, 1, 2)),
+        (datetime.time, '10:30', datetime.time(10, 30)),
+        (uuid.UUID, '12345678-1234-5678-1234-567812345678', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+    ])
+    def test_ok(self, fake_python_type, fake_value, expected_value):
+        assert coerce_filter_value(fake_python_type, fake_value) == expected_value
+
+    @pytest.mark.parametrize('fake_python_type, fake_value', [
+        (int, 'foo'),
+        (int, '0.5'),
+        (decimal.Decimal, 'foo'),
+        (bool, 'maybe'),
+        (datetime.date, '02.01.2017'),
+        (datetime.date, '2017-01-02T10:00:00'),
+        (datetime.datetime, '2017-01-02T25:00:00'),
+        (uuid.UUID, 'foo'),
+    ])
+    def test_error(self, fake_python_type, fake_value):
+        with pytest.raises(InvalidFilterValueError):
+            coerce_filter_value(fake_python_type, fake_value)
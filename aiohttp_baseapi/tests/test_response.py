@@ -4,8 +4,11 @@ import http
 from datetime import datetime, date
 
 import pytest
+from asynctest import CoroutineMock
 
-from aiohttp_baseapi.response import DateTimeEncoder, json_dumps, JSONResponse
+from aiohttp_baseapi.response import (
+    DateTimeEncoder, json_dumps, JSONResponse, JSONListStreamResponse, NDJSONStreamResponse, CSVStreamResponse
+)
 
 
 class TestDateTimeEncoder:
@@ -102,3 +105,62 @@ class TestJSONResponse:
             status=http.HTTPStatus.OK,
             dumps=mocked_json_dumps
         )
+
+
+class TestJSONListStreamResponse:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_batches', [
+        [],
+        [[{'id': 1}]],
+        [[{'id': 1}, {'id': 2}], [], [{'id': 3, 'date': date(2017, 1, 1)}]],
+    ])
+    async def test_ok(self, mocker, fake_batches):
+        fake_request = mocker.Mock()
+        fake_meta = {'count': 3, 'total_count': None}
+        response = JSONListStreamResponse(fake_request)
+        written = []
+        mocked_prepare = mocker.patch.object(response, 'prepare', CoroutineMock(
+            side_effect=lambda request: setattr(response, '_prepared', True)
+        ), create=True)
+        mocker.patch.object(JSONListStreamResponse, 'prepared', mocker.PropertyMock(
+            side_effect=lambda: getattr(response, '_prepared', False)
+        ))
+        mocker.patch.object(response, 'write', CoroutineMock(side_effect=written.append))
+        mocked_write_eof = mocker.patch.object(response, 'write_eof', CoroutineMock())
+
+        for batch in fake_batches:
+            await response.write_items(batch)
+        await response.write_meta(fake_meta)
+
+        compared_document = b''.join(written).decode()
+        expected_document = json_dumps(dict(data=[item for batch in fake_batches for item in batch], meta=fake_meta))
+
+        assert compared_document == expected_document
+        assert response.content_type == 'application/json'
+        mocked_prepare.assert_called_once_with(fake_request)
+        mocked_write_eof.assert_called_once_with()
+
+
+class TestExportStreamResponse:
+    @pytest.fixture
+    def fake_batches(self):
+        return [[{'id': 1, 'date': date(2017, 1, 1)}], [{'id': 2, 'date': None}]]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('fake_response_cls, fake_fields, expected_document', [
+        (NDJSONStreamResponse, None, '{"id": 1, "date": "2017-01-01"}\n{"id": 2, "date": null}\n'),
+        (CSVStreamResponse, None, 'id,date\r\n1,2017-01-01\r\n2,\r\n'),
+        (CSVStreamResponse, ['date'], 'date\r\n2017-01-01\r\n""\r\n'),
+    ])
+    async def test_ok(self, mocker, fake_batches, fake_response_cls, fake_fields, expected_document):
+        response = fake_response_cls(mocker.Mock(), fields=fake_fields)
+        written = []
+        mocker.patch.object(response, 'prepare', CoroutineMock())
+        mocker.patch.object(response, 'write', CoroutineMock(side_effect=written.append))
+        mocker.patch.object(response, 'write_eof', CoroutineMock())
+
+        for batch in fake_batches:
+            await response.write_items(batch)
+        await response.finish()
+
+        assert b''.join(written).decode() == expected_document
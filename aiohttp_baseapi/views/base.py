@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
 
-import re
+import asyncio
+import math
+from copy import deepcopy
 from json import JSONDecodeError
 
-from aiohttp import web
+from aiohttp import web, hdrs
+from aiohttp.web_exceptions import HTTPNotFound
 from jsonschema import validate as validate_json, ValidationError
 from multidict import MultiDict, MultiDictProxy
 
+from aiohttp_baseapi.cursors import decode_cursor, InvalidCursorError
+from aiohttp_baseapi.data_providers.loader import DATA_LOADER_REQUEST_KEY, DataLoader
+from aiohttp_baseapi.data_providers.replicas import PRIMARY_PIN_COOKIE_NAME
 from aiohttp_baseapi.decorators import cachedproperty
 from aiohttp_baseapi.errors import ApiError
+from aiohttp_baseapi.filters import FilterTable, SINGLE_VALUE_FILTER_OPERATORS, parse_filter_name
 from aiohttp_baseapi.views.exceptions import ViewValidationError, ViewError
 from aiohttp_baseapi.log import logger
 
@@ -19,6 +26,8 @@ __all__ = (
 
 
 class BodyValidationViewMixin:
+    # methods updating only the given fields, the required fields of the "data" object are not required for them
+    PARTIAL_UPDATE_METHODS = ()
 
     body_data = None
 
@@ -34,7 +43,7 @@ class BodyValidationViewMixin:
                 raise ViewError(errors=error)
             return
 
-        if not self.Meta.body_data_schema:
+        if not self.get_body_data_schema():
             return
 
         try:
@@ -43,15 +52,46 @@ class BodyValidationViewMixin:
             logger.debug('Bad request: {}, error: {}'.format(await self.request.text(), e.args))
             raise ViewError(errors=ApiError().InvalidFormat('Invalid json'))
 
-        try:
-            validate_json(data, self.Meta.body_data_schema)
-        except ValidationError as e:
-            logger.debug('Bad request data: {}, error: {}'.format(data, e.message))
-            error = ApiError().InvalidDataSchema(e.message).Pointer(e.path)
-            raise ViewValidationError(errors=error)
+        if isinstance(data, dict) and isinstance(data.get('data'), list):
+            self.validate_body_items(data)
+        else:
+            try:
+                validate_json(data, self.get_body_data_schema())
+            except ValidationError as e:
+                logger.debug('Bad request data: {}, error: {}'.format(data, e.message))
+                error = ApiError().InvalidDataSchema(e.message).Pointer(e.path)
+                raise ViewValidationError(errors=error)
 
         self.body_data = data
 
+    def get_body_data_schema(self):
+        schema = self.Meta.body_data_schema
+        if schema and self.PARTIAL_UPDATE_METHODS and self.request.method in self.PARTIAL_UPDATE_METHODS:
+            # the schema of the class is shared by all the requests, so it's not changed
+            schema = deepcopy(schema)
+            schema.get('properties', {}).get('data', {}).pop('required', None)
+
+        return schema
+
+    def validate_body_items(self, data):
+        """
+        Validates every item of the "data" array as a single "data" object. Errors point to the invalid items.
+        """
+        errors = []
+        schema = self.get_body_data_schema()
+        for index, item in enumerate(data['data']):
+            try:
+                validate_json(dict(data, data=item), schema)
+            except ValidationError as e:
+                logger.debug('Bad request data item: {}, error: {}'.format(item, e.message))
+                path = list(e.path)
+                if path[:1] == ['data']:
+                    path = ['data', index] + path[1:]
+                errors.append(ApiError().InvalidDataSchema(e.message).Pointer(path))
+
+        if errors:
+            raise ViewValidationError(errors=errors)
+
 
 class BaseDataProviderView(web.View, BodyValidationViewMixin):
     FIELDS_PARAM_NAME = 'fields'
@@ -59,6 +99,8 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
     PAGE_PARAM_NAME = 'page'
     INCLUDE_PARAM_NAME = 'include'
     SORT_PARAM_NAME = 'sort'
+    GROUP_BY_PARAM_NAME = 'group_by'
+    AGGREGATE_PARAM_NAME = 'aggregate'
 
     MAX_LIMIT = 1000
     DEFAULT_LIMIT = 100
@@ -72,14 +114,60 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
     DEFAULT_SORT_FIELD = None
     DEFAULT_SORT_ORDER = 'asc'
 
+    TOTAL_COUNT_PARAM_NAME = 'total_count'
+    CURSOR_AFTER_PARAM_NAME = 'after'
+    CURSOR_BEFORE_PARAM_NAME = 'before'
+
+    TOTAL_COUNT_EXACT = 'exact'
+    TOTAL_COUNT_ESTIMATED = 'estimated'
+    TOTAL_COUNT_CAPPED = 'capped'
+    TOTAL_COUNT_NONE = 'none'
+
+    TOTAL_COUNT_MODES = (TOTAL_COUNT_EXACT, TOTAL_COUNT_ESTIMATED, TOTAL_COUNT_CAPPED, TOTAL_COUNT_NONE)
+
+    DATA_LOADER_REQUEST_KEY = DATA_LOADER_REQUEST_KEY
+
+    TIMEOUT_HEADER_NAME = 'X-Request-Timeout'
+
+    EXPORT_FORMAT_PARAM_NAME = 'format'
+
+    EXPORT_NDJSON = 'ndjson'
+    EXPORT_CSV = 'csv'
+
+    EXPORT_CONTENT_TYPES = {
+        EXPORT_NDJSON: 'application/x-ndjson',
+        EXPORT_CSV: 'text/csv',
+    }
+
     class Meta(BodyValidationViewMixin.Meta):
         data_provider_class = None
         available_filters = []
+        available_filter_operators = {}
         available_fields = []
         available_includes = {}
         available_sort_fields = []
-
-    def __init__(self, request, fields=None, filters=None, page=None, sort=None, include=None, *args, **kwargs):
+        query_mode = None
+        total_count_mode = 'exact'
+        cursor_total_count_mode = 'none'
+        total_count_cap = None
+        include_total_count_mode = 'none'
+        cache_ttl = None
+        cache_stale_ttl = None
+        stream = False
+        stream_batch_size = None
+        export_formats = ()
+        bulk_create_chunk_size = 500
+        read_before_write = False
+        bulk_write_max_rows = 1000
+        coalesce_queries = None
+        max_concurrent_queries = None
+        timeout = None
+        read_replicas = True
+        available_aggregates = {}
+        deferred_fields = None
+
+    def __init__(self, request, fields=None, filters=None, page=None, sort=None, include=None, group_by=None,
+                 aggregate=None, *args, **kwargs):
         super().__init__(request, *args, **kwargs)
         assert self.Meta.data_provider_class, 'Please, define data_provider.'
 
@@ -88,12 +176,38 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
         self._page = page if page is not None else self.get_page_from_request() or {}
         self._sort = sort if sort is not None else self.get_sort_from_request() or {}
         self._include = include if include is not None else self.get_include_from_request() or {}
+        self._group_by = group_by if group_by is not None else self.get_group_by_from_request() or []
+        self._aggregate = aggregate if aggregate is not None else self.get_aggregate_from_request() or {}
 
         self.validate_fields()
         self.validate_filters()
         self.validate_page()
+        self.validate_total_count_mode()
+        self.validate_cursor()
+        self.validate_export()
         self.validate_includes()
+        self.validate_aggregation()
         self.validate_sort()
+        self.validate_timeout()
+
+    @property
+    def available_filter_operators(self):
+        return self.Meta.available_filter_operators
+
+    @property
+    def filter_table(self):
+        """
+        The table of the available filters, it's built once per view class.
+        """
+        view_class = type(self)
+        filter_table = view_class.__dict__.get('_filter_table')
+
+        if filter_table is None:
+            filter_table = view_class._filter_table = FilterTable(
+                self.available_filters, self.available_filter_operators
+            )
+
+        return filter_table
 
     @property
     def available_fields(self):
@@ -111,18 +225,41 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
     def available_includes(self):
         return self.Meta.available_includes
 
+    @cachedproperty
+    def export_format(self):
+        """
+        Export format requested by the route suffix or by the Accept header, None for the usual JSON response.
+        """
+        export_format = self.request.match_info.get(self.EXPORT_FORMAT_PARAM_NAME)
+        if export_format is not None:
+            if export_format not in self.Meta.export_formats:
+                raise HTTPNotFound()
+            return export_format
+
+        accepted_content_types = [
+            content_type.split(';')[0].strip() for content_type in self.request.headers.get(hdrs.ACCEPT, '').split(',')
+        ]
+        for content_type in accepted_content_types:
+            for export_format in self.Meta.export_formats:
+                if self.EXPORT_CONTENT_TYPES[export_format] == content_type:
+                    return export_format
+
+        return None
+
     def validate_page(self):
-        limit = self._page.get('limit', self.DEFAULT_LIMIT)
+        # exported lists are not paginated unless the limit is requested explicitly
+        is_export = self.export_format is not None
+        limit = self._page.get('limit', None if is_export else self.DEFAULT_LIMIT)
         offset = self._page.get('offset', self.DEFAULT_OFFSET)
 
         try:
-            limit = int(limit)
+            limit = int(limit) if limit is not None else None
         except ValueError:
             detail = 'Requested page limit "{}" is not integer.'.format(limit)
             error = ApiError().InvalidQueryParameter(detail).Parameter('page[limit]')
             raise ViewValidationError(errors=error)
 
-        if limit > self.MAX_LIMIT:
+        if not is_export and limit > self.MAX_LIMIT:
             detail = 'Requested page limit "{}" is too big. Maximum is {}'.format(limit, self.MAX_LIMIT)
             error = ApiError().InvalidQueryParameter(detail).Parameter('page[limit]')
             raise ViewValidationError(errors=error)
@@ -139,6 +276,66 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
             'offset': offset,
         })
 
+    def validate_total_count_mode(self):
+        if self.CURSOR_AFTER_PARAM_NAME in self._page or self.CURSOR_BEFORE_PARAM_NAME in self._page:
+            default_mode = self.Meta.cursor_total_count_mode
+        else:
+            default_mode = self.Meta.total_count_mode
+        mode = self._page.get(self.TOTAL_COUNT_PARAM_NAME, default_mode)
+
+        if mode not in self.TOTAL_COUNT_MODES:
+            detail = 'Requested total count mode "{}" is not supported. Available modes are: {}'.format(
+                mode, ', '.join(self.TOTAL_COUNT_MODES)
+            )
+            error = ApiError().InvalidQueryParameter(detail).Parameter('page[{}]'.format(self.TOTAL_COUNT_PARAM_NAME))
+            raise ViewValidationError(errors=error)
+
+        self._page[self.TOTAL_COUNT_PARAM_NAME] = mode
+
+    def validate_cursor(self):
+        cursor_names = [
+            name for name in (self.CURSOR_AFTER_PARAM_NAME, self.CURSOR_BEFORE_PARAM_NAME) if name in self._page
+        ]
+
+        if not cursor_names:
+            return
+
+        if len(cursor_names) > 1 or self._page.get('offset'):
+            detail = 'Only one of page[offset], page[{}] and page[{}] can be requested.'.format(
+                self.CURSOR_AFTER_PARAM_NAME, self.CURSOR_BEFORE_PARAM_NAME
+            )
+            error = ApiError().InvalidQueryParameter(detail).Parameter('page')
+            raise ViewValidationError(errors=error)
+
+        cursor_name = cursor_names[0]
+        cursor = self._page[cursor_name]
+
+        # an empty cursor means the first page ("after") or the last page ("before")
+        values = []
+        if cursor:
+            try:
+                sort, values = decode_cursor(cursor)
+            except InvalidCursorError:
+                detail = 'Requested cursor "{}" is not valid.'.format(cursor)
+                error = ApiError().InvalidQueryParameter(detail).Parameter('page[{}]'.format(cursor_name))
+                raise ViewValidationError(errors=error)
+
+            if sort != list(self._sort):
+                detail = 'Requested cursor was built for another sort: "{}".'.format(','.join(sort))
+                error = ApiError().InvalidQueryParameter(detail).Parameter('page[{}]'.format(cursor_name))
+                raise ViewValidationError(errors=error)
+
+        self._page[cursor_name] = values
+
+    def validate_export(self):
+        if self.export_format is None:
+            return
+
+        if self._include:
+            detail = 'Includes are not available in "{}" export.'.format(self.export_format)
+            error = ApiError().InvalidQueryParameter(detail).Parameter('include')
+            raise ViewValidationError(errors=error)
+
     def validate_fields(self):
         if not self._fields:
             return
@@ -152,8 +349,9 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
             raise ViewValidationError(errors=errors)
 
     def validate_filters(self):
-        filter_keys = set([re.sub('__(lte|gte|ne)$', '', filter_key) for filter_key in self._filters.keys()])
-        unavailable_filters = filter_keys - set(self.available_filters)
+        filter_table = self.filter_table
+        filter_keys = set(parse_filter_name(filter_key)[0] for filter_key in self._filters.keys())
+        unavailable_filters = filter_keys - filter_table.fields
         if unavailable_filters:
             errors = []
             for filter_name in unavailable_filters:
@@ -162,13 +360,24 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
             raise ViewValidationError(errors=errors)
 
         for filter_field, filter_value in self._filters.items():
-            is_comparison_operator = filter_field.endswith('lte') or filter_field.endswith('gte')
+            operator = parse_filter_name(filter_field)[1]
 
-            if is_comparison_operator and isinstance(filter_value, list):
+            if operator in SINGLE_VALUE_FILTER_OPERATORS and isinstance(filter_value, list):
                 detail = 'Requested filter[{}] comparison operation not applied to list.'.format(filter_field)
                 error = ApiError().InvalidFilterOperator(detail).Parameter('filter[{}]'.format(filter_field))
                 raise ViewValidationError(errors=error)
 
+        # filters of the fields in Meta.available_filter_operators can use only the operators set there,
+        # other filters - only the comparison ones
+        errors = []
+        for filter_field in self._filters:
+            if filter_table.get(filter_field) is None:
+                detail = 'Requested filter operator is not available - "{}"'.format(parse_filter_name(filter_field)[1])
+                errors.append(ApiError().InvalidFilterOperator(detail).Parameter('filter[{}]'.format(filter_field)))
+
+        if errors:
+            raise ViewValidationError(errors=errors)
+
     def validate_includes(self):
         unavailable_includes = set(self._include.keys()) - set(self.available_includes)
         if unavailable_includes:
@@ -185,12 +394,17 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
         include = dict()
         for include_name, params in self._include.items():
             view_class = self.Meta.available_includes[include_name]['view_class']
+            page = params.get(self.PAGE_PARAM_NAME, {})
+            # total count of included entities is calculated only if it is requested explicitly
+            page.setdefault(self.TOTAL_COUNT_PARAM_NAME, self.Meta.include_total_count_mode)
             view_init_params = dict(
                 fields=params.get(self.FIELDS_PARAM_NAME, {}),
                 filters=params.get(self.FILTER_PARAM_NAME, {}),
-                page=params.get(self.PAGE_PARAM_NAME, {}),
+                page=page,
                 sort=params.get(self.SORT_PARAM_NAME, {}),
                 include=params.get(self.INCLUDE_PARAM_NAME, {}),
+                group_by=[],
+                aggregate={},
             )
             # logger.debug('Init view "{}" with init params: {}'.format(view_class, view_init_params))
 
@@ -202,12 +416,71 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
             include[include_name] = include_params
         self._include = include
 
+    def validate_aggregation(self):
+        if not self._group_by and not self._aggregate:
+            return
+
+        errors = []
+
+        for field in self._group_by:
+            if field not in self.available_fields:
+                detail = 'Requested group by field is not available - "{}"'.format(field)
+                errors.append(ApiError().InvalidQueryParameter(detail).Parameter(self.GROUP_BY_PARAM_NAME))
+
+        aggregate = self._validate_aggregate_params(errors)
+
+        for param_name, value in ((self.FIELDS_PARAM_NAME, self._fields), (self.INCLUDE_PARAM_NAME, self._include)):
+            if value:
+                detail = 'Requested {} are not available with aggregation.'.format(param_name)
+                errors.append(ApiError().InvalidQueryParameter(detail).Parameter(param_name))
+
+        is_cursor = self.CURSOR_AFTER_PARAM_NAME in self._page or self.CURSOR_BEFORE_PARAM_NAME in self._page
+        if is_cursor or self.export_format is not None:
+            detail = 'Aggregated data can be paginated only with page[limit] and page[offset].'
+            errors.append(ApiError().InvalidQueryParameter(detail).Parameter(self.PAGE_PARAM_NAME))
+
+        if errors:
+            raise ViewValidationError(errors=errors)
+
+        self._aggregate = aggregate
+
+    def _validate_aggregate_params(self, errors):
+        aggregate = {}
+
+        for function, fields in self._aggregate.items():
+            fields = fields if isinstance(fields, list) else [fields]
+            for field in fields:
+                if field not in self.Meta.available_aggregates.get(function, ()):
+                    detail = 'Requested aggregate is not available - "{}" of "{}"'.format(function, field)
+                    parameter = '{}[{}]'.format(self.AGGREGATE_PARAM_NAME, function)
+                    errors.append(ApiError().InvalidQueryParameter(detail).Parameter(parameter))
+            aggregate[function] = fields
+
+        return aggregate
+
+    @property
+    def aggregate_labels(self):
+        """
+        Names of the aggregated values in the items of aggregated data.
+        """
+        return [
+            self.Meta.data_provider_class.AGGREGATE_LABEL_TEMPLATE.format(field, function)
+            for function, fields in self._aggregate.items()
+            for field in fields
+        ]
+
     def validate_sort(self):
         if not self._sort:
             return
 
+        if self._group_by or self._aggregate:
+            # aggregated data is sorted by the groups or by the aggregated values
+            available_sort_fields = list(self._group_by) + self.aggregate_labels
+        else:
+            available_sort_fields = self.available_sort_fields
+
         clean_sort_fields = [sort_field.strip('-') for sort_field in self._sort]
-        unavailable_sort_fields = set(clean_sort_fields) - set(self.available_sort_fields)
+        unavailable_sort_fields = set(clean_sort_fields) - set(available_sort_fields)
         if unavailable_sort_fields:
             errors = []
             for field in unavailable_sort_fields:
@@ -215,12 +488,58 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
                 errors.append(ApiError().InvalidQueryParameter(detail).Parameter('sort'))
             raise ViewValidationError(errors=errors)
 
+    def get_timeout_from_request(self):
+        timeout = self.request.headers.get(self.TIMEOUT_HEADER_NAME)
+
+        return float(timeout) if timeout is not None else None
+
+    def validate_timeout(self):
+        try:
+            timeout = self.get_timeout_from_request()
+        except ValueError:
+            timeout = math.nan
+
+        if timeout is not None and not 0 < timeout < math.inf:
+            detail = 'Timeout should be a positive number of seconds'
+            raise ViewValidationError(errors=ApiError().InvalidFormat(detail).Header(self.TIMEOUT_HEADER_NAME))
+
+    @cachedproperty
+    def deadline(self):
+        """
+        Event loop time by which the data providers of the request should finish: Meta.timeout (or the shorter
+        timeout from the header) after the data provider is created. None if there is no timeout.
+        """
+        timeouts = [timeout for timeout in (self.Meta.timeout, self.get_timeout_from_request()) if timeout is not None]
+        if not timeouts:
+            return None
+
+        return asyncio.get_event_loop().time() + min(timeouts)
+
+    @cachedproperty
+    def read_replica(self):
+        """
+        Data of GET requests is read from the replicas unless the client has changed something recently
+        (see read_your_writes_handler).
+        """
+        return bool(self.Meta.read_replicas) and self.request.method == hdrs.METH_GET and \
+            PRIMARY_PIN_COOKIE_NAME not in self.request.cookies
+
     @cachedproperty
     def data_provider(self):
         return self.Meta.data_provider_class(
             **self.get_data_provider_params()
         )
 
+    @property
+    def data_loader(self):
+        """
+        The loader shared by all the data providers of the request.
+        """
+        if self.DATA_LOADER_REQUEST_KEY not in self.request:
+            self.request[self.DATA_LOADER_REQUEST_KEY] = DataLoader(concurrency=self.Meta.max_concurrent_queries)
+
+        return self.request[self.DATA_LOADER_REQUEST_KEY]
+
     def get_data_provider_params(self):
         return dict(
             fields=self._fields,
@@ -229,6 +548,18 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
             page=self._page,
             sort=self._sort,
             available_includes=self.available_includes,
+            query_mode=self.Meta.query_mode,
+            total_count_cap=self.Meta.total_count_cap,
+            # modifying requests always work with the actual data
+            cache_ttl=self.Meta.cache_ttl if self.request.method == hdrs.METH_GET else None,
+            cache_stale_ttl=self.Meta.cache_stale_ttl,
+            loader=self.data_loader,
+            coalesce_queries=self.Meta.coalesce_queries,
+            deadline=self.deadline,
+            read_replica=self.read_replica,
+            group_by=self._group_by,
+            aggregate=self._aggregate,
+            deferred_fields=self.Meta.deferred_fields,
         )
 
     def get_fields_from_request(self) -> MultiDict:
@@ -246,6 +577,12 @@ class BaseDataProviderView(web.View, BodyValidationViewMixin):
     def get_include_from_request(self) -> MultiDict:
         return self._get_request_param(self.INCLUDE_PARAM_NAME)
 
+    def get_group_by_from_request(self):
+        return self._get_request_param(self.GROUP_BY_PARAM_NAME)
+
+    def get_aggregate_from_request(self) -> MultiDict:
+        return self._get_request_param(self.AGGREGATE_PARAM_NAME)
+
     def _get_request_param(self, param_name):
         param_immutable = self.request.PARAMS.get(param_name, MultiDictProxy(MultiDict()))
 
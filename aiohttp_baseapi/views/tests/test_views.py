@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import json
+
 import pytest
+from aiohttp.test_utils import make_mocked_request
+from aiohttp.web_exceptions import HTTPNotFound
 from pytest_mock import MockFixture
 
+from aiohttp_baseapi.cursors import encode_cursor
 from aiohttp_baseapi.views.base import BaseDataProviderView
-from aiohttp_baseapi.views.exceptions import ViewValidationError
+from aiohttp_baseapi.views.crud import BaseEntityView, BaseListView
+from aiohttp_baseapi.views.exceptions import ViewError, ViewValidationError
 
 
 @pytest.fixture
@@ -64,6 +70,7 @@ class TestBaseViewValidatePage:
 
         fake_object = mocker.Mock(**{
             '_page.get.return_value': fake_updated_value,
+            'export_format': None,
             'MAX_LIMIT': 1000,
             'ITEMS_ON_PAGE': 100
         })
@@ -79,6 +86,7 @@ class TestBaseViewValidatePage:
     def test_error_max_limit(self, mocker: MockFixture, fake_base_view_cls):
         fake_object = mocker.Mock(**{
             '_page.get.return_value': 100,
+            'export_format': None,
             'MAX_LIMIT': 10
         })
         with pytest.raises(ViewValidationError):
@@ -87,48 +95,255 @@ class TestBaseViewValidatePage:
     def test_error_not_integer(self, mocker: MockFixture, fake_base_view_cls):
         fake_object = mocker.Mock(**{
             '_page.get.return_value': 'foo',
+            'export_format': None,
         })
         with pytest.raises(ViewValidationError):
             fake_base_view_cls.validate_page(fake_object)
 
 
-class TestBaseViewValidateFilters:
+class TestBaseViewValidateTotalCountMode:
     def test_ok(self, mocker: MockFixture, fake_base_view_cls):
-        fake_filters = dict(test=mocker.Mock())
-        fake_available_filters = ['test']
-        mocked_validation_error = mocker.patch('aiohttp_baseapi.views.exceptions.ViewValidationError')
         fake_object = mocker.Mock(
-            _filters=fake_filters,
-            available_filters=fake_available_filters,
+            _page={},
+            Meta=mocker.Mock(total_count_mode='exact'),
+            TOTAL_COUNT_PARAM_NAME='total_count',
+            TOTAL_COUNT_MODES=BaseDataProviderView.TOTAL_COUNT_MODES
         )
 
-        fake_base_view_cls.validate_filters(fake_object)
+        fake_base_view_cls.validate_total_count_mode(fake_object)
+
+        assert fake_object._page == {'total_count': 'exact'}
+
+    @pytest.mark.parametrize('fake_page, expected_mode', [
+        ({'after': ''}, 'none'),
+        ({'before': encode_cursor([], [1])}, 'none'),
+        ({'after': '', 'total_count': 'exact'}, 'exact'),
+        ({'offset': 10}, 'exact'),
+    ])
+    def test_cursor(self, mocker: MockFixture, fake_base_view_cls, fake_page, expected_mode):
+        mocker.patch.object(fake_base_view_cls.Meta, 'data_provider_class', mocker.Mock())
+        fake_view = fake_base_view_cls(
+            make_mocked_request('GET', '/'), fields={}, filters={}, page=dict(fake_page), sort={}, include={},
+            group_by=[], aggregate={}
+        )
 
-        mocked_validation_error.assert_not_called()
+        assert fake_view._page['total_count'] == expected_mode
 
     def test_error(self, mocker: MockFixture, fake_base_view_cls):
-        fake_filters = dict(unknown=mocker.Mock())
-        fake_available_filters = ['test']
         fake_object = mocker.Mock(
-            _filters=fake_filters,
-            available_filters=fake_available_filters,
+            _page={'total_count': 'foo'},
+            TOTAL_COUNT_PARAM_NAME='total_count',
+            TOTAL_COUNT_MODES=BaseDataProviderView.TOTAL_COUNT_MODES
         )
 
         with pytest.raises(ViewValidationError):
-            fake_base_view_cls.validate_filters(fake_object)
+            fake_base_view_cls.validate_total_count_mode(fake_object)
 
-    def test_error_comparison(self, mocker: MockFixture, fake_base_view_cls):
-        fake_filters = dict(test__gte=[mocker.Mock(), mocker.Mock()])
-        fake_available_filters = ['test']
-        mocked_get_comparison_operator = mocker.Mock()
 
+class TestBaseViewValidateCursor:
+    @pytest.mark.parametrize('fake_page, expected_page', [
+        ({}, {}),
+        ({'after': ''}, {'after': []}),
+        ({'before': encode_cursor(['-name'], ['foo', 1])}, {'before': ['foo', 1]}),
+    ])
+    def test_ok(self, mocker: MockFixture, fake_base_view_cls, fake_page, expected_page):
         fake_object = mocker.Mock(
-            _filters=fake_filters,
-            available_filters=fake_available_filters,
-            get_comparison_operator=mocked_get_comparison_operator)
+            _page=fake_page,
+            _sort=['-name'],
+            CURSOR_AFTER_PARAM_NAME='after',
+            CURSOR_BEFORE_PARAM_NAME='before'
+        )
+
+        fake_base_view_cls.validate_cursor(fake_object)
+
+        assert fake_object._page == expected_page
+
+    @pytest.mark.parametrize('fake_page', [
+        {'after': '', 'before': ''},
+        {'after': '', 'offset': 10},
+        {'after': 'foo'},
+        {'after': encode_cursor(['name'], ['foo', 1])},
+    ])
+    def test_error(self, mocker: MockFixture, fake_base_view_cls, fake_page):
+        fake_object = mocker.Mock(
+            _page=fake_page,
+            _sort=['-name'],
+            CURSOR_AFTER_PARAM_NAME='after',
+            CURSOR_BEFORE_PARAM_NAME='before'
+        )
+
+        with pytest.raises(ViewValidationError):
+            fake_base_view_cls.validate_cursor(fake_object)
+
+
+class TestBaseViewExportFormat:
+    @pytest.mark.parametrize('fake_match_info, fake_headers, expected_result', [
+        ({}, {}, None),
+        ({}, {'Accept': 'application/json'}, None),
+        ({}, {'Accept': 'text/csv;q=0.9, application/x-ndjson'}, 'csv'),
+        ({}, {'Accept': 'application/x-ndjson'}, 'ndjson'),
+        ({'format': 'csv'}, {'Accept': 'application/x-ndjson'}, 'csv'),
+    ])
+    def test_ok(self, mocker: MockFixture, fake_base_view_obj, fake_match_info, fake_headers, expected_result):
+        fake_base_view_obj._request = mocker.Mock(match_info=fake_match_info, headers=fake_headers)
+        fake_base_view_obj.Meta.export_formats = ('ndjson', 'csv')
+
+        assert fake_base_view_obj.export_format == expected_result
+
+    def test_error(self, mocker: MockFixture, fake_base_view_obj):
+        fake_base_view_obj._request = mocker.Mock(match_info={'format': 'csv'}, headers={})
+        fake_base_view_obj.Meta.export_formats = ('ndjson',)
+
+        with pytest.raises(HTTPNotFound):
+            fake_base_view_obj.export_format
+
+
+class TestBaseViewValidateExport:
+    @pytest.mark.parametrize('fake_export_format, fake_include', [
+        (None, {'authors': {}}),
+        ('csv', {}),
+    ])
+    def test_ok(self, mocker: MockFixture, fake_base_view_cls, fake_export_format, fake_include):
+        fake_object = mocker.Mock(export_format=fake_export_format, _include=fake_include)
+
+        fake_base_view_cls.validate_export(fake_object)
+
+    def test_error(self, mocker: MockFixture, fake_base_view_cls):
+        fake_object = mocker.Mock(export_format='csv', _include={'authors': {}})
 
         with pytest.raises(ViewValidationError):
-            fake_base_view_cls.validate_filters(fake_object)
+            fake_base_view_cls.validate_export(fake_object)
+
+
+class TestBaseViewValidateBodyItems:
+    fake_schema = {
+        'type': 'object',
+        'properties': {
+            'data': {'type': 'object', 'properties': {'name': {'type': 'string'}}, 'required': ['name']}
+        },
+        'required': ['data'],
+    }
+
+    def test_ok(self, mocker: MockFixture, fake_base_view_obj):
+        fake_base_view_obj.Meta.body_data_schema = self.fake_schema
+
+        fake_base_view_obj.validate_body_items({'data': [{'name': 'foo'}, {'name': 'bar'}]})
+
+    def test_error(self, mocker: MockFixture, fake_base_view_obj):
+        fake_base_view_obj.Meta.body_data_schema = self.fake_schema
+
+        with pytest.raises(ViewValidationError) as e:
+            fake_base_view_obj.validate_body_items({'data': [{'name': 'foo'}, {'name': 1}, {}]})
+
+        compared_sources = [error['source'] for error in json.loads(e.value.text)['errors']]
+
+        assert compared_sources == [{'pointer': 'data/1/name'}, {'pointer': 'data/2'}]
+
+
+class TestCrudViewGetBodyDataSchema:
+    fake_schema = {
+        'type': 'object',
+        'properties': {
+            'data': {'type': 'object', 'properties': {'name': {'type': 'string'}}, 'required': ['name']}
+        },
+        'required': ['data'],
+    }
+
+    @pytest.mark.parametrize('fake_view_cls, fake_method, expected_required', [
+        (BaseListView, 'POST', ['name']),
+        (BaseListView, 'PATCH', None),
+        (BaseEntityView, 'PUT', ['name']),
+        (BaseEntityView, 'PATCH', None),
+    ])
+    def test_ok(self, mocker: MockFixture, fake_view_cls, fake_method, expected_required):
+        class FakeView(fake_view_cls):
+            class Meta(fake_view_cls.Meta):
+                data_provider_class = mocker.Mock()
+                body_data_schema = self.fake_schema
+
+        fake_view = FakeView(
+            make_mocked_request(fake_method, '/', match_info={'id': '1'}), fields={}, filters={}, page={}, sort={},
+            include={}, group_by=[], aggregate={}
+        )
+
+        compared_schema = fake_view.get_body_data_schema()
+
+        assert compared_schema['properties']['data'].get('required') == expected_required
+        # the schema of the class is not changed by the partial updates
+        assert self.fake_schema['properties']['data']['required'] == ['name']
+
+
+class TestCrudEntityViewValidateBodyItems:
+    def test_error(self, mocker: MockFixture):
+        fake_view = mocker.Mock(spec=BaseEntityView)
+
+        with pytest.raises(ViewError) as e:
+            BaseEntityView.validate_body_items(fake_view, {'data': [{'name': 'foo'}]})
+
+        assert e.value.status_code == 400
+        assert json.loads(e.value.text)['errors'][0]['source'] == {'pointer': 'data'}
+
+
+class TestBaseViewValidateFilters:
+    @pytest.fixture
+    def fake_view(self, fake_base_view_obj):
+        fake_base_view_obj.Meta.available_filters = ['test']
+        fake_base_view_obj.Meta.available_filter_operators = {}
+
+        return fake_base_view_obj
+
+    def test_ok(self, mocker: MockFixture, fake_view):
+        fake_view._filters = dict(test=mocker.Mock())
+
+        fake_view.validate_filters()
+
+    def test_error(self, mocker: MockFixture, fake_view):
+        fake_view._filters = dict(unknown=mocker.Mock())
+
+        with pytest.raises(ViewValidationError):
+            fake_view.validate_filters()
+
+    def test_error_comparison(self, mocker: MockFixture, fake_view):
+        fake_view._filters = dict(test__gte=[mocker.Mock(), mocker.Mock()])
+
+        with pytest.raises(ViewValidationError):
+            fake_view.validate_filters()
+
+    def test_filter_table(self, fake_view):
+        assert fake_view.filter_table is type(fake_view)().filter_table
+
+
+class TestBaseViewValidateFilterOperators:
+    @pytest.fixture
+    def fake_view(self, fake_base_view_obj):
+        fake_base_view_obj.Meta.available_filters = ['id', 'name']
+        fake_base_view_obj.Meta.available_filter_operators = {'name': ['prefix', 'search']}
+
+        return fake_base_view_obj
+
+    @pytest.mark.parametrize('fake_filters', [
+        {'name__prefix': 'war', 'name__search': 'war peace', 'name': 'War and Peace'},
+        {'id__gte': '1', 'id__ne': '2'},
+    ])
+    def test_ok(self, fake_view, fake_filters):
+        fake_view._filters = fake_filters
+
+        fake_view.validate_filters()
+
+    @pytest.mark.parametrize('fake_filters, expected_parameters', [
+        ({'name__contains': 'war', 'name__gte': 'a'}, ['filter[name__contains]', 'filter[name__gte]']),
+        ({'id__prefix': '1'}, ['filter[id__prefix]']),
+        ({'name__prefix': ['war', 'peace']}, ['filter[name__prefix]']),
+    ])
+    def test_error(self, fake_view, fake_filters, expected_parameters):
+        fake_view._filters = fake_filters
+
+        with pytest.raises(ViewValidationError) as e:
+            fake_view.validate_filters()
+
+        errors = json.loads(e.value.text)['errors']
+        assert sorted(error['source']['parameter'] for error in errors) == expected_parameters
+        assert {error['code'] for error in errors} == {'invalid_filter_operator'}
 
 
 class TestBaseViewValidateIncludes:
@@ -156,6 +371,106 @@ class TestBaseViewValidateIncludes:
             fake_base_view_cls.validate_includes(fake_object)
 
 
+class TestBaseViewValidateAggregation:
+    @pytest.fixture
+    def fake_view(self, mocker: MockFixture, fake_base_view_obj):
+        fake_base_view_obj.Meta.available_fields = ['category', 'name', 'price']
+        fake_base_view_obj.Meta.available_aggregates = {'count': ['id'], 'sum': ['price']}
+        fake_base_view_obj.Meta.data_provider_class.AGGREGATE_LABEL_TEMPLATE = '{}__{}'
+        fake_base_view_obj._fields = {}
+        fake_base_view_obj._include = {}
+        fake_base_view_obj._page = {}
+        fake_base_view_obj._sort = ['-id__count', 'category']
+        fake_base_view_obj.export_format = None
+
+        return fake_base_view_obj
+
+    def test_ok(self, fake_view):
+        fake_view._group_by = ['category']
+        fake_view._aggregate = {'count': 'id', 'sum': ['price']}
+
+        fake_view.validate_aggregation()
+        fake_view.validate_sort()
+
+        assert fake_view._aggregate == {'count': ['id'], 'sum': ['price']}
+        assert fake_view.aggregate_labels == ['id__count', 'price__sum']
+
+    @pytest.mark.parametrize('fake_group_by, fake_aggregate, fake_params, expected_parameters', [
+        (['id'], {}, {}, ['group_by']),
+        (['category'], {'sum': 'id', 'avg': 'price'}, {}, ['aggregate[sum]', 'aggregate[avg]']),
+        (['category'], {}, {'_fields': ['name'], '_include': {'authors': {}}}, ['fields', 'include']),
+        ([], {'count': 'id'}, {'_page': {'after': ''}}, ['page']),
+    ])
+    def test_error(self, fake_view, fake_group_by, fake_aggregate, fake_params, expected_parameters):
+        fake_view._group_by = fake_group_by
+        fake_view._aggregate = fake_aggregate
+        for name, value in fake_params.items():
+            setattr(fake_view, name, value)
+
+        with pytest.raises(ViewValidationError) as e:
+            fake_view.validate_aggregation()
+
+        errors = json.loads(e.value.text)['errors']
+        assert sorted(error['source']['parameter'] for error in errors) == sorted(expected_parameters)
+
+    def test_error_sort(self, fake_view):
+        fake_view._group_by = ['category']
+        fake_view._aggregate = {'count': ['id']}
+        fake_view._sort = ['name']
+
+        with pytest.raises(ViewValidationError):
+            fake_view.validate_sort()
+
+
+class TestBaseViewValidateTimeout:
+    @pytest.mark.parametrize('fake_headers', [{}, {'X-Request-Timeout': '1.5'}])
+    def test_ok(self, mocker: MockFixture, fake_base_view_obj, fake_headers):
+        fake_base_view_obj._request = mocker.Mock(headers=fake_headers)
+
+        fake_base_view_obj.validate_timeout()
+
+    @pytest.mark.parametrize('fake_timeout', ['foo', '0', '-1', 'inf', 'nan'])
+    def test_error(self, mocker: MockFixture, fake_base_view_obj, fake_timeout):
+        fake_base_view_obj._request = mocker.Mock(headers={'X-Request-Timeout': fake_timeout})
+
+        with pytest.raises(ViewValidationError) as e:
+            fake_base_view_obj.validate_timeout()
+
+        assert json.loads(e.value.text)['errors'][0]['source'] == {'header': 'X-Request-Timeout'}
+
+
+class TestBaseViewDeadline:
+    @pytest.mark.parametrize('fake_meta_timeout, fake_headers, expected_timeout', [
+        (None, {}, None),
+        (10, {}, 10),
+        (None, {'X-Request-Timeout': '5'}, 5),
+        (10, {'X-Request-Timeout': '5'}, 5),
+        (10, {'X-Request-Timeout': '50'}, 10),
+    ])
+    def test_ok(self, mocker: MockFixture, fake_base_view_obj, fake_meta_timeout, fake_headers, expected_timeout):
+        mocker.patch('aiohttp_baseapi.views.base.asyncio.get_event_loop', return_value=mocker.Mock(time=lambda: 100))
+        fake_base_view_obj._request = mocker.Mock(headers=fake_headers)
+        fake_base_view_obj.Meta.timeout = fake_meta_timeout
+
+        expected_deadline = 100 + expected_timeout if expected_timeout is not None else None
+        assert fake_base_view_obj.deadline == expected_deadline
+
+
+class TestBaseViewReadReplica:
+    @pytest.mark.parametrize('fake_read_replicas, fake_method, fake_cookies, expected_result', [
+        (True, 'GET', {}, True),
+        (False, 'GET', {}, False),
+        (True, 'POST', {}, False),
+        (True, 'GET', {'read_primary': '1'}, False),
+    ])
+    def test_ok(self, mocker: MockFixture, fake_base_view_obj, fake_read_replicas, fake_method, fake_cookies,
+                expected_result):
+        fake_base_view_obj._request = mocker.Mock(method=fake_method, cookies=fake_cookies)
+        fake_base_view_obj.Meta.read_replicas = fake_read_replicas
+
+        assert fake_base_view_obj.read_replica == expected_result
+
+
 class TestBaseViewDataProvider:
     def test_ok(self, mocker: MockFixture, fake_base_view_obj: BaseDataProviderView):
         fake_data_provider_params = dict(test=mocker.Mock())
@@ -33,6 +33,7 @@ setup(
     long_description=read_file(os.path.join(ROOT_DIR, 'README.md')),
     include_package_data=True,
     author='Wargaming Team',
+    python_requires='>=3.6',
     install_requires=[
         'aiohttp>=2.0.0',
         'simplejson>=3.0.0',
@@ -49,7 +50,6 @@ setup(
         'Environment :: Web Environment',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3 :: Only',